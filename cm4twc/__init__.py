@@ -10,4 +10,5 @@ from .data import DataSet
 from .components import (surfacelayer, subsurface, openwater,
                          SurfaceLayerComponent, SubSurfaceComponent,
                          OpenWaterComponent, DataComponent, NullComponent)
-from .settings import atol, rtol, decr, dtype_float
+from .settings import (atol, rtol, decr, dtype_float, sync_every,
+                       write_queue_size, load_workers, file_layout)
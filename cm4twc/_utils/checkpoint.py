@@ -0,0 +1,250 @@
+from os import replace, remove, path
+from datetime import datetime
+import hashlib
+import cftime
+import numpy as np
+
+from .writer import call_with, variable_layout, open_dataset
+from ..settings import file_layout
+
+# default size (in bytes) of the blocks of the arrays compared to
+# determine the changes stored in incremental checkpoints
+_block_bytes = 2 ** 16
+
+
+def create_checkpoint(filepath, contents, datetime_, units, calendar,
+                      writer=None, base=None, index=None):
+    # write the *contents* of a snapshot at *datetime_* to one
+    # checkpoint file (the write possibly being deferred, in which case
+    # the arrays in *contents* must be snapshots), *base* being the path
+    # of the checkpoint file these contents are changes to (if any), and
+    # *index* the position of the checkpoint in the sequence of the
+    # checkpoints of its run (if any)
+    call_with(writer, _write_checkpoint, filepath, contents, datetime_,
+              units, calendar, base, index)
+
+
+def _write_checkpoint(filepath, contents, datetime_, units, calendar,
+                      base, index):
+    # write to a temporary file first and then rename it, so that the
+    # checkpoint file is either complete or absent (never half-written)
+    partial = filepath + '.part'
+
+    with open_dataset(partial, 'w') as f:
+        # description
+        f.description = "Checkpoint file created on {}".format(
+            datetime.now().strftime('%Y-%m-%d at %H:%M:%S'))
+
+        # snapshot in time
+        t = f.createVariable('time', np.float64, ())
+        t.standard_name = 'time'
+        t.units = units
+        t.calendar = calendar
+        t[...] = cftime.date2num(datetime_, units, calendar)
+
+        # full checkpoint these contents are changes to (if any)
+        # (stored relative to the checkpoint, in the same directory)
+        if base is not None:
+            f.base = path.basename(base)
+        # position in the sequence of checkpoints (if any)
+        if index is not None:
+            f.chain_index = index
+
+        _write_group(f, contents)
+
+    replace(partial, filepath)
+
+
+def _write_group(group, contents):
+    # nested dictionaries are stored as groups, tuples of dimensions
+    # and array as variables, and any other item as an attribute
+    for name, item in contents.items():
+        if isinstance(item, dict):
+            _write_group(group.createGroup(name), item)
+        elif isinstance(item, tuple):
+            dims, array = item
+            array = np.asanyarray(array)
+            for dim, size in zip(dims, array.shape):
+                if dim not in group.dimensions:
+                    group.createDimension(dim, size)
+            options = {}
+            if array.ndim and np.issubdtype(array.dtype, np.floating):
+                options = variable_layout('dumps', array.shape, array.dtype)
+                # (no time dimension in checkpoint, one chunk per array)
+                options.pop('chunksizes')
+            v = group.createVariable(name, array.dtype, dims, **options)
+            v[...] = array
+        else:
+            group.setncattr(name, item)
+
+
+def remove_checkpoint(filepath, writer=None):
+    # delete a checkpoint file (once written if the write is deferred)
+    call_with(writer, _remove_checkpoint, filepath)
+
+
+def _remove_checkpoint(filepath):
+    if path.exists(filepath):
+        remove(filepath)
+
+
+def load_checkpoint(filepath):
+    # read back the contents of a checkpoint file and its snapshot in
+    # time (variables being read as arrays), replaying its changes on
+    # the contents of the checkpoint it is based on (if any)
+    with open_dataset(filepath, 'r') as f:
+        f.set_always_mask(False)
+        datetime_ = cftime.num2date(f.variables['time'][...].item(),
+                                    f.variables['time'].units,
+                                    f.variables['time'].calendar)
+        contents = _read_group(f)
+
+    del contents['time']
+    del contents['description']
+    contents.pop('chain_index', None)
+
+    base = contents.pop('base', None)
+    if base is not None:
+        contents = _merge_changes(
+            load_checkpoint(path.join(path.dirname(filepath), base))[0],
+            contents
+        )
+
+    return contents, datetime_
+
+
+def read_checkpoint_chain(filepath):
+    # get the position of a checkpoint in the sequence of checkpoints
+    # of its run (None if not stored) and the name of the checkpoint
+    # file it is based on (None if it is a full checkpoint)
+    with open_dataset(filepath, 'r') as f:
+        attributes = f.ncattrs()
+        index = (int(f.getncattr('chain_index'))
+                 if 'chain_index' in attributes else None)
+        base = f.getncattr('base') if 'base' in attributes else None
+    return index, base
+
+
+def _merge_changes(contents, changes):
+    for name, item in changes.items():
+        if isinstance(item, dict) and 'changed_blocks' in item:
+            contents[name] = _merge_blocks(contents[name], item)
+        elif isinstance(item, dict):
+            contents[name] = _merge_changes(contents.get(name, {}), item)
+        else:
+            contents[name] = item
+    return contents
+
+
+def _merge_blocks(array, changes):
+    # replace the blocks of the flattened array which have changed
+    array = np.ascontiguousarray(array)
+    flat = array.reshape(-1)
+    flat[_block_indices(changes['blocks'], changes['changed_blocks'],
+                        flat.size)] = changes['values']
+    return array
+
+
+def _block_indices(blocks, block_size, size):
+    # get the indices in the flattened array of the given blocks
+    indices = (np.asarray(blocks, dtype=np.int64)[:, np.newaxis] * block_size
+               + np.arange(block_size))
+    indices = indices.reshape(-1)
+    return indices[indices < size]
+
+
+def _get_block_size(dtype):
+    # get the number of values in one block of the arrays compared to
+    # determine the changes since the latest full checkpoint (using
+    # the target chunk size of dump files if set)
+    block_bytes = file_layout()['dumps']['chunk_bytes'] or _block_bytes
+    return max(block_bytes // np.dtype(dtype).itemsize, 1)
+
+
+def _get_digests(array, block_size):
+    # get a digest of each block of the flattened array
+    flat = np.ascontiguousarray(array).reshape(-1)
+    return [hashlib.blake2b(flat[i:i + block_size].tobytes(),
+                            digest_size=16).digest()
+            for i in range(0, flat.size, block_size)]
+
+
+def get_checkpoint_changes(contents, reference):
+    # get the variables in *contents* which differ from the ones in the
+    # *reference* digests (i.e. the digests of a full checkpoint), all
+    # the attributes being kept (they are small), and only the blocks
+    # which differ being kept for the variables partially changed
+    changes = {}
+    for name, item in contents.items():
+        if isinstance(item, dict):
+            changes[name] = get_checkpoint_changes(item,
+                                                   reference.get(name, {}))
+        elif isinstance(item, tuple):
+            array = np.ma.getdata(item[1])
+            if (name not in reference
+                    or reference[name][:2] != (array.shape, array.dtype)):
+                changes[name] = item
+                continue
+            block_size, reference_digests = reference[name][2:]
+            digests = _get_digests(array, block_size)
+            blocks = [b for b in range(len(digests))
+                      if digests[b] != reference_digests[b]]
+            if len(blocks) == len(digests):
+                # (all blocks changed, store the whole variable)
+                changes[name] = item
+            elif blocks:
+                flat = np.ascontiguousarray(array).reshape(-1)
+                changes[name] = {
+                    'changed_blocks': block_size,
+                    'blocks': (('blocks',), np.array(blocks, np.int64)),
+                    'values': (('values',), flat[_block_indices(
+                        blocks, block_size, flat.size)])
+                }
+        else:
+            changes[name] = item
+    return changes
+
+
+def get_checkpoint_digests(contents):
+    # get the shape, the dtype, the block size, and the digests of the
+    # blocks of each variable in *contents* (i.e. a full checkpoint),
+    # to determine the changes in the next checkpoints without holding
+    # a copy of the variables
+    digests = {}
+    for name, item in contents.items():
+        if isinstance(item, dict):
+            digests[name] = get_checkpoint_digests(item)
+        elif isinstance(item, tuple):
+            array = np.ma.getdata(item[1])
+            block_size = _get_block_size(array.dtype)
+            digests[name] = (array.shape, array.dtype, block_size,
+                             _get_digests(array, block_size))
+    return digests
+
+
+def unpack_checkpoint_contents(contents):
+    # get a copy of *contents* as it would be read back from a
+    # checkpoint file (i.e. arrays without their dimensions, and 0-d
+    # arrays as scalars), to be held in memory instead of written
+    unpacked = {}
+    for name, item in contents.items():
+        if isinstance(item, dict):
+            unpacked[name] = unpack_checkpoint_contents(item)
+        elif isinstance(item, tuple):
+            array = np.array(np.ma.getdata(item[1]))
+            unpacked[name] = array.item() if array.ndim == 0 else array
+        else:
+            unpacked[name] = item
+    return unpacked
+
+
+def _read_group(group):
+    contents = {name: _read_group(g) for name, g in group.groups.items()}
+    for name, v in group.variables.items():
+        array = v[...]
+        contents[name] = array.item() if np.ndim(array) == 0 else array
+    for name in group.ncattrs():
+        contents[name] = group.getncattr(name)
+
+    return contents
+
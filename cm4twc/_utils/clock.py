@@ -1,6 +1,5 @@
 import numpy as np
 from datetime import timedelta
-from cftime import date2num
 from math import gcd
 
 from ..time import TimeDomain
@@ -64,10 +63,10 @@ class Clock(object):
 
         # generate a TimeDomain for the Clock
         start_datetime = (
-            timedomains[self.categories[0]].bounds.datetime_array[0, 0]
+            timedomains[self.categories[0]].bounds_datetime_array[0, 0]
         )
         end_datetime = (
-            timedomains[self.categories[0]].bounds.datetime_array[-1, -1]
+            timedomains[self.categories[0]].bounds_datetime_array[-1, -1]
         )
 
         self.timedomain = TimeDomain.from_start_end_step(
@@ -80,10 +79,14 @@ class Clock(object):
         self.start_timeindex = 0
         self.end_timeindex = supermesh_length - 1
 
-        # initialise 'iterable' time attributes to the point in time just
-        # prior the actual specified start of the supermesh because the
+        # store numerical timestamps (in clock units) for the start of
+        # each step of the supermesh, so that no datetime arithmetic is
+        # required while iterating
+        self._timestamps = self.timedomain.bounds.array[:, 0]
+
+        # initialise 'iterable' time attribute to the index just prior
+        # the actual specified start of the supermesh because the
         # iterator needs to increment in time prior indexing the switches
-        self._current_datetime = start_datetime - supermesh_delta
         self._current_timeindex = self.start_timeindex - 1
 
     def _check_timedomain_compatibilities(self, timedomains):
@@ -117,11 +120,21 @@ class Clock(object):
         self.switches['dumping'][0::dumping_increment] = True
 
     def get_current_datetime(self):
-        return self._current_datetime
+        # datetime objects are only generated (once) if required
+        if self._current_timeindex < self.start_timeindex:
+            return (self.timedomain.bounds_datetime_array[0, 0]
+                    - self.timedelta)
+        return self.timedomain.bounds_datetime_array[
+            self._current_timeindex, 0
+        ]
 
     def get_current_timestamp(self):
-        return date2num(self._current_datetime, self.timedomain.units,
-                        self.timedomain.calendar)
+        # (index prior the start would wrap around to the end of the
+        # period, so fail rather than returning the last timestamp)
+        if self._current_timeindex < self.start_timeindex:
+            raise RuntimeError("clock has not started iterating yet, "
+                               "no current timestamp available")
+        return self._timestamps[self._current_timeindex]
 
     def get_current_timeindex(self, category):
         return (self._current_timeindex //
@@ -136,7 +149,6 @@ class Clock(object):
         if self._current_timeindex < self.end_timeindex:
             self._current_timeindex += 1
             index = self._current_timeindex
-            self._current_datetime += self.timedelta
 
             return (
                 *(self.switches[cat][index] for cat in self.categories),
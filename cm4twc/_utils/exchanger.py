@@ -1,10 +1,11 @@
 from os import path, sep
-from netCDF4 import Dataset
 from datetime import datetime
 import cftime
 import numpy as np
 
 from ..settings import dtype_float
+from .writer import (write_to, snapshot, locate_time, variable_layout,
+                     update_manifest, locate_snapshot, open_dataset)
 
 
 class Exchanger(object):
@@ -48,6 +49,7 @@ class Exchanger(object):
         # directories and files
         self.saving_directory = saving_directory
         self.dump_file = None
+        self._writer = None
 
     def set_up(self, clock, compass, overwrite=False):
         # (re)assign clock and compass to exchanger
@@ -245,29 +247,74 @@ class Exchanger(object):
 
         return weights
 
-    def initialise_(self, tag, overwrite=True):
-        self.dump_file = '_'.join([self.identifier, 'exchanger',
-                                   tag, 'dump_transfers.nc'])
-        if (overwrite or not path.exists(sep.join([self.saving_directory,
-                                                   self.dump_file]))):
+    def initialise_(self, tag, overwrite=True, dumping_format='separate',
+                    dumps=True, writer=None):
+        self.close_files()
+        if not dumps or dumping_format == 'consolidated':
+            # (transfers not dumped, or dumped in model checkpoints instead)
+            self.dump_file = None
+        else:
+            self.dump_file = '_'.join([self.identifier, 'exchanger',
+                                       tag, 'dump_transfers.nc'])
+        if self.dump_file is not None and (
+                overwrite or not path.exists(sep.join([self.saving_directory,
+                                                       self.dump_file]))):
             create_transfers_dump(
                 sep.join([self.saving_directory, self.dump_file]),
                 self.transfers, self.clock.timedomain,
                 self.compass.spacedomains
             )
+        # keep dump file open for the whole simulation
+        # (using the writer of the model, shared with the components)
+        self._writer = writer
 
     def dump_transfers(self, timestamp):
         update_transfers_dump(
             sep.join([self.saving_directory, self.dump_file]),
-            self.transfers, timestamp
+            self.transfers, timestamp, self._writer
         )
 
     def finalise_(self):
-        timestamp = self.clock.timedomain.bounds.array[-1, -1]
-        update_transfers_dump(
-            sep.join([self.saving_directory, self.dump_file]),
-            self.transfers, timestamp
-        )
+        if self.dump_file is not None:
+            timestamp = self.clock.timedomain.bounds.array[-1, -1]
+            update_transfers_dump(
+                sep.join([self.saving_directory, self.dump_file]),
+                self.transfers, timestamp, self._writer
+            )
+        self.close_files()
+
+    def get_checkpoint_contents(self, writer=None):
+        # get the latest transfers grouped by source component (as
+        # snapshots in case the write is deferred)
+        contents = {}
+        for trf in self.transfers:
+            src_cat = self.transfers[trf]['src_cat']
+            contents.setdefault(src_cat, {})[trf] = (
+                self.compass.spacedomains[src_cat].axes,
+                snapshot(self.transfers[trf]['slices'][-1], writer)
+            )
+        return contents
+
+    def set_checkpoint_contents(self, contents):
+        # set the latest transfers from the contents of a checkpoint
+        for trf in self.transfers:
+            src_cat = self.transfers[trf]['src_cat']
+            if trf in contents.get(src_cat, {}):
+                if self.transfers[trf].get('from') is None:
+                    continue
+                else:
+                    self.transfers[trf]['slices'][-1] = (
+                        contents[src_cat][trf]
+                    )
+            else:
+                raise KeyError("initial conditions for exchanger transfer "
+                               "'{}' not in checkpoint".format(trf))
+
+    def close_files(self):
+        # detach from the writer used during simulation (if any), the
+        # model owning it being responsible for closing the dump file
+        # left open
+        self._writer = None
 
     def get_transfer(self, name, component):
         i = self.transfers[name][component]['iter']
@@ -331,7 +378,7 @@ class Exchanger(object):
 
 
 def create_transfers_dump(filepath, transfers_info, timedomain, spacedomains):
-    with Dataset(filepath, 'w') as f:
+    with open_dataset(filepath, 'w') as f:
         # description
         f.description = "Dump file created on {}".format(
             datetime.now().strftime('%Y-%m-%d at %H:%M:%S'))
@@ -370,38 +417,48 @@ def create_transfers_dump(filepath, transfers_info, timedomain, spacedomains):
 
         # transfer variables
         for trf in transfers_info:
-            s = f.groups[transfers_info[trf]['src_cat']].createVariable(
-                trf, dtype_float(), ('time', *axes)
+            src_cat = transfers_info[trf]['src_cat']
+            s = f.groups[src_cat].createVariable(
+                trf, dtype_float(), ('time', *spacedomains[src_cat].axes),
+                **variable_layout('dumps', spacedomains[src_cat].shape,
+                                  dtype_float())
             )
             s.standard_name = trf
             s.units = transfers_info[trf]['units']
 
+    # list the (yet to be written) snapshots in a manifest
+    update_manifest(filepath, {}, timedomain.units, timedomain.calendar)
 
-def update_transfers_dump(filepath, transfers, timestamp):
-    with Dataset(filepath, 'a') as f:
-        try:
-            # check whether given snapshot already in file
-            t = cftime.time2index(timestamp, f.variables['time'])
-        # will get a IndexError if time variable is empty
-        # will get a ValueError if timestamp not in time variable
-        except (IndexError, ValueError):
-            # if not, extend time dimension
-            t = len(f.variables['time'])
-            f.variables['time'][t] = timestamp
-
-        for trf in transfers:
-            f.groups[transfers[trf]['src_cat']].variables[trf][t, ...] = (
-                transfers[trf]['slices'][-1]
-            )
+
+def update_transfers_dump(filepath, transfers, timestamp, writer=None):
+    # take a snapshot of the transfers (in case the write is deferred)
+    values = {
+        trf: (transfers[trf]['src_cat'],
+              snapshot(transfers[trf]['slices'][-1], writer))
+        for trf in transfers
+    }
+    write_to(filepath, writer, _write_transfers_dump, values, timestamp)
+
+
+def _write_transfers_dump(f, times, values, timestamp):
+    # get index of snapshot in file (extending time dimension if new)
+    t = locate_time(f, times, timestamp)
+
+    for trf, (src_cat, value) in values.items():
+        f.groups[src_cat].variables[trf][t, ...] = value
 
 
 def load_transfers_dump(filepath, datetime_, transfers_info):
     transfers = {}
 
-    with Dataset(filepath, 'r') as f:
+    with open_dataset(filepath, 'r') as f:
         f.set_always_mask(False)
         # determine point in time to use from the dump
-        if datetime_ is None:
+        located = locate_snapshot(filepath, f, datetime_)
+        if located is not None:
+            # use manifest of the dump rather than decoding its time
+            t, datetime_ = located
+        elif datetime_ is None:
             # if not specified, use the last time index
             t = -1
             datetime_ = cftime.num2date(f.variables['time'][-1],
@@ -0,0 +1,335 @@
+from contextlib import contextmanager
+from threading import Thread, Lock, RLock
+from queue import Queue
+from os import path, replace
+import json
+from netCDF4 import Dataset
+import cftime
+import numpy as np
+
+from ..settings import sync_every, write_queue_size, file_layout
+
+# lock to hold around any call to the netCDF library (which is not
+# thread-safe), be it in the main thread or in the background thread
+# of a writer (re-entrant so that functions opening files can be
+# called while it is held)
+netcdf_lock = RLock()
+
+
+class Writer(object):
+    """Writer keeps the netCDF files it writes to open in append mode
+    until it is closed (instead of opening and closing them again for
+    every write), and synchronises their content to disk every
+    `sync_every` writes to a given file. For the files featuring a
+    manifest of their snapshots in time (i.e. dump files), the manifest
+    is only rewritten once the file is released or the writer closed
+    (rather than every time the file content is synchronised to disk),
+    a manifest out of line with its file being ignored when read.
+
+    If `write_queue_size` is strictly positive, the writes are performed
+    by a background thread, the values to write being copied into
+    buffers (recycled once written) and handed over to the thread
+    through a queue of this size. When the queue is full, handing over
+    a new write blocks until the thread has caught up. A model uses one
+    writer for all its files, shared by its components and its
+    exchanger, so that there is only one such thread. The thread holds
+    `netcdf_lock` while writing, and the main thread must hold it too
+    around its own calls to the netCDF library.
+    """
+
+    def __init__(self):
+        self.datasets = {}
+        self.writes = {}
+        # index of the timestamps in each file (built once when opened)
+        self.times = {}
+        # time units and calendar of the files featuring a manifest
+        self.manifests = {}
+
+        # background thread (if any) and its queue of pending writes
+        self._queue = None
+        self._thread = None
+        self._error = None
+        # buffers available for reuse (keys are shape and dtype), and
+        # buffers in use for the write being prepared
+        self._buffers = {}
+        self._buffers_lock = Lock()
+        self._pending_buffers = []
+
+        if write_queue_size() > 0:
+            self._queue = Queue(maxsize=write_queue_size())
+            self._thread = Thread(target=self._work, daemon=True)
+            self._thread.start()
+
+    @contextmanager
+    def append(self, filepath):
+        # open file only once, and keep it open for subsequent writes
+        if filepath not in self.datasets:
+            self.datasets[filepath] = Dataset(filepath, 'a')
+            self.writes[filepath] = 0
+            self.times[filepath] = index_time(self.datasets[filepath])
+            if path.exists(manifest_file(filepath)):
+                time = self.datasets[filepath].variables['time']
+                self.manifests[filepath] = (time.units, time.calendar)
+
+        yield self.datasets[filepath]
+
+        # flush file buffers to disk on the configured cadence
+        self.writes[filepath] += 1
+        if self.writes[filepath] % sync_every() == 0:
+            self.datasets[filepath].sync()
+
+    def _update_manifest(self, filepath):
+        if filepath in self.manifests:
+            update_manifest(filepath, self.times[filepath],
+                            *self.manifests[filepath])
+
+    def snapshot(self, array):
+        # values written synchronously do not need to be copied
+        if self._thread is None:
+            return array
+
+        array = np.asanyarray(array)
+        key = (array.shape, array.dtype.str, np.ma.isMaskedArray(array))
+        with self._buffers_lock:
+            pool = self._buffers.get(key)
+            buffer = pool.pop() if pool else None
+        if buffer is None:
+            buffer = (np.ma.empty(array.shape, array.dtype) if key[-1]
+                      else np.empty(array.shape, array.dtype))
+        buffer[...] = array
+        if key[-1]:
+            buffer.mask = np.ma.getmaskarray(array)
+
+        self._pending_buffers.append((key, buffer))
+        return buffer
+
+    def write(self, filepath, func, *args):
+        # *func* must write *args* to the dataset it receives first,
+        # using the index of its timestamps it receives second
+        if self._thread is None:
+            with netcdf_lock, self.append(filepath) as f:
+                func(f, self.times[filepath], *args)
+        else:
+            self._raise_error()
+            buffers, self._pending_buffers = self._pending_buffers, []
+            # blocks while queue is full
+            self._queue.put((filepath, func, args, buffers))
+
+    def call(self, func, *args):
+        # call *func* with *args* in turn with the writes (i.e. once the
+        # pending writes are done if these are performed in background)
+        if self._thread is None:
+            with netcdf_lock:
+                func(*args)
+        else:
+            self._raise_error()
+            # (buffers pending are left to the write they are taken for,
+            # so that they are not recycled before this write is done)
+            self._queue.put((None, func, args, []))
+
+    def release(self, filepath):
+        # close the given file once the pending writes to it are done
+        # (it is opened again if written to afterwards)
+        self.call(self._release, filepath)
+
+    def _release(self, filepath):
+        if filepath in self.datasets:
+            dataset = self.datasets.pop(filepath)
+            self.writes.pop(filepath)
+            dataset.close()
+            self._update_manifest(filepath)
+            self.times.pop(filepath)
+            self.manifests.pop(filepath, None)
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            filepath, func, args, buffers = item
+            # skip remaining writes once one failed, but keep emptying
+            # the queue so that the main thread never blocks forever
+            if self._error is None:
+                try:
+                    with netcdf_lock:
+                        if filepath is None:
+                            func(*args)
+                        else:
+                            with self.append(filepath) as f:
+                                func(f, self.times[filepath], *args)
+                except Exception as e:
+                    self._error = e
+            # make buffers available for reuse
+            with self._buffers_lock:
+                for key, buffer in buffers:
+                    self._buffers.setdefault(key, []).append(buffer)
+
+    def _raise_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise RuntimeError('background write to file '
+                               'failed') from error
+
+    def close(self):
+        # drain the queue of pending writes and stop background thread
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+        # close all files (which flushes their buffers to disk), even
+        # if some of them fail to close, to leave them in a valid state
+        error = None
+        for filepath, dataset in self.datasets.items():
+            try:
+                with netcdf_lock:
+                    dataset.close()
+                self._update_manifest(filepath)
+            except Exception as e:
+                error = e if error is None else error
+        self.datasets = {}
+        self.writes = {}
+        self.times = {}
+        self.manifests = {}
+
+        self._raise_error()
+        if error is not None:
+            raise error
+
+
+def write_to(filepath, writer, func, *args):
+    # write to the file using the writer if given (file remaining open
+    # and write possibly being deferred), otherwise opening the file
+    # just for this write (file being closed on exit)
+    if writer is None:
+        with open_dataset(filepath, 'a') as f:
+            times = index_time(f)
+            func(f, times, *args)
+            units = f.variables['time'].units
+            calendar = f.variables['time'].calendar
+        if path.exists(manifest_file(filepath)):
+            update_manifest(filepath, times, units, calendar)
+    else:
+        writer.write(filepath, func, *args)
+
+
+@contextmanager
+def open_dataset(filepath, mode='r'):
+    # open the netCDF file while holding the netCDF lock (released once
+    # the file is closed)
+    with netcdf_lock:
+        with Dataset(filepath, mode) as f:
+            yield f
+
+
+def call_with(writer, func, *args):
+    # call *func* with *args* in turn with the writes of the writer if
+    # given (call possibly being deferred), otherwise call it right away
+    if writer is None:
+        with netcdf_lock:
+            func(*args)
+    else:
+        writer.call(func, *args)
+
+
+def snapshot(array, writer=None):
+    # get a copy of the array if it is to be written later on
+    if writer is None:
+        return array
+    return writer.snapshot(array)
+
+
+def index_time(dataset):
+    # map each timestamp in the time variable of the file to its index
+    return {
+        timestamp: t for t, timestamp in enumerate(
+            np.ma.getdata(dataset.variables['time'][:]).tolist()
+        )
+    }
+
+
+def locate_time(dataset, times, timestamp, time_bounds=None):
+    # get index of timestamp in the time variable of the file, using
+    # the index of its timestamps *times* rather than searching the
+    # variable, and extend time dimension if timestamp not in file yet
+    if timestamp not in times:
+        t = len(times)
+        dataset.variables['time'][t] = timestamp
+        if time_bounds is not None:
+            dataset.variables['time_bounds'][t] = time_bounds
+        times[timestamp] = t
+    return times[timestamp]
+
+
+def manifest_file(filepath):
+    # get path to the manifest of the snapshots in time in the file
+    return path.splitext(filepath)[0] + '_manifest.json'
+
+
+def update_manifest(filepath, times, units, calendar):
+    # list the timestamps in the file in the order of their index in
+    # the time variable of the file (writing to a temporary file first
+    # and then renaming it, so that the manifest is never half-written)
+    partial = manifest_file(filepath) + '.part'
+    with open(partial, 'w') as f:
+        json.dump({'units': units, 'calendar': calendar,
+                   'snapshots': sorted(times, key=times.get)}, f)
+    replace(partial, manifest_file(filepath))
+
+
+def locate_snapshot(filepath, dataset, datetime_=None):
+    # get the index of the snapshot at *datetime_* (or of the last
+    # snapshot if not provided) in the time variable of the file and
+    # its datetime using the manifest of the file (rather than decoding
+    # the whole time variable), None if the manifest is missing, does
+    # not list the snapshot, or is not in line with the file
+    try:
+        with open(manifest_file(filepath), 'r') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    snapshots = manifest['snapshots']
+    if not snapshots or len(snapshots) != dataset.dimensions['time'].size:
+        return None
+
+    if datetime_ is None:
+        t = len(snapshots) - 1
+        datetime_ = cftime.num2date(snapshots[t], manifest['units'],
+                                    manifest['calendar'])
+    else:
+        timestamp = cftime.date2num(datetime_, manifest['units'],
+                                    manifest['calendar'])
+        if timestamp not in snapshots:
+            return None
+        t = snapshots.index(timestamp)
+
+    return t, datetime_
+
+
+def variable_layout(kind, shape, dtype):
+    # get the options to create a netCDF data variable of the given
+    # kind of file, *shape* being the shape of one snapshot in time
+    layout = file_layout()[kind]
+
+    options = {'zlib': layout['zlib']}
+    if layout['zlib']:
+        options['complevel'] = layout['complevel']
+        options['shuffle'] = layout['shuffle']
+    if layout['least_significant_digit'] is not None:
+        options['least_significant_digit'] = (
+            layout['least_significant_digit']
+        )
+
+    # split largest dimension of snapshot in halves until chunk fits
+    # in target size (if any)
+    chunk = list(shape)
+    if layout['chunk_bytes'] is not None:
+        while (layout['time_chunk'] * int(np.prod(chunk))
+               * np.dtype(dtype).itemsize > layout['chunk_bytes']
+               and max(chunk, default=1) > 1):
+            i = chunk.index(max(chunk))
+            chunk[i] = -(-chunk[i] // 2)
+    options['chunksizes'] = (layout['time_chunk'], *chunk)
+
+    return options
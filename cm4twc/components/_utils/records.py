@@ -1,10 +1,15 @@
 import numpy as np
-from netCDF4 import Dataset
+from os import path, remove
+from glob import glob
 from datetime import datetime, timedelta
+from functools import lru_cache
 import cftime
 
 from ...time import TimeDomain
 from ...settings import dtype_float
+from ..._utils.writer import (write_to, call_with, snapshot, locate_time,
+                              variable_layout, update_manifest,
+                              locate_snapshot, open_dataset)
 
 
 # dictionary of supported aggregation methods
@@ -24,6 +29,126 @@ _methods_map = {
     'maximum': 'maximum'
 }
 
+# dictionary of running accumulators required by each aggregation
+# method (keys are the method names as found in values of _methods_map)
+_methods_accumulators = {
+    'mean': ('sum', 'count'),
+    'sum': ('sum',),
+    'point': ('last',),
+    'minimum': ('minimum',),
+    'maximum': ('maximum',)
+}
+
+# dictionary of values to (re)initialise the running accumulators with
+_accumulators_init = {
+    'sum': 0.0,
+    'count': 0.0,
+    'last': np.nan,
+    'minimum': np.nan,
+    'maximum': np.nan,
+    'above': 0.0,
+    'histogram': 0.0
+}
+
+# dictionary of supported parameterised aggregation methods, whose
+# parameters follow the method name separated by underscores (keys
+# are the method names, values are the names of their parameters)
+# - 'exceedance': number of values above a threshold
+#   (e.g. 'exceedance_10'),
+# - 'histogram': number of values in each of *bins* bins of equal
+#   width between *lower* and *upper* (values outside of the range
+#   are counted in the first/last bin) (e.g. 'histogram_0_100_20'),
+# - 'quantile': quantile *q* estimated from the histogram of the
+#   values (mergeable and of bounded size, unlike the values
+#   themselves) by linear interpolation within the bin the quantile
+#   falls in (e.g. 'quantile_0.9_0_100_20')
+_parameterised_methods = {
+    'exceedance': ('threshold',),
+    'histogram': ('lower', 'upper', 'bins'),
+    'quantile': ('q', 'lower', 'upper', 'bins')
+}
+
+
+@lru_cache(maxsize=None)
+def _parse(method):
+    # split the name of a (possibly parameterised) aggregation method or
+    # accumulator into its kind and its parameters (e.g. 'histogram_0_1_4'
+    # gives ('histogram', (0.0, 1.0, 4.0)), and 'mean' gives ('mean', ()))
+    kind, *parameters = method.split('_')
+    return kind, tuple(float(p) for p in parameters)
+
+
+def _get_method(method):
+    # get the name of the method a supported method (or alias) maps to
+    if method in _methods_map:
+        return _methods_map[method]
+
+    kind = str(method).split('_')[0]
+    if kind not in _parameterised_methods:
+        raise ValueError('method {} unknown'.format(method))
+    try:
+        _, parameters = _parse(method)
+    except ValueError:
+        raise ValueError('method {} parameters must be numbers'.format(method))
+    if len(parameters) != len(_parameterised_methods[kind]):
+        raise ValueError('method {} requires parameters {}'.format(
+            method, ', '.join(_parameterised_methods[kind])))
+    if kind in ['histogram', 'quantile']:
+        lower, upper, bins = parameters[-3:]
+        if not upper > lower or not bins.is_integer() or bins < 1:
+            raise ValueError('method {} histogram range or number of bins '
+                             'invalid'.format(method))
+    if kind == 'quantile' and not 0 <= parameters[0] <= 1:
+        raise ValueError('method {} quantile not between 0 and '
+                         '1'.format(method))
+    return method
+
+
+def _get_accumulators(method):
+    # get the running accumulators required by an aggregation method
+    if method in _methods_accumulators:
+        return _methods_accumulators[method]
+
+    kind, parameters = _parse(method)
+    if kind == 'exceedance':
+        return ('_'.join(['above', method.split('_', 1)[1]]),)
+    elif kind == 'histogram':
+        return (method,)
+    elif kind == 'quantile':
+        return ('_'.join(['histogram', method.split('_', 2)[2]]),)
+
+
+def _get_bins(method):
+    # get the number of bins of a histogram-based method or accumulator
+    # (values then feature an additional trailing dimension for bins)
+    kind, parameters = _parse(method)
+    return (int(parameters[-1]),) if kind == 'histogram' else ()
+
+
+def _quantile_from_histogram(histogram, q, lower, upper):
+    # estimate quantile *q* from the counts in bins of equal width
+    # between *lower* and *upper* (last axis of *histogram*), by linear
+    # interpolation within the bin where the quantile falls
+    bins = histogram.shape[-1]
+    cumulative = np.cumsum(histogram, axis=-1)
+    total = cumulative[..., -1]
+    target = q * total
+
+    # first bin where cumulative count reaches target (i.e. first
+    # non-empty bin if target is zero)
+    b = np.where(target > 0,
+                 np.sum(cumulative < target[..., np.newaxis], axis=-1),
+                 np.argmax(histogram > 0, axis=-1))
+    b = np.minimum(b, bins - 1)[..., np.newaxis]
+    inside = np.take_along_axis(histogram, b, axis=-1)[..., 0]
+    before = np.take_along_axis(cumulative, b, axis=-1)[..., 0] - inside
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fraction = np.where(inside > 0, (target - before) / inside, 0.0)
+    value = lower + (b[..., 0] + fraction) * (upper - lower) / bins
+
+    return np.where(total > 0, value, np.nan)
+
 
 def _delta_to_frequency_tag(delta):
     if delta % timedelta(weeks=1) == timedelta(seconds=0):
@@ -73,6 +198,31 @@ def _delta_to_frequency_str(delta):
     return '{}{}'.format(factor, period)
 
 
+def nest_record_streams(streams):
+    # feed a stream with the aggregates of the stream of shorter delta
+    # recording the same variable (instead of with raw values) if the
+    # latter's delta divides the former's (the longest such delta is
+    # retained); streams are processed from the longest delta to the
+    # shortest one, so that all the accumulators required by a stream
+    # (i.e. by its own methods and by the streams it feeds) are known
+    # before it is itself mapped to its feeding stream
+    deltas = sorted(streams)
+    for i in reversed(range(len(deltas))):
+        stream = streams[deltas[i]]
+        for name, record in stream.records.items():
+            for delta in reversed(deltas[:i]):
+                source = streams[delta]
+                if (name in source.records
+                        and source.stations == stream.stations
+                        and deltas[i] % delta == timedelta(seconds=0)):
+                    record.streams.remove(stream)
+                    stream.sources[name] = delta
+                    source.children.setdefault(name, []).append(stream)
+                    source.accumulated[name].update(
+                        stream.accumulated[name])
+                    break
+
+
 class Record(object):
 
     def __init__(self, name, units, **kwargs):
@@ -102,9 +252,51 @@ class OutputRecord(Record):
             s.update_record(self.name, outputs[self.name])
 
 
+def locate_stations(stations, spacedomain):
+    # get the indices (one per space axis) of the given stations, which
+    # may be given as a boolean array (stations are then named after
+    # their index in flattened space), or as a dictionary with station
+    # names for keys and for values either a sequence of indices (one
+    # per space axis) or a dictionary of coordinates (one per space
+    # axis) to locate in the cell bounds (e.g. {'Y': 51.5, 'X': -1.2})
+    if not isinstance(stations, dict):
+        mask = np.asarray(stations, dtype=bool)
+        if mask.shape != spacedomain.shape:
+            raise ValueError('stations mask shape incompatible with '
+                             'spacedomain shape')
+        return {str(i): [int(j) for j in np.unravel_index(i, mask.shape)]
+                for i in np.flatnonzero(mask).tolist()}
+
+    located = {}
+    for station, location in stations.items():
+        if isinstance(location, dict):
+            indices = []
+            for axis in spacedomain.axes:
+                bounds = getattr(spacedomain, axis + '_bounds').array
+                inside = np.flatnonzero(
+                    (location[axis] >= bounds.min(axis=-1))
+                    & (location[axis] < bounds.max(axis=-1))
+                )
+                if not inside.size:
+                    raise ValueError('station {} outside of spacedomain '
+                                     'along {} axis'.format(station, axis))
+                indices.append(int(inside[0]))
+        else:
+            indices = [int(i) for i in location]
+            if (len(indices) != len(spacedomain.shape)
+                    or not all(0 <= i < n for i, n
+                               in zip(indices, spacedomain.shape))):
+                raise ValueError('station {} indices incompatible with '
+                                 'spacedomain shape'.format(station))
+        located[str(station)] = indices
+
+    return located
+
+
 class RecordStream(object):
 
-    def __init__(self, delta):
+    def __init__(self, delta, stations=None, gather_land=False,
+                 rotation_months=None):
         # check delta validity
         if not isinstance(delta, timedelta):
             raise ValueError('invalid recording frequency {}'.format(delta))
@@ -112,6 +304,8 @@ class RecordStream(object):
         # instantiate attributes to hold temporal information
         self.delta = delta
         self.frequency = _delta_to_frequency_tag(delta)
+        if stations is not None:
+            self.frequency = '_'.join([self.frequency, 'stations'])
         self.length = 0
         self.timedomain = None
         self.time = None
@@ -120,20 +314,57 @@ class RecordStream(object):
 
         # instantiate attributes to hold spatial information
         self.spacedomain = None
+        # whether records are stored compressed by gathering, and the
+        # indices of land points in flattened space (only if records
+        # are stored compressed by gathering, None otherwise)
+        self.gather_land = gather_land
+        self.land_points = None
+        # indices of stations (keys are station names, values are their
+        # indices along each space axis), only if records are extracted
+        # at stations rather than for the whole space, None otherwise
+        self.stations = stations
+        self.station_index = None
+        # shape of the values aggregated by the stream
+        self.shape = None
 
         # instantiate holders for file paths
         self.file = None
         self.dump_file = None
+        # number of calendar months covered by one record file (only if
+        # record files are rotated, None otherwise), pattern for the
+        # paths of the record files (to be formatted with the period
+        # they cover), and whether to overwrite existing record files
+        self.rotation = rotation_months
+        self.file_pattern = None
+        self.file_overwrite = None
+        # writer keeping files open during simulation (if any)
+        self.writer = None
+        # arrays holding the records in memory instead of in a file
+        # (keys are record names joined with their method), if any,
+        # and time index of the first record held in memory (i.e. not
+        # zero if the stream was revived)
+        self.memory = None
+        self.memory_start = None
 
         # mapping to store record objects (keys are record names)
         self.records = {}
         # mapping to store record methods (keys are record names)
         self.methods = {}
-        # mapping to store record arrays (keys are record names)
-        self.arrays = {}
-        # mapping for integer tracker to know where in array to write next
-        # (keys are record names)
-        self.array_trackers = {}
+        # mapping to store running accumulators (keys are record names,
+        # values are mappings with accumulator names for keys)
+        self.accumulators = {}
+        # mapping to store names of accumulators required by the stream
+        # and by the streams it feeds (keys are record names)
+        self.accumulated = {}
+        # mapping to store streams of longer delta fed with the
+        # aggregates of this stream (keys are record names)
+        self.children = {}
+        # mapping to store delta of stream feeding this stream with its
+        # aggregates, None if fed with raw values (keys are record names)
+        self.sources = {}
+        # mapping for integer tracker to know how many values have been
+        # accumulated since last write (keys are record names)
+        self.trackers = {}
 
         # integers to track when to write to file
         self.trigger = None
@@ -150,8 +381,8 @@ class RecordStream(object):
                           // timedomain.timedelta.total_seconds())
         # create timedomain for stream
         self.timedomain = TimeDomain.from_start_end_step(
-            start=timedomain.bounds.datetime_array[0, 0],
-            end=timedomain.bounds.datetime_array[-1, -1] + self.delta,
+            start=timedomain.bounds_datetime_array[0, 0],
+            end=timedomain.bounds_datetime_array[-1, -1] + self.delta,
             step=self.delta,
             calendar=timedomain.calendar,
             units=timedomain.units
@@ -161,22 +392,59 @@ class RecordStream(object):
 
         # store spacedomain
         self.spacedomain = spacedomain
+        # determine land points to store if compressing by gathering
+        if self.gather_land:
+            if spacedomain.land_sea_mask is None:
+                raise ValueError('land sea mask required to only record '
+                                 'land points')
+            self.land_points = np.flatnonzero(spacedomain.land_sea_mask)
+        else:
+            self.land_points = None
+        # determine indices of the stations to extract values at
+        if self.stations is not None:
+            self.station_index = tuple(
+                np.array(index, dtype=int)
+                for index in zip(*self.stations.values())
+            )
+            self.shape = (len(self.stations),)
+        else:
+            self.shape = spacedomain.shape
 
-        # initialise record arrays for accumulating values
+        # initialise running accumulators for aggregating values
+        # (only the ones required by the aggregation methods)
         self.trigger = 0
         for name in self.records:
-            self.array_trackers[name] = 0
-            arr = np.zeros((self.length, *spacedomain.shape), dtype_float())
-            arr[:] = np.nan
-            self.arrays[name] = arr
-            # add on length of stream to the record trigger
-            self.trigger += self.length
+            self.trackers[name] = 0
+            self.accumulators[name] = {}
+            for acc in sorted(self.accumulated[name]):
+                self.accumulators[name][acc] = np.full(
+                    (*self.shape, *_get_bins(acc)),
+                    _accumulators_init[_parse(acc)[0]], dtype_float()
+                )
+            # add on number of values expected for the record during
+            # the stream delta to the record trigger
+            if self.sources[name] is None:
+                self.trigger += self.length
+            else:
+                self.trigger += self.delta // self.sources[name]
 
         if not _skip_trackers:
             # (re)initialise trackers
             self.time_tracker = 0
             self.trigger_tracker = 0
 
+    @property
+    def options(self):
+        # options the stream was instantiated with (if not defaults)
+        options = {}
+        if self.stations is not None:
+            options['stations'] = self.stations
+        if self.gather_land:
+            options['gather_land'] = True
+        if self.rotation is not None:
+            options['rotation_months'] = self.rotation
+        return options
+
     def add_record(self, record, methods):
         name = record.name
         # store link to record object
@@ -184,46 +452,136 @@ class RecordStream(object):
         # store sequence of aggregation methods
         methods_ = set()
         for method in methods:
-            if method in _methods_map:
-                methods_.add(_methods_map[method])
-            else:
-                raise ValueError('method {} for record {} aggregation '
-                                 'unknown'.format(method, name))
+            try:
+                methods_.add(_get_method(method))
+            except ValueError as e:
+                raise ValueError('{} for record {} aggregation'.format(
+                    e, name))
         self.methods[name] = methods_
-        # map this very stream in the record
+        # store accumulators required by aggregation methods
+        self.accumulated[name] = set(
+            acc for method in methods_
+            for acc in _get_accumulators(method)
+        )
+        # map this very stream in the record (i.e. fed with raw values)
         record.streams.append(self)
+        self.sources[name] = None
 
     def update_record(self, name, value):
-        self.arrays[name][self.array_trackers[name], ...] = value
-        self.array_trackers[name] += 1
+        # update running accumulators in place (ignoring NaN values)
+        value = np.asarray(value)
+        if self.station_index is not None:
+            # only aggregate values at stations
+            value = np.broadcast_to(
+                value, self.spacedomain.shape)[self.station_index]
+        accumulators = self.accumulators[name]
+        if 'sum' in accumulators or 'count' in accumulators:
+            missing = np.isnan(value)
+            if 'sum' in accumulators:
+                accumulators['sum'] += np.where(missing, 0.0, value)
+            if 'count' in accumulators:
+                accumulators['count'] += ~missing
+        if 'minimum' in accumulators:
+            np.fmin(accumulators['minimum'], value,
+                    out=accumulators['minimum'])
+        if 'maximum' in accumulators:
+            np.fmax(accumulators['maximum'], value,
+                    out=accumulators['maximum'])
+        if 'last' in accumulators:
+            accumulators['last'][...] = value
+        for acc, array in accumulators.items():
+            kind, parameters = _parse(acc)
+            if kind == 'above':
+                # (NaN values are not above any threshold)
+                array += np.greater(value, parameters[0])
+            elif kind == 'histogram':
+                # increment the bin each value falls in (there is only
+                # one bin per location, so fancy indexing can be used)
+                lower, upper, bins = parameters
+                bins = int(bins)
+                value_ = np.broadcast_to(value, array.shape[:-1]).ravel()
+                locations = np.flatnonzero(~np.isnan(value_))
+                with np.errstate(invalid='ignore'):
+                    b = np.clip(
+                        np.floor((value_[locations] - lower)
+                                 / (upper - lower) * bins),
+                        0, bins - 1
+                    ).astype(int)
+                array.reshape(-1, bins)[locations, b] += 1
+
+        self._track_update(name)
+
+    def update_record_from_stream(self, name, aggregates):
+        # merge accumulators of a stream of shorter delta into the
+        # running accumulators (i.e. sum of sums, min of mins, etc.)
+        accumulators = self.accumulators[name]
+        if 'sum' in accumulators:
+            accumulators['sum'] += aggregates['sum']
+        if 'count' in accumulators:
+            accumulators['count'] += aggregates['count']
+        if 'minimum' in accumulators:
+            np.fmin(accumulators['minimum'], aggregates['minimum'],
+                    out=accumulators['minimum'])
+        if 'maximum' in accumulators:
+            np.fmax(accumulators['maximum'], aggregates['maximum'],
+                    out=accumulators['maximum'])
+        if 'last' in accumulators:
+            accumulators['last'][...] = aggregates['last']
+        for acc, array in accumulators.items():
+            if _parse(acc)[0] in ['above', 'histogram']:
+                array += aggregates[acc]
+
+        self._track_update(name)
+
+    def _track_update(self, name):
+        self.trackers[name] += 1
         self.trigger_tracker += 1
         if self.trigger_tracker == self.trigger:
             self.update_record_to_stream_file()
 
     def create_record_stream_file(self, filepath):
         self.file = filepath
+        self._create_record_stream_file(filepath)
 
-        with Dataset(self.file, 'w') as f:
+    def _create_record_stream_file(self, filepath):
+        with open_dataset(filepath, 'w') as f:
             axes = self.spacedomain.axes
             # dimension for space and time lower+upper bounds
             f.createDimension('nv', 2)
-            # space coordinate dimensions and coordinate variables
-            for axis in axes:
-                # dimension (domain axis)
-                f.createDimension(axis, len(getattr(self.spacedomain, axis)))
-                # variables
-                # (domain coordinate)
-                coord = self.spacedomain.to_field().construct(axis)
-                a = f.createVariable(axis, dtype_float(), (axis,))
-                a.standard_name = coord.standard_name
-                a.units = coord.units
-                a.bounds = axis + '_bounds'
-                a[:] = coord.array
-                # (domain coordinate bounds)
-                b = f.createVariable(axis + '_bounds', dtype_float(),
-                                     (axis, 'nv'))
-                b.units = coord.units
-                b[:] = coord.bounds.array
+            if self.stations is not None:
+                # station dimension and coordinate variables
+                # (as time series discrete sampling geometry)
+                f.featureType = 'timeSeries'
+                f.createDimension('station', len(self.stations))
+                st = f.createVariable('station_name', str, ('station',))
+                st.cf_role = 'timeseries_id'
+                st[:] = np.array(list(self.stations), dtype=object)
+                for axis, index in zip(axes, self.station_index):
+                    # (domain coordinate at stations)
+                    coord = self.spacedomain.to_field().construct(axis)
+                    a = f.createVariable(axis, dtype_float(), ('station',))
+                    a.standard_name = coord.standard_name
+                    a.units = coord.units
+                    a[:] = coord.array[index]
+            else:
+                # space coordinate dimensions and coordinate variables
+                for axis in axes:
+                    # dimension (domain axis)
+                    f.createDimension(axis,
+                                      len(getattr(self.spacedomain, axis)))
+                    # variables
+                    # (domain coordinate)
+                    coord = self.spacedomain.to_field().construct(axis)
+                    a = f.createVariable(axis, dtype_float(), (axis,))
+                    a.standard_name = coord.standard_name
+                    a.units = coord.units
+                    a.bounds = axis + '_bounds'
+                    a[:] = coord.array
+                    # (domain coordinate bounds)
+                    b = f.createVariable(axis + '_bounds', dtype_float(),
+                                         (axis, 'nv'))
+                    b.units = coord.units
+                    b[:] = coord.bounds.array
 
             # time coordination dimension and coordinate variable
             f.createDimension('time', None)
@@ -236,69 +594,248 @@ class RecordStream(object):
             b.units = self.timedomain.units
             b.calendar = self.timedomain.calendar
 
+            # list variable for compression by gathering (if required)
+            if self.land_points is not None:
+                f.createDimension('land', self.land_points.size)
+                lp = f.createVariable('land', np.int64, ('land',))
+                lp.compress = ' '.join(axes)
+                lp[:] = self.land_points
+                dims = ('land',)
+                shape = self.land_points.shape
+            elif self.stations is not None:
+                dims = ('station',)
+                shape = self.shape
+            else:
+                dims = axes
+                shape = self.spacedomain.shape
+
             for name, record in self.records.items():
                 # record variable
                 for method in self.methods[name]:
                     name_method = '_'.join([name, method])
-                    v = f.createVariable(name_method, dtype_float(),
-                                         ('time', *axes))
+                    kind, parameters = _parse(method)
+                    bins = _get_bins(method)
+                    if bins:
+                        # bin dimension and coordinate variables
+                        bin_ = '_'.join([name_method, 'bin'])
+                        f.createDimension(bin_, bins[0])
+                        edges = np.linspace(*parameters, bins[0] + 1)
+                        c = f.createVariable(bin_, dtype_float(), (bin_,))
+                        c.units = record.units
+                        c.bounds = bin_ + '_bounds'
+                        c[:] = (edges[:-1] + edges[1:]) / 2
+                        b = f.createVariable(bin_ + '_bounds',
+                                             dtype_float(), (bin_, 'nv'))
+                        b.units = record.units
+                        b[:] = np.stack([edges[:-1], edges[1:]], axis=-1)
+                    v = f.createVariable(
+                        name_method, dtype_float(),
+                        ('time', *dims,
+                         *(['_'.join([name_method, 'bin'])] if bins else [])),
+                        **variable_layout('records', (*shape, *bins),
+                                          dtype_float())
+                    )
                     v.standard_name = name
-                    v.units = record.units
+                    v.units = ('1' if kind in ['exceedance', 'histogram']
+                               else record.units)
+                    if self.stations is not None:
+                        v.coordinates = ' '.join([*axes, 'station_name'])
                     v.cell_methods = "time: {} over {}".format(
-                        method, _delta_to_frequency_str(self.timedomain.timedelta)
+                        kind if kind in _parameterised_methods else method,
+                        _delta_to_frequency_str(self.timedomain.timedelta)
                     )
+                    if kind in _parameterised_methods:
+                        for parameter, value in zip(
+                                _parameterised_methods[kind], parameters):
+                            setattr(v, parameter, value)
+
+    def set_record_stream_files(self, filepath, overwrite):
+        # only store the path pattern for the record files, each record
+        # file being created when the period it covers is reached
+        self.file = None
+        self.file_pattern = '_'.join([path.splitext(filepath)[0],
+                                      '{}.nc'])
+        self.file_overwrite = overwrite
+
+        # remove the files of all periods if overwriting, so that none
+        # left by a previous (e.g. longer) simulation remains mixed up
+        # with the files of this simulation
+        if overwrite:
+            for file_ in glob(self.file_pattern.format(
+                    '[0-9]' * 6 + '-' + '[0-9]' * 6)):
+                remove(file_)
+
+    def _rotate_record_stream_file(self):
+        # determine period covered by the record file the next record
+        # is to be written to (from the lower bound of the record)
+        start = self.timedomain.bounds_datetime_array[self.time_tracker, 0]
+        first = start.year * 12 + start.month - 1
+        first -= first % self.rotation
+        last = first + self.rotation - 1
+        file_ = self.file_pattern.format(
+            '{:04d}{:02d}-{:04d}{:02d}'.format(first // 12, first % 12 + 1,
+                                              last // 12, last % 12 + 1)
+        )
+
+        if file_ != self.file:
+            # close file of completed period (so that it can be used
+            # while the simulation continues)
+            if self.file is not None and self.writer is not None:
+                self.writer.release(self.file)
+            # create file for new period (unless it exists already and
+            # must not be overwritten, e.g. when resuming a simulation)
+            if self.file_overwrite or not path.exists(file_):
+                call_with(self.writer, self._create_record_stream_file,
+                          file_)
+            self.file = file_
 
     def update_record_to_stream_file(self):
-        with Dataset(self.file, 'a') as f:
-            time_ = self.time[self.time_tracker]
-            time_bounds = self.time_bounds[self.time_tracker]
-            try:
-                # check whether given snapshot already in file
-                t = cftime.time2index(time_, f.variables['time'])
-            # will get a IndexError if time variable is empty
-            # will get a ValueError if timestamp not in time variable
-            except (IndexError, ValueError):
-                # if not, extend time dimension
-                t = len(f.variables['time'])
-                f.variables['time'][t] = time_
-                f.variables['time_bounds'][t] = time_bounds
-
-            for name, array in self.arrays.items():
-                for method in self.methods[name]:
-                    name_method = '_'.join([name, method])
+        time_ = self.time[self.time_tracker]
+        time_bounds = self.time_bounds[self.time_tracker]
 
-                    # proceed with required aggregation
-                    if method == 'mean':
-                        value = np.nanmean(array, axis=0)
-                    elif method == 'sum':
-                        value = np.nansum(array, axis=0)
-                    elif method == 'point':
-                        value = array[self.array_trackers[name] - 1]
-                    elif method == 'minimum':
-                        value = np.nanmin(array, axis=0)
-                    elif method == 'maximum':
-                        value = np.nanmax(array, axis=0)
-
-                    # store result in file
-                    f.variables[name_method][t] = np.ma.array(
-                        value, mask=(~self.spacedomain.land_sea_mask
-                                     if self.spacedomain.land_sea_mask
-                                     is not None else None)
-                    )
+        # switch to the file of a new period if need be (before taking
+        # any snapshot, so that they are all handed over to the write)
+        if self.memory is None and self.file_pattern is not None:
+            self._rotate_record_stream_file()
 
-                # reset array tracker to point to start of array again
-                self.array_trackers[name] = 0
-                # reset values in array
-                array[:] = np.nan
-            # increment time tracker to next writing time
-            self.time_tracker += 1
-            # reset trigger tracker
-            self.trigger_tracker = 0
+        # (no snapshot required when values are copied in memory now)
+        writer = self.writer if self.memory is None else None
+
+        values = {}
+        for name, accumulators in self.accumulators.items():
+            for method in self.methods[name]:
+                name_method = '_'.join([name, method])
+
+                # finalise required aggregation from running accumulators
+                # (snapshot because accumulators are reset after write)
+                if method == 'mean':
+                    with np.errstate(divide='ignore', invalid='ignore'):
+                        value = np.where(
+                            accumulators['count'] > 0,
+                            accumulators['sum'] / accumulators['count'],
+                            np.nan
+                        )
+                elif method == 'sum':
+                    value = snapshot(accumulators['sum'], writer)
+                elif method == 'point':
+                    value = snapshot(accumulators['last'], writer)
+                elif method == 'minimum':
+                    value = snapshot(accumulators['minimum'], writer)
+                elif method == 'maximum':
+                    value = snapshot(accumulators['maximum'], writer)
+                else:
+                    kind, parameters = _parse(method)
+                    if kind == 'quantile':
+                        value = _quantile_from_histogram(
+                            accumulators[_get_accumulators(method)[0]],
+                            *parameters[:3]
+                        )
+                    else:
+                        # (exceedance and histogram are accumulators)
+                        value = snapshot(
+                            accumulators[_get_accumulators(method)[0]],
+                            writer
+                        )
+
+                values[name_method] = value
+
+        if self.memory is not None:
+            # store result in memory
+            for name_method, value in values.items():
+                self.memory[name_method][self.time_tracker] = value
+        else:
+            write_to(self.file, self.writer, self._write_to_stream_file,
+                     values, time_, time_bounds)
+
+        for name, accumulators in self.accumulators.items():
+            # feed streams of longer delta with aggregates
+            for stream in self.children.get(name, []):
+                stream.update_record_from_stream(name, accumulators)
+            # reset tracker to start accumulating again
+            self.trackers[name] = 0
+            # reset values in accumulators
+            for acc, array in accumulators.items():
+                array[...] = _accumulators_init[_parse(acc)[0]]
+        # increment time tracker to next writing time
+        self.time_tracker += 1
+        # reset trigger tracker
+        self.trigger_tracker = 0
+
+    def _write_to_stream_file(self, f, times, values, time_, time_bounds):
+        # get index of snapshot in file (extending time dimension if new)
+        t = locate_time(f, times, time_, time_bounds)
+
+        for name_method, value in values.items():
+            # store result in file
+            if self.land_points is not None:
+                # (only land points if compressing by gathering)
+                f.variables[name_method][t] = np.reshape(
+                    value,
+                    (-1, *np.shape(value)[len(self.spacedomain.shape):])
+                )[self.land_points]
+            elif self.stations is not None:
+                # (only stations if extracting at stations)
+                f.variables[name_method][t] = value
+            else:
+                f.variables[name_method][t] = np.ma.array(
+                    value, mask=self._get_sea_mask(np.shape(value))
+                )
+
+    def _get_sea_mask(self, shape):
+        # get mask for values of the given shape outside of land (the
+        # space dimensions being leading, possibly followed by bins)
+        if self.spacedomain.land_sea_mask is None:
+            return None
+        mask = ~self.spacedomain.land_sea_mask
+        return np.broadcast_to(
+            np.reshape(mask, (*mask.shape,
+                              *[1] * (len(shape) - mask.ndim))),
+            shape
+        )
+
+    def create_record_stream_memory(self):
+        # allocate arrays to hold the records for the whole simulation
+        self.file = None
+        self.file_pattern = None
+        self.memory = {}
+        self.memory_start = self.time_tracker
+        for name in self.records:
+            for method in self.methods[name]:
+                self.memory['_'.join([name, method])] = np.full(
+                    (self.time.size, *self.shape, *_get_bins(method)),
+                    np.nan, dtype_float()
+                )
+
+    def get_records_from_memory(self):
+        # collect the records written so far with their time coordinates
+        # (values are masked outside of land if there is a land sea mask)
+        written = slice(self.memory_start, self.time_tracker)
+
+        records = {}
+        for name in self.records:
+            records[name] = {
+                'time': self.timedomain.datetime_array[1:][written],
+                'time_bounds': (
+                    self.timedomain.bounds_datetime_array[:-1][written]
+                )
+            }
+            if self.stations is not None:
+                records[name]['stations'] = list(self.stations)
+            for method in self.methods[name]:
+                array = self.memory['_'.join([name, method])][written]
+                mask = (self._get_sea_mask(array.shape[1:])
+                        if self.stations is None else None)
+                records[name][method] = (
+                    np.ma.array(array, mask=np.broadcast_to(mask, array.shape))
+                    if mask is not None else array
+                )
+
+        return records
 
     def create_record_stream_dump(self, filepath):
         self.dump_file = filepath
 
-        with Dataset(self.dump_file, 'w') as f:
+        with open_dataset(self.dump_file, 'w') as f:
             axes = self.spacedomain.axes
 
             # description
@@ -307,7 +844,6 @@ class RecordStream(object):
 
             # dimensions
             f.createDimension('time', None)
-            f.createDimension('length', self.length)
             for axis in axes:
                 f.createDimension(axis, len(getattr(self.spacedomain, axis)))
             f.createDimension('nv', 2)
@@ -317,8 +853,6 @@ class RecordStream(object):
             t.standard_name = 'time'
             t.units = self.timedomain.units
             t.calendar = self.timedomain.calendar
-            h = f.createVariable('length', np.uint32, ('length',))
-            h[:] = np.arange(self.length)
             for axis in axes:
                 coord = self.spacedomain.to_field().construct(axis)
                 # (domain coordinate)
@@ -333,60 +867,130 @@ class RecordStream(object):
                 b.units = coord.units
                 b[:] = coord.bounds.data.array
 
-            # records
+            # station dimension (if extracting at stations)
+            if self.stations is not None:
+                f.createDimension('station', len(self.stations))
+                dims = ('station',)
+            else:
+                dims = axes
+
+            # records (i.e. their running accumulators)
             for name, record in self.records.items():
-                s = f.createVariable(name, dtype_float(),
-                                     ('time', 'length', *axes),
-                                     fill_value=9.9692099683868690E36)
-                s.standard_name = name
-                s.units = record.units
+                for acc in self.accumulators[name]:
+                    # (bin dimension for histogram accumulators)
+                    bins = _get_bins(acc)
+                    if bins:
+                        f.createDimension('_'.join([name, acc, 'bin']),
+                                          bins[0])
+                    s = f.createVariable(
+                        '_'.join([name, acc]), dtype_float(),
+                        ('time', *dims,
+                         *(['_'.join([name, acc, 'bin'])] if bins else [])),
+                        fill_value=9.9692099683868690E36,
+                        **variable_layout('dumps', (*self.shape, *bins),
+                                          dtype_float())
+                    )
+                    s.standard_name = name
+                    s.units = ('1' if _parse(acc)[0] in ['count', 'above',
+                                                          'histogram']
+                               else record.units)
                 f.createVariable('_'.join([name, 'tracker']), int, ('time',))
 
             # stream-specific variables
             f.createVariable('time_tracker', int, ('time',))
             f.createVariable('trigger_tracker', int, ('time',))
 
+        # list the (yet to be written) snapshots in a manifest
+        update_manifest(self.dump_file, {}, self.timedomain.units,
+                        self.timedomain.calendar)
+
     def update_record_stream_dump(self, timestamp):
-        with Dataset(self.dump_file, 'a') as f:
-            try:
-                # check whether given snapshot already in file
-                t = cftime.time2index(timestamp, f.variables['time'])
-            # will get a IndexError if time variable is empty
-            # will get a ValueError if timestamp not in time variable
-            except (IndexError, ValueError):
-                # if not, extend time dimension
-                t = len(f.variables['time'])
-                f.variables['time'][t] = timestamp
+        # take a snapshot of the stream (in case the write is deferred)
+        arrays = {'_'.join([name, acc]): snapshot(array, self.writer)
+                  for name in self.records
+                  for acc, array in self.accumulators[name].items()}
+        trackers = {'_'.join([name, 'tracker']): self.trackers[name]
+                    for name in self.records}
+        trackers['time_tracker'] = self.time_tracker
+        trackers['trigger_tracker'] = self.trigger_tracker
 
-            for name in self.records:
-                f.variables[name][t, ...] = self.arrays[name]
-                f.variables['_'.join([name, 'tracker'])][t] = (
-                    self.array_trackers[name]
+        write_to(self.dump_file, self.writer, _write_record_stream_dump,
+                 arrays, trackers, timestamp)
+
+    def get_checkpoint_contents(self, writer=None):
+        # get the running accumulators and the trackers of the stream
+        # (as snapshots in case the write is deferred), alongside the
+        # start of the original simulation to revive the stream from
+        dims = (self.spacedomain.axes if self.stations is None
+                else ('station',))
+        contents = {
+            'start': self.timedomain.bounds.array[0, 0],
+            'units': self.timedomain.units,
+            'calendar': self.timedomain.calendar,
+            'time_tracker': ((), self.time_tracker),
+            'trigger_tracker': ((), self.trigger_tracker)
+        }
+        for name in self.records:
+            for acc, array in self.accumulators[name].items():
+                contents['_'.join([name, acc])] = (
+                    (*dims,
+                     *(['_'.join([name, acc, 'bin'])] if _get_bins(acc)
+                       else [])),
+                    snapshot(array, writer)
                 )
-            f.variables['time_tracker'][t] = self.time_tracker
-            f.variables['trigger_tracker'][t] = self.trigger_tracker
+            contents['_'.join([name, 'tracker'])] = (
+                (), self.trackers[name]
+            )
+        return contents
+
+    def set_checkpoint_contents(self, contents, timedomain, spacedomain):
+        # revive the stream from the contents of a checkpoint
+        start = cftime.num2date(contents['start'], contents['units'],
+                                contents['calendar'])
+        self._revive(start, timedomain, spacedomain)
+
+        for name in self.records:
+            try:
+                for acc, array in self.accumulators[name].items():
+                    array[...] = contents['_'.join([name, acc])]
+                self.trackers[name] = (
+                    contents['_'.join([name, 'tracker'])]
+                )
+            except KeyError:
+                raise KeyError('{} missing in record stream {} '
+                               'checkpoint'.format(name, self.frequency))
+        self.time_tracker = contents['time_tracker']
+        self.trigger_tracker = contents['trigger_tracker']
+
+    def _revive(self, start, timedomain, spacedomain):
+        # initialise stream for original simulation timedomain (i.e.
+        # from its start) so that its trackers remain valid
+        td = TimeDomain.from_start_end_step(
+            start=start,
+            end=timedomain.bounds_datetime_array[-1, -1],
+            step=timedomain.timedelta,
+            calendar=timedomain.calendar,
+            units=timedomain.units
+        )
+        self.initialise(td, spacedomain, _skip_trackers=True)
 
     def load_record_stream_dump(self, filepath, datetime_,
                                 timedomain, spacedomain):
         self.dump_file = filepath
 
-        with Dataset(self.dump_file, 'r') as f:
+        with open_dataset(self.dump_file, 'r') as f:
             # determine original simulation timedomain from dump start
             start = cftime.num2date(f.variables['time'][0],
                                     f.variables['time'].units,
                                     f.variables['time'].calendar)
-
-            td = TimeDomain.from_start_end_step(
-                start=start,
-                end=timedomain.bounds.datetime_array[-1, -1],
-                step=timedomain.timedelta,
-                calendar=timedomain.calendar,
-                units=timedomain.units
-            )
-            self.initialise(td, spacedomain, _skip_trackers=True)
+            self._revive(start, timedomain, spacedomain)
 
             # determine point in time to use from the dump
-            if datetime_ is None:
+            located = locate_snapshot(self.dump_file, f, datetime_)
+            if located is not None:
+                # use manifest of the dump rather than decoding its time
+                t, datetime_ = located
+            elif datetime_ is None:
                 # if not specified, use the last time index
                 t = -1
                 datetime_ = cftime.num2date(f.variables['time'][-1],
@@ -405,11 +1009,11 @@ class RecordStream(object):
             # retrieve each record values
             for name in self.records:
                 try:
-                    mask = f.variables[name][t, ...].mask
-                    self.arrays[name][~mask] = (
-                        f.variables[name][t, ...].data[~mask]
-                    )
-                    self.array_trackers[name] = (
+                    for acc, array in self.accumulators[name].items():
+                        array[...] = np.ma.getdata(
+                            f.variables['_'.join([name, acc])][t, ...]
+                        )
+                    self.trackers[name] = (
                         f.variables['_'.join([name, 'tracker'])][t]
                     )
                 except KeyError:
@@ -422,3 +1026,13 @@ class RecordStream(object):
             self.trigger_tracker = f.variables['trigger_tracker'][t]
 
         return datetime_
+
+
+def _write_record_stream_dump(f, times, arrays, trackers, timestamp):
+    # get index of snapshot in file (extending time dimension if new)
+    t = locate_time(f, times, timestamp)
+
+    for name, array in arrays.items():
+        f.variables[name][t, ...] = array
+    for name, tracker in trackers.items():
+        f.variables[name][t] = tracker
@@ -1,9 +1,11 @@
-from netCDF4 import Dataset
 from datetime import datetime
 import cftime
 import numpy as np
 
 from ...settings import dtype_float
+from ..._utils.writer import (write_to, snapshot, locate_time,
+                              variable_layout, update_manifest,
+                              locate_snapshot, open_dataset)
 
 
 class State(object):
@@ -21,21 +23,66 @@ class State(object):
     means that for a given timestep t, index -1 corresponds to timestep
     t-1, index -2 to timestep t-2, etc. Current timestep t is accessible
     at index 0.
+
+    Internally, the timesteps are stored in a circular buffer, and a
+    head pointer locates the current timestep in it, so that moving on
+    to the next timestep does not require to move any data around.
     """
-    def __init__(self, array, order='C'):
+    def __init__(self, array, order='C', zero_init=False):
+        self.order = order
+        self._bind(array)
+        # whether the current timestep must be reset to zero when
+        # incrementing the State (not required if it is always going
+        # to be fully assigned by the component)
+        self.zero_init = zero_init
+        # position of the current timestep in the circular buffer
+        self._head = len(self.slices) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, int):
+            return self.slices[self._locate(index)]
+        return self._chronological()[self._shift_index(index)]
+
+    def __setitem__(self, index, item):
+        if isinstance(index, int):
+            self.slices[self._locate(index)] = item
+        else:
+            slices = self._chronological()
+            slices[self._shift_index(index)] = item
+            self._set_chronological(slices)
+
+    def _bind(self, array):
         self.array = array
         self.slices = [
-            np.asfortranarray(array[i, ...]) if order == 'F' else array[i, ...]
+            np.asfortranarray(array[i, ...]) if self.order == 'F'
+            else array[i, ...]
             for i in range(array.shape[0])
         ]
 
-    def __getitem__(self, index):
-        index = self._shift_index(index)
-        return self.slices[index]
+    def rebind(self, array):
+        # store the timesteps in another array holding the same values
+        # (e.g. a new memory map of the same file) while keeping the
+        # position of the current timestep in the circular buffer
+        head = self._head
+        self._bind(array)
+        self._head = head
 
-    def __setitem__(self, index, item):
-        index = self._shift_index(index)
-        self.slices[index] = item
+    def _locate(self, index):
+        # map the shifted index onto its position in the circular buffer
+        length = len(self.slices)
+        if not -length < index <= 0:
+            raise IndexError('State index out of range')
+        return (self._head + index) % length
+
+    def _chronological(self):
+        # list of timesteps from the oldest to the most recent
+        return [self.slices[self._locate(i)]
+                for i in range(-len(self.slices) + 1, 1)]
+
+    def _set_chronological(self, slices):
+        # store timesteps from the oldest to the most recent
+        self.slices = list(slices)
+        self._head = len(self.slices) - 1
 
     def _shift_index(self, index):
         if isinstance(index, int):
@@ -50,40 +97,85 @@ class State(object):
         return index
 
     def __delitem__(self, index):
-        index = self._shift_index(index)
-        del self.slices[index]
+        slices = self._chronological()
+        del slices[self._shift_index(index)]
+        self._set_chronological(slices)
 
     def __len__(self):
         return len(self.slices)
 
     def __iter__(self):
-        return iter(self.slices)
+        return iter(self._chronological())
 
     def __repr__(self):
-        return "%r" % self.slices
+        return "%r" % self._chronological()
 
     def increment(self):
-        # determine first index in the State
-        # (function of solver's history)
-        first_index = -len(self) + 1
-        # prepare the left-hand side for the permutation of views
-        lhs = [t for t in self]
-        # prepare the right-hand side for the permutation of views
-        rhs = [t for t in self[first_index + 1:]] + \
-              [self[first_index]]
-        # carry out the permutation of views
-        # to avoid new object creations
-        lhs[:] = rhs[:]
-        # apply new list of views to the State
-        self[:] = lhs
-
-        # re-initialise current timestep of State to zero
-        self[0][:] = 0.0
+        # move the head pointer onto the oldest timestep, which becomes
+        # the current timestep (i.e. a permutation of views without any
+        # object creation or data movement)
+        self._head = (self._head + 1) % len(self.slices)
+
+        # re-initialise current timestep of State to zero (if required)
+        if self.zero_init:
+            self.slices[self._head][:] = 0.0
+
+
+def create_states_arena(states_info, solver_history, spaceshape, dtype,
+                        order, filepath=None, mode='w+'):
+    """Allocate one contiguous block of memory (i.e. the arena) for all
+    the states of a component, and return it together with a view on
+    it for each state (with the same shape and memory layout as if
+    the state had been allocated on its own).
+
+    The states are packed in the order they are defined in
+    *states_info*, and the timesteps of a given state are packed one
+    after the other, each timestep being contiguous in memory
+    according to the 'order' of the state (*order* being used for the
+    states not specifying one).
+
+    If *filepath* is provided, the arena is backed by a memory-mapped
+    file at this location, rather than being held in memory. With the
+    default *mode* 'w+', the file is created (or overwritten if it
+    already exists), while with *mode* 'r+', an existing file is mapped
+    again with the values it holds.
+    """
+    shapes = {}
+    for s in states_info:
+        d = states_info[s].get('divisions', 1)
+        shapes[s] = (*spaceshape, d) if d > 1 else tuple(spaceshape)
+
+    sizes = {s: int(np.prod(shapes[s])) for s in shapes}
+    size = (solver_history + 1) * sum(sizes.values())
+    if filepath is not None and size > 0:
+        # file is zero-filled when created
+        arena = np.memmap(filepath, dtype, mode=mode, shape=(size,))
+    else:
+        arena = np.zeros(size, dtype)
+
+    views = {}
+    offset = 0
+    for s in states_info:
+        o = states_info[s].get('order', order)
+        length = (solver_history + 1) * sizes[s]
+        block = arena[offset:offset + length]
+        if o == 'F':
+            # reverse the spatial dimensions to lay out each timestep
+            # in Fortran order, and transpose them back into place
+            ndim = len(shapes[s])
+            views[s] = block.reshape(
+                (solver_history + 1, *shapes[s][::-1])
+            ).transpose((0, *range(ndim, 0, -1)))
+        else:
+            views[s] = block.reshape((solver_history + 1, *shapes[s]))
+        offset += length
+
+    return arena, views
 
 
 def create_states_dump(filepath, states_info, solver_history,
                        timedomain, spacedomain):
-    with Dataset(filepath, 'w') as f:
+    with open_dataset(filepath, 'w') as f:
         axes = spacedomain.axes
 
         # description
@@ -119,36 +211,61 @@ def create_states_dump(filepath, states_info, solver_history,
 
         # state variables
         for var in states_info:
-            s = f.createVariable(var, dtype_float(),
-                                 ('time', 'history', *axes))
+            s = f.createVariable(
+                var, dtype_float(), ('time', 'history', *axes),
+                **variable_layout('dumps',
+                                  (solver_history + 1, *spacedomain.shape),
+                                  dtype_float())
+            )
             s.standard_name = var
             s.units = states_info[var]['units']
 
+    # list the (yet to be written) snapshots in a manifest
+    update_manifest(filepath, {}, timedomain.units, timedomain.calendar)
+
+
+def update_states_dump(filepath, states, timestamp, solver_history,
+                       writer=None):
+    # take a snapshot of the states (in case the write is deferred)
+    values = {
+        state: [snapshot(states[state][step], writer)
+                for step in range(-solver_history, 1, 1)]
+        for state in states
+    }
+    write_to(filepath, writer, _write_states_dump, values, timestamp)
+
+
+def _write_states_dump(f, times, values, timestamp):
+    # get index of snapshot in file (extending time dimension if new)
+    t = locate_time(f, times, timestamp)
+
+    for state in values:
+        for i, value in enumerate(values[state]):
+            f.variables[state][t, i, ...] = value
 
-def update_states_dump(filepath, states, timestamp, solver_history):
-    with Dataset(filepath, 'a') as f:
-        try:
-            # check whether given snapshot already in file
-            t = cftime.time2index(timestamp, f.variables['time'])
-        # will get a IndexError if time variable is empty
-        # will get a ValueError if timestamp not in time variable
-        except (IndexError, ValueError):
-            # if not, extend time dimension
-            t = len(f.variables['time'])
-            f.variables['time'][t] = timestamp
 
-        for state in states:
-            for i, step in enumerate(range(-solver_history, 1, 1)):
-                f.variables[state][t, i, ...] = states[state][step]
+def get_states_checkpoint(states, solver_history, axes):
+    # get the states in chronological order for a checkpoint (stacking
+    # the timesteps copies them, in case the write is deferred)
+    return {
+        state: (('history', *axes),
+                np.stack([states[state][step]
+                          for step in range(-solver_history, 1, 1)]))
+        for state in states
+    }
 
 
 def load_states_dump(filepath, datetime_, states_info):
     states = {}
 
-    with Dataset(filepath, 'r') as f:
+    with open_dataset(filepath, 'r') as f:
         f.set_always_mask(False)
         # determine point in time to use from the dump
-        if datetime_ is None:
+        located = locate_snapshot(filepath, f, datetime_)
+        if located is not None:
+            # use manifest of the dump rather than decoding its time
+            t, datetime_ = located
+        elif datetime_ is None:
             # if not specified, use the last time index
             t = -1
             datetime_ = cftime.num2date(f.variables['time'][-1],
@@ -1,14 +1,21 @@
 import abc
+import copy
 from importlib import import_module
 import numpy as np
 from os import path, sep
+from math import gcd
 import cf
+import cftime
 from cfunits import Units
 
-from ._utils.states import (State, create_states_dump, update_states_dump,
-                            load_states_dump)
+from ._utils.states import (State, create_states_arena, create_states_dump,
+                            update_states_dump, load_states_dump,
+                            get_states_checkpoint)
 from ._utils.records import (StateRecord, OutwardRecord, OutputRecord,
-                             RecordStream)
+                             RecordStream, nest_record_streams,
+                             locate_stations)
+from .._utils.exchanger import Exchanger
+from .._utils.writer import netcdf_lock
 from ..time import TimeDomain
 from .. import space
 from ..space import SpaceDomain, Grid
@@ -16,6 +23,21 @@ from ..data import DataSet
 from ..settings import dtype_float, array_order, decr
 
 
+# dictionary of supported climatologic frequencies (string-defined ones)
+# with the expected length of the time dimension in the data
+_climatologic_lengths = {
+    'seasonal': 4,  # DJF-MAM-JJA-SON
+    'monthly': 12,  # January to December
+    'day_of_year': 366  # Jan 1st to Dec 31st (with Feb 29th)
+}
+
+# cumulative number of days at the start of each month in a leap year
+# (used to locate a given day in the 366-day climatologic year)
+_leap_year_month_starts = np.array(
+    [0, 31, 60, 91, 121, 152, 182, 213, 244, 274, 305, 335]
+)
+
+
 class MetaComponent(abc.ABCMeta):
     """MetaComponent is a metaclass for `Component`."""
     # intrinsic attributes
@@ -30,6 +52,8 @@ class MetaComponent(abc.ABCMeta):
     _states_info = None
     _outputs_info = None
     _solver_history = None
+    _states_arena = None
+    _states_memmap = None
     _land_sea_mask = None
     _flow_direction = None
 
@@ -69,6 +93,14 @@ class MetaComponent(abc.ABCMeta):
     def solver_history(cls):
         return cls._solver_history
 
+    @property
+    def states_arena(cls):
+        return cls._states_arena
+
+    @property
+    def states_memmap(cls):
+        return cls._states_memmap
+
     @property
     def flow_direction(cls):
         return cls._flow_direction
@@ -113,6 +145,8 @@ class Component(metaclass=MetaComponent):
     _states_info = {}
     _outputs_info = {}
     _solver_history = 1
+    _states_arena = False
+    _states_memmap = False
     _land_sea_mask = False
     _flow_direction = False
 
@@ -165,6 +199,23 @@ class Component(metaclass=MetaComponent):
                                         calendar year).
                 ======================  ================================
 
+                Note: for 'dynamic' data, the timestep of the data may
+                differ from the timestep of *timedomain*, in which case
+                the data is resampled on the fly to the timestep of
+                the `Component` (i.e. each timestep of the `Component`
+                is given the mean of the data values weighted by their
+                overlap with this timestep). The data must then feature
+                a timestamp corresponding to the start of *timedomain*,
+                and cover its whole period.
+
+                Note: for 'climatologic' data, only the slice of the
+                climatology corresponding to the current timestep is
+                given to the `Component` at each step of the simulation
+                (e.g. for ``'monthly'``, the value for January is given
+                for any timestep starting in January). The slice to use
+                for each timestep is determined once, when the
+                *timedomain* is set.
+
             parameters: `dict`, optional
                 The parameter values for the `Component`. Must be
                 provided in the units expected by the `Component`.
@@ -212,8 +263,83 @@ class Component(metaclass=MetaComponent):
 
                 ``'max'``        The maximum amongst the values during
                                  the elapsed timedelta.
+
+                ``'exceedance``  The number of values above *threshold*
+                ``_threshold'``  during the elapsed timedelta (e.g.
+                                 ``'exceedance_10'``).
+
+                ``'histogram``   The number of values in each of *bins*
+                ``_lower_upper`` bins of equal width between *lower*
+                ``_bins'``       and *upper* during the elapsed
+                                 timedelta (values outside of this
+                                 range are counted in the first/last
+                                 bin) (e.g. ``'histogram_0_100_20'``).
+
+                ``'quantile_q``  The quantile *q* (between 0 and 1) of
+                ``_lower_upper`` the values during the elapsed
+                ``_bins'``       timedelta, estimated by linear
+                                 interpolation in their histogram
+                                 (defined as above) (e.g.
+                                 ``'quantile_0.9_0_100_20'``).
                 ===============  =======================================
 
+                Instead of a sequence of aggregation methods, a `dict`
+                can be given to only record the variable at some
+                stations (e.g. gauges). The resulting record file then
+                contains time series for each station (rather than
+                values for the whole spacedomain). This `dict` must
+                feature the aggregation methods as a sequence of `str`
+                under the key ``'methods'``, and the stations under
+                the key ``'stations'``. The stations are given either
+                as a `dict` with station names for keys and station
+                locations for values (as a sequence of `int` indices,
+                one for each spacedomain axis, or as a `dict` of
+                coordinates with spacedomain axes for keys), or as a
+                boolean array of the shape of the spacedomain (where
+                True values are stations). All the records at stations
+                for a given `datetime.timedelta` must use the same
+                stations.
+
+                This `dict` may also feature, instead of or in addition
+                to the stations, the key ``'gather_land'`` with True
+                for value to only store the values at land points in
+                the record file (using CF compression by gathering),
+                which requires the spacedomain to feature a land sea
+                mask (this cannot be combined with stations). All the
+                records for a given `datetime.timedelta` must use the
+                same options. Likewise, the key ``'rotation_months'``
+                with a strictly positive `int` for value gives the
+                number of calendar months covered by one record file,
+                a new file named after its period being started for
+                each period (e.g. 12 for yearly files), instead of a
+                single record file for the whole simulation.
+
+                *Parameter example:* ::
+
+                    records={
+                        'output_a': {
+                            timedelta(minutes=15): {
+                                'methods': ['point'],
+                                'stations': {
+                                    'gauge_1': {'Y': 51.6, 'X': -1.2},
+                                    'gauge_2': [12, 37]
+                                }
+                            }
+                        }
+                    }
+
+                *Parameter example:* ::
+
+                    records={
+                        'output_a': {
+                            timedelta(days=1): {
+                                'methods': ['mean'],
+                                'gather_land': True,
+                                'rotation_months': 12
+                            }
+                        }
+                    }
+
         """
         # check class definition attributes
         self._check_definition()
@@ -230,6 +356,8 @@ class Component(metaclass=MetaComponent):
         # time attributes
         self._timedelta_in_seconds = None
         self._current_datetime = None
+        self._climatologic_slots = None
+        self._dynamic_resampling = None
         self.timedomain = timedomain
 
         # parameters attribute
@@ -243,8 +371,9 @@ class Component(metaclass=MetaComponent):
         self._record_streams = None
         self.records = records
 
-        # states attribute
+        # states attributes
         self.states = {}
+        self._states_memory = None
 
         # identifier
         self.identifier = None
@@ -252,6 +381,7 @@ class Component(metaclass=MetaComponent):
         # directories and files
         self.saving_directory = saving_directory
         self.dump_file = None
+        self._writer = None
 
         # flag to check whether states / streams have been initialised
         self.initialised_states = False
@@ -269,7 +399,9 @@ class Component(metaclass=MetaComponent):
         self._check_dataset_time(timedomain)
         self._timedomain = timedomain
         self._timedelta_in_seconds = timedomain.timedelta.total_seconds()
-        self._current_datetime = timedomain.time.datetime_array[0]
+        self._current_datetime = timedomain.datetime_array[0]
+        self._climatologic_slots = self._resolve_climatologic_slots(
+            timedomain)
 
     @property
     def timedelta_in_seconds(self):
@@ -313,6 +445,11 @@ class Component(metaclass=MetaComponent):
         self._check_dataset(dataset)
         self._check_dataset_space(dataset, self.spacedomain)
         self._dataset = dataset
+        # subset data anew if the time configuration is already known
+        # (i.e. when the dataset is changed after instantiation)
+        if getattr(self, '_timedomain', None) is not None:
+            self.datasubset = DataSet()
+            self._check_dataset_time(self.timedomain)
 
     @property
     def parameters(self):
@@ -354,7 +491,49 @@ class Component(metaclass=MetaComponent):
             # check type and eliminate duplicates in methods
             records_[name] = {}
             for delta, methods in frequencies.items():
-                if isinstance(methods, (list, tuple, set)):
+                if isinstance(methods, dict):
+                    # record with options for its stream (e.g. to be
+                    # extracted at stations only)
+                    if not isinstance(methods.get('methods'),
+                                      (list, tuple, set)):
+                        raise TypeError('recording options for {} at {} '
+                                        'must feature methods as a sequence '
+                                        'of strings'.format(name, delta))
+                    unknown = set(methods) - {'methods', 'stations',
+                                              'gather_land',
+                                              'rotation_months'}
+                    if unknown:
+                        raise ValueError('recording options {} for {} at {} '
+                                         'unknown'.format(sorted(unknown),
+                                                          name, delta))
+                    options = {'methods': set(methods['methods'])}
+                    if 'stations' in methods:
+                        options['stations'] = locate_stations(
+                            methods['stations'], self.spacedomain
+                        )
+                    if methods.get('gather_land', False):
+                        if 'stations' in options:
+                            raise ValueError('recording {} at {} cannot both '
+                                             'gather land points and extract '
+                                             'stations'.format(name, delta))
+                        if self.spacedomain.land_sea_mask is None:
+                            raise ValueError('recording {} at {} only at land '
+                                             'points requires a land sea mask '
+                                             'for the spacedomain'.format(
+                                                 name, delta))
+                        options['gather_land'] = True
+                    if methods.get('rotation_months') is not None:
+                        rotation = methods['rotation_months']
+                        if (not isinstance(rotation, int)
+                                or isinstance(rotation, bool)
+                                or rotation < 1):
+                            raise ValueError('recording {} at {} must rotate '
+                                             'files by a strictly positive '
+                                             'integer number of months'.format(
+                                                 name, delta))
+                        options['rotation_months'] = rotation
+                    records_[name][delta] = options
+                elif isinstance(methods, (list, tuple, set)):
                     records_[name][delta] = set(methods)
                 else:
                     raise TypeError('recording methods for {} at {} must be a '
@@ -385,14 +564,35 @@ class Component(metaclass=MetaComponent):
                     name, self._category))
 
             for delta, methods in frequencies.items():
+                options = {}
+                if isinstance(methods, dict):
+                    options = {option: value for option, value
+                               in methods.items() if option != 'methods'}
+                    methods = methods['methods']
+                # (streams extracting at stations kept separately)
+                key = (delta, 'stations') if 'stations' in options else delta
                 # instantiate RecordStream if none for given timedelta yet
-                if delta not in self._record_streams:
-                    self._record_streams[delta] = RecordStream(delta)
+                if key not in self._record_streams:
+                    self._record_streams[key] = RecordStream(delta, **options)
+                elif self._record_streams[key].options != options:
+                    raise ValueError('records at {} must all use the same '
+                                     'recording options'.format(delta))
                 # hold reference to record object in stream
-                self._record_streams[delta].add_record(
+                self._record_streams[key].add_record(
                     self._record_objects[name], methods
                 )
 
+        # feed streams with aggregates of streams of shorter delta
+        # recording the same variables, where possible
+        nest_record_streams(
+            {key: stream for key, stream in self._record_streams.items()
+             if stream.stations is None}
+        )
+        nest_record_streams(
+            {key[0]: stream for key, stream in self._record_streams.items()
+             if stream.stations is not None}
+        )
+
     def _check_definition(self):
         # check for units
         for lead in ['inputs', 'parameters', 'constants',
@@ -430,7 +630,7 @@ class Component(metaclass=MetaComponent):
                         freq = info['frequency']
                         if not isinstance(freq, int):
                             if (isinstance(freq, str) and freq
-                                    not in ['seasonal', 'monthly', 'daily']):
+                                    not in _climatologic_lengths):
                                 raise TypeError(
                                     "invalid frequency for {} in {} component "
                                     "definition".format(name, self._category)
@@ -553,6 +753,9 @@ class Component(metaclass=MetaComponent):
                 raise error
 
     def _check_dataset_time(self, timedomain):
+        # reset resampling information (specific to a given timedomain)
+        self._dynamic_resampling = {}
+
         # check time compatibility for 'dynamic' input data
         for data_name in self._inputs_info:
             error = ValueError(
@@ -563,15 +766,30 @@ class Component(metaclass=MetaComponent):
 
             kind = self._inputs_info[data_name]['kind']
             if kind == 'dynamic':
+                # check whether data and component timesteps differ
+                data_time = self.dataset[data_name].construct('time')
+                if data_time.size > 1:
+                    data_delta = (data_time.datetime_array[1]
+                                  - data_time.datetime_array[0])
+                else:
+                    data_delta = timedomain.timedelta
+
+                if data_delta != timedomain.timedelta:
+                    # subset in time and set up on the fly resampling
+                    self._set_up_dynamic_resampling(
+                        data_name, data_delta, timedomain, error
+                    )
+                    continue
+
                 # try to subset in time
                 if self.dataset[data_name].subspace(
                         'test',
-                        time=cf.wi(*timedomain.time.datetime_array[[0, -1]])):
+                        time=cf.wi(*timedomain.datetime_array[[0, -1]])):
                     # subset in time and assign to data subset
                     self.datasubset[data_name] = (
                         self.dataset[data_name].subspace(
                             time=cf.wi(
-                                *timedomain.time.datetime_array[[0, -1]]
+                                *timedomain.datetime_array[[0, -1]]
                             )
                         )
                     )
@@ -584,14 +802,9 @@ class Component(metaclass=MetaComponent):
                     raise error
 
             elif kind == 'climatologic':
-                lengths = {
-                    'seasonal': 4,  # DJF-MAM-JJA-SON
-                    'monthly': 12,  # January to December
-                    'day_of_year': 366  # Jan 1st to Dec 31st (with Feb 29th)
-                }
                 freq = self._inputs_info[data_name]['frequency']
                 if isinstance(freq, str):
-                    length = lengths[freq]
+                    length = _climatologic_lengths[freq]
                 else:  # isinstance(freq, int):
                     length = int(freq)
 
@@ -614,6 +827,97 @@ class Component(metaclass=MetaComponent):
                 else:
                     self.datasubset[data_name] = self.dataset[data_name]
 
+    def _set_up_dynamic_resampling(self, data_name, data_delta,
+                                   timedomain, error):
+        # determine the common time mesh between data and component
+        # (i.e. the greatest common divisor of both timesteps)
+        data_step = int(data_delta.total_seconds())
+        comp_step = int(timedomain.timedelta.total_seconds())
+        if data_step <= 0:
+            raise error
+        mesh_step = gcd(data_step, comp_step)
+        from_ = data_step // mesh_step
+        to_ = comp_step // mesh_step
+
+        # locate the start of the component period in the data
+        # (using the component units and calendar for both)
+        data_time = cftime.date2num(
+            self.dataset[data_name].construct('time').datetime_array,
+            timedomain.units, timedomain.calendar
+        )
+        # only regular data can be resampled (the overlaps between data
+        # and component timesteps are derived from the data timestep)
+        if not np.allclose(np.diff(data_time), data_time[1] - data_time[0]):
+            raise error
+        matches = np.nonzero(
+            np.isclose(data_time, timedomain.bounds.array[0, 0])
+        )[0]
+        if not matches.size:
+            raise error
+        first = matches[0]
+
+        # determine how many data timesteps cover the component period
+        length = timedomain.time.size * to_
+        count = -(-length // from_)
+        if first + count > data_time.size:
+            raise error
+
+        # subset in time (time must be the leading axis of the data)
+        # and assign to data subset
+        self.datasubset[data_name] = (
+            self.dataset[data_name][first:first + count, ...]
+        )
+
+        # re-use the exchanger weights to determine the contribution of
+        # each overlapping data timestep to each component timestep
+        weights = Exchanger._calculate_weights(from_, to_, length)
+        keep = weights.shape[-1]
+
+        # determine the data timesteps overlapping each component
+        # timestep (oldest first, as for the weights), the ones out of
+        # the data subset are always given a weight of zero
+        last = (np.arange(1, timedomain.time.size + 1) * to_ - 1) // from_
+        indices = last[:, np.newaxis] + np.arange(1 - keep, 1)
+
+        self._dynamic_resampling[data_name] = {
+            'indices': np.clip(indices, 0, count - 1),
+            'weights': weights
+        }
+
+    def _resolve_climatologic_slots(self, timedomain):
+        # determine once for the whole timedomain which slice of the
+        # climatology each timestep needs to use (so that no datetime
+        # object needs to be handled during the simulation)
+        frequencies = {
+            data_name: info['frequency']
+            for data_name, info in self._inputs_info.items()
+            if info['kind'] == 'climatologic'
+        }
+        if not frequencies:
+            return {}
+
+        datetimes = timedomain.datetime_array
+        months = np.array([dt.month for dt in datetimes])
+        days = np.array([dt.day for dt in datetimes])
+
+        slots = {}
+        for data_name, freq in frequencies.items():
+            if freq == 'seasonal':
+                # DJF-MAM-JJA-SON (December belongs to winter)
+                slots[data_name] = (months % 12) // 3
+            elif freq == 'monthly':
+                slots[data_name] = months - 1
+            else:
+                # locate day in the 366-day climatologic year
+                day_of_year = _leap_year_month_starts[months - 1] + days - 1
+                if freq == 'day_of_year':
+                    slots[data_name] = day_of_year
+                else:  # isinstance(freq, int)
+                    # split the climatologic year in equal parts
+                    slots[data_name] = day_of_year * int(freq) // 366
+
+        return slots
+
     def _check_parameters(self, parameters):
         """The purpose of this method is to check that parameter values
         are given for the corresponding component.
@@ -707,33 +1011,76 @@ class Component(metaclass=MetaComponent):
             + [")"]
         )
 
-    def initialise_(self, tag, overwrite):
+    def initialise_(self, tag, overwrite, records_sink='file',
+                    dumping_format='separate', writer=None):
+        # detach from the writer of a previous run (if any)
+        self.close_files()
         # if not already initialised, get default state values
         if not self.initialised_states:
             self._instantiate_states()
             self.initialise(**self.states)
             self.initialised_states = True
+        elif self._states_memmap and self._states_memory is None:
+            # memory-map states again onto the file they were flushed to
+            # (released at the end of previous run)
+            self._map_states_memory()
         # create dump file for given run
-        self._initialise_states_dump(tag, overwrite)
+        # (unless records are held in memory, in which case there is no
+        # dump at all, or unless dumped in model checkpoints instead)
+        if records_sink == 'memory' or dumping_format == 'consolidated':
+            self.dump_file = None
+        else:
+            self._initialise_states_dump(tag, overwrite)
 
         if self.records:
             if not self.revived_streams:
                 self._initialise_record_streams()
-            # optionally create files and dump files
-            self._create_stream_files_and_dumps(tag, overwrite)
+            if records_sink == 'memory':
+                # hold records in memory (no files, no dumps)
+                for delta, stream in self._record_streams.items():
+                    stream.create_record_stream_memory()
+                    stream.dump_file = None
+            else:
+                # optionally create files and dump files
+                self._create_stream_files_and_dumps(
+                    tag, overwrite, dumps=dumping_format != 'consolidated'
+                )
+
+        # keep dump and record files open for the whole simulation
+        # (using the writer of the model, shared with other components)
+        self._writer = writer
+        for delta, stream in self._record_streams.items():
+            stream.writer = self._writer
 
     def run_(self, timeindex, exchanger):
         data = {}
         # collect required ancillary data from dataset
-        for d in self._inputs_info:
-            kind = self._inputs_info[d]['kind']
-            if kind == 'dynamic':
-                data[d] = self.datasubset[d].array[timeindex, ...]
-            else:
-                data[d] = self.datasubset[d].array[...]
+        # (read from netCDF files in turn with the writes of the model)
+        with netcdf_lock:
+            for d in self._inputs_info:
+                kind = self._inputs_info[d]['kind']
+                if kind == 'dynamic':
+                    if d in self._dynamic_resampling:
+                        # aggregate/interpolate data to component timestep
+                        resampling = self._dynamic_resampling[d]
+                        data[d] = np.average(
+                            self.datasubset[d].array[
+                                resampling['indices'][timeindex], ...
+                            ],
+                            weights=resampling['weights'][timeindex],
+                            axis=0
+                        )
+                    else:
+                        data[d] = self.datasubset[d].array[timeindex, ...]
+                elif kind == 'climatologic':
+                    data[d] = self.datasubset[d].array[
+                        self._climatologic_slots[d][timeindex], ...
+                    ]
+                else:
+                    data[d] = self.datasubset[d].array[...]
 
         # determine current datetime in simulation
-        self._current_datetime = self.timedomain.time.datetime_array[timeindex]
+        self._current_datetime = self.timedomain.datetime_array[timeindex]
 
         # collect required transfers from exchanger
         for d in self._inwards_info:
@@ -754,22 +1101,40 @@ class Component(metaclass=MetaComponent):
 
     def finalise_(self):
         timestamp = self.timedomain.bounds.array[-1, -1]
-        update_states_dump(sep.join([self.saving_directory, self.dump_file]),
-                           self.states, timestamp, self._solver_history)
+        if self.dump_file is not None:
+            update_states_dump(
+                sep.join([self.saving_directory, self.dump_file]),
+                self.states, timestamp, self._solver_history, self._writer
+            )
+        self.close_files()
+        self._release_states_memory()
         self.finalise(**self.states)
 
     def _instantiate_states(self):
         # get a State object for each state and initialise to zero
+        if self._states_arena or self._states_memmap:
+            # pack all states in one contiguous block of memory
+            # (optionally memory-mapped to a file in saving directory)
+            self._states_memory, arrays = create_states_arena(
+                self._states_info, self._solver_history, self.spaceshape,
+                dtype_float(), array_order(),
+                self._states_memmap_file() if self._states_memmap else None
+            )
+        else:
+            self._states_memory, arrays = None, {}
+
         for s in self._states_info:
             d = self._states_info[s].get('divisions', 1)
             o = self._states_info[s].get('order', array_order())
+            z = self._states_info[s].get('zero_init', False)
             self.states[s] = State(
-                np.zeros(
+                arrays[s] if s in arrays else np.zeros(
                     (self._solver_history + 1, *self.spaceshape, d) if d > 1
                     else (self._solver_history + 1, *self.spaceshape),
                     dtype_float(), order=o
                 ),
-                order=o
+                order=o,
+                zero_init=z
             )
 
     def _initialise_states_dump(self, tag, overwrite):
@@ -813,44 +1178,100 @@ class Component(metaclass=MetaComponent):
 
         """
         states, at = load_states_dump(dump_file, at, self._states_info)
+        self._set_states(states, 'dump')
+
+        return at
+
+    def _set_states(self, states, source):
         for s in self._states_info:
-            if s in states:
-                o = self._states_info[s].get('order', array_order())
-                self.states[s] = State(states[s], order=o)
-            else:
+            if s not in states:
                 raise KeyError("initial conditions for {} component state "
-                               "'{}' not in dump".format(self._category, s))
-        self.initialised_states = True
+                               "'{}' not in {}".format(self._category, s,
+                                                       source))
 
-        return at
+        if self._states_arena or self._states_memmap:
+            # copy initial conditions into the arena (timesteps of
+            # freshly instantiated states are in chronological order)
+            self._instantiate_states()
+            for s in self._states_info:
+                self.states[s].array[...] = states[s]
+        else:
+            for s in self._states_info:
+                o = self._states_info[s].get('order', array_order())
+                z = self._states_info[s].get('zero_init', False)
+                self.states[s] = State(states[s], order=o, zero_init=z)
+        self.initialised_states = True
 
     def increment_states(self):
         for s in self.states:
             self.states[s].increment()
 
+    def _states_memmap_file(self):
+        return sep.join([self.saving_directory,
+                         '_'.join([self.identifier, self._category,
+                                   'states.dat'])])
+
+    def _map_states_memory(self):
+        # map the existing file holding the states again, and move the
+        # states onto the new map (without copying their values)
+        self._states_memory, arrays = create_states_arena(
+            self._states_info, self._solver_history, self.spaceshape,
+            dtype_float(), array_order(), self._states_memmap_file(), 'r+'
+        )
+        for s in self._states_info:
+            self.states[s].rebind(arrays[s])
+
+    def _release_states_memory(self):
+        # flush memory-mapped states to the file they are mapped to and
+        # drop the reference to the map (the file is kept since it holds
+        # the values of the states, it is only overwritten when states
+        # are instantiated anew)
+        if isinstance(self._states_memory, np.memmap):
+            self._states_memory.flush()
+            self._states_memory = None
+
     def dump_states(self, timeindex):
         timestamp = self.timedomain.bounds.array[timeindex, 0]
         update_states_dump(sep.join([self.saving_directory, self.dump_file]),
-                           self.states, timestamp, self._solver_history)
+                           self.states, timestamp, self._solver_history,
+                           self._writer)
+
+    def close_files(self):
+        # detach from the writer used during simulation (if any), the
+        # model owning it being responsible for closing the dump and
+        # record files left open
+        for delta, stream in self._record_streams.items():
+            stream.writer = None
+        self._writer = None
 
     def _initialise_record_streams(self):
         for delta, stream in self._record_streams.items():
             # (re)initialise record stream time attributes
             stream.initialise(self.timedomain, self.spacedomain)
 
-    def _create_stream_files_and_dumps(self, tag, overwrite):
+    def _create_stream_files_and_dumps(self, tag, overwrite, dumps=True):
         for delta, stream in self._record_streams.items():
+            stream.memory = None
+            stream.file_pattern = None
+
             # initialise record files
             filename = '_'.join([self.identifier, self._category, tag,
                                  'records', stream.frequency])
             file_ = sep.join([self.saving_directory, filename + '.nc'])
 
-            if overwrite or not path.exists(file_):
+            if stream.rotation is not None:
+                # (one file per period, created when period is reached)
+                stream.set_record_stream_files(file_, overwrite)
+            elif overwrite or not path.exists(file_):
                 stream.create_record_stream_file(file_)
             else:
                 stream.file = file_
 
             # initialise stream dumps
+            # (unless dumped in model checkpoints instead)
+            if not dumps:
+                stream.dump_file = None
+                continue
             filename = '_'.join([self.identifier, self._category, tag,
                                  'dump_record_stream', stream.frequency])
             file_ = sep.join([self.saving_directory, filename + '.nc'])
@@ -914,7 +1335,84 @@ class Component(metaclass=MetaComponent):
         timestamp = self.timedomain.bounds.array[timeindex, 0]
         if self.records:
             for delta, stream in self._record_streams.items():
-                stream.update_record_stream_dump(timestamp)
+                # (no dump for records held in memory)
+                if stream.memory is None and stream.dump_file is not None:
+                    stream.update_record_stream_dump(timestamp)
+
+    def get_checkpoint_contents(self, writer=None):
+        # get the states and the record streams of the Component
+        contents = {
+            'states': get_states_checkpoint(self.states,
+                                            self._solver_history,
+                                            self.spacedomain.axes)
+        }
+        if self.records:
+            for delta, stream in self._record_streams.items():
+                contents['_'.join(['record_stream', stream.frequency])] = (
+                    stream.get_checkpoint_contents(writer)
+                )
+        return contents
+
+    def set_checkpoint_contents(self, contents):
+        # initialise the states and revive the record streams of the
+        # Component from the contents of a checkpoint
+        self._set_states(contents['states'], 'checkpoint')
+
+        if self.records:
+            for delta, stream in self._record_streams.items():
+                try:
+                    stream_contents = contents[
+                        '_'.join(['record_stream', stream.frequency])
+                    ]
+                except KeyError:
+                    raise KeyError("record stream {} for {} component not "
+                                   "in checkpoint".format(stream.frequency,
+                                                          self._category))
+                stream.set_checkpoint_contents(
+                    stream_contents, self.timedomain, self.spacedomain
+                )
+        self.revived_streams = True
+
+    def _branch(self, saving_directory=None, timedomain=None):
+        # get a copy of the Component sharing its (read-only) space,
+        # data, and time configuration (unless another *timedomain* is
+        # given), but with its own parameters, constants, states, and
+        # record streams, so that it can be modified and run
+        # independently of the Component it is branched from (states
+        # and streams are yet to be initialised)
+        component = copy.copy(self)
+        component.parameters = dict(self.parameters)
+        component.constants = dict(self.constants)
+        # copy the dataset mapping and subset data anew to be able to
+        # change it independently (variables themselves are shared)
+        component._dataset = DataSet()
+        component._dataset.update(self.dataset)
+        component.datasubset = DataSet()
+        component.timedomain = (self.timedomain if timedomain is None
+                                else timedomain)
+        # create new record streams (stations are already located)
+        component.records = self.records
+
+        component.states = {}
+        component._states_memory = None
+        if saving_directory is not None:
+            component.saving_directory = saving_directory
+        component.dump_file = None
+        component._writer = None
+        component.initialised_states = False
+        component.revived_streams = False
+
+        return component
+
+    def _get_records_from_memory(self):
+        # (records keyed as their streams, i.e. by delta for the whole
+        # spacedomain, and by delta and 'stations' at stations, so that
+        # records of the same variable never overwrite one another)
+        records = {}
+        for key, stream in self._record_streams.items():
+            for name, values in stream.get_records_from_memory().items():
+                records.setdefault(name, {})[key] = values
+        return records
 
     @abc.abstractmethod
     def initialise(self, **kwargs):
@@ -188,7 +188,6 @@ class Artemis(SurfaceLayerComponent):
 
         # /!\__RENAMING_CM4TWC__________________________________________
         dt = self.timedelta_in_seconds
-        datetime = self.current_datetime
 
         pr = precipitation_flux
         huss = specific_humidity
@@ -197,7 +196,7 @@ class Artemis(SurfaceLayerComponent):
         rlds = surface_downwelling_longwave_flux_in_air
 
         h = vegetation_height
-        ancil_L = leaf_area_index
+        L = leaf_area_index
 
         canopy_prev = canopy_store[-1]
         snowpack_prev = snowpack_store[-1]
@@ -211,8 +210,6 @@ class Artemis(SurfaceLayerComponent):
 
         with np.errstate(over='ignore'):
             # Update LAI and derived terms
-            month = datetime.month
-            L = ancil_L[month-1, ...]
             C_t = 0.002 * L  # Canopy storage capacity [m] (Hough and Jones, MORECS)
             phi_t = np.ma.where(L == 0, 1, 1 - 0.5 ** L)  # throughfall coefficient [-]
             r_c = 40.  # Canopy resistance (calc from LAI) [s/m] (Beven 2000 p. 76)
@@ -1,14 +1,24 @@
 from importlib import import_module
-from os import sep
+from os import sep, path
+from glob import glob
+from copy import deepcopy
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 import re
 import yaml
 
 from ._utils import Exchanger, Clock, Compass
 from ._utils.exchanger import load_transfers_dump
+from ._utils.checkpoint import (create_checkpoint, remove_checkpoint,
+                                load_checkpoint, read_checkpoint_chain,
+                                get_checkpoint_changes,
+                                get_checkpoint_digests,
+                                unpack_checkpoint_contents)
+from ._utils.writer import Writer
 from .components import (SurfaceLayerComponent, SubSurfaceComponent,
                          OpenWaterComponent, DataComponent, NullComponent)
 from .time import TimeDomain
+from .settings import load_workers
 
 
 class Model(object):
@@ -76,6 +86,10 @@ class Model(object):
 
         # define attribute exchanger for transfers between components
         self.exchanger = None
+        # define attribute for writer of checkpoint files
+        self._writer = None
+        # define attribute for chain of checkpoints in current run
+        self._chain = None
 
     @staticmethod
     def _process_component_type(component, expected_type):
@@ -115,38 +129,51 @@ class Model(object):
 
     @classmethod
     def from_config(cls, cfg):
-        surfacelayer = (
-            getattr(
-                import_module(cfg['surfacelayer']['module']),
-                cfg['surfacelayer']['class']
-            )
-        )
-        subsurface = (
-            getattr(
-                import_module(cfg['subsurface']['module']),
-                cfg['subsurface']['class']
-            )
-        )
-        openwater = (
-            getattr(
-                import_module(cfg['openwater']['module']),
-                cfg['openwater']['class']
-            )
-        )
+        components = cls._components_from_config(cfg)
 
         return cls(
             identifier=cfg['identifier'],
             config_directory=cfg['config_directory'],
             saving_directory=cfg['saving_directory'],
-            surfacelayer=surfacelayer.from_config(
-                cfg['surfacelayer']),
-            subsurface=subsurface.from_config(
-                cfg['subsurface']),
-            openwater=openwater.from_config(
-                cfg['openwater']),
+            surfacelayer=components['surfacelayer'],
+            subsurface=components['subsurface'],
+            openwater=components['openwater'],
             _to_yaml=False
         )
 
+    @staticmethod
+    def _components_from_config(cfg):
+        # import component classes beforehand (i.e. not in threads)
+        categories = ['surfacelayer', 'subsurface', 'openwater']
+        classes = {
+            category: getattr(import_module(cfg[category]['module']),
+                              cfg[category]['class'])
+            for category in categories
+        }
+
+        if load_workers() < 2:
+            return {category: classes[category].from_config(cfg[category])
+                    for category in categories}
+
+        # load and check the component datasets concurrently, but
+        # collect the components in order, so that the error raised
+        # (if any) is always the one of the first failing component
+        with ThreadPoolExecutor(
+                max_workers=min(load_workers(), len(categories))) as executor:
+            futures = {
+                category: executor.submit(classes[category].from_config,
+                                          cfg[category])
+                for category in categories
+            }
+            try:
+                return {category: futures[category].result()
+                        for category in categories}
+            except BaseException:
+                # do not start loading any component after an error
+                for future in futures.values():
+                    future.cancel()
+                raise
+
     def to_config(self):
         return {
             'identifier': self.identifier,
@@ -273,6 +300,23 @@ class Model(object):
                 conditions.
 
         """
+        self._instantiate_exchanger()
+
+        transfers, at = load_transfers_dump(dump_file, at,
+                                            self.exchanger.transfers)
+        for tr in self.exchanger.transfers:
+            if tr in transfers:
+                if self.exchanger.transfers[tr].get('from') is None:
+                    continue
+                else:
+                    self.exchanger.transfers[tr]['slices'][-1] = transfers[tr]
+            else:
+                raise KeyError("initial conditions for exchanger transfer "
+                               "'{}' not in dump".format(tr))
+
+        return at
+
+    def _instantiate_exchanger(self):
         # set up compass responsible for mapping across components
         compass = Compass({'surfacelayer': self.surfacelayer.spacedomain,
                            'subsurface': self.subsurface.spacedomain,
@@ -290,22 +334,295 @@ class Model(object):
                                    clock, compass, self.identifier,
                                    self.saving_directory)
 
-        transfers, at = load_transfers_dump(dump_file, at,
-                                            self.exchanger.transfers)
-        for tr in self.exchanger.transfers:
-            if tr in transfers:
-                if self.exchanger.transfers[tr].get('from') is None:
-                    continue
-                else:
-                    self.exchanger.transfers[tr]['slices'][-1] = transfers[tr]
-            else:
-                raise KeyError("initial conditions for exchanger transfer "
-                               "'{}' not in dump".format(tr))
+    def initialise_from_checkpoint(self, checkpoint_file):
+        """Initialise the states and the record streams of the
+        Components, and the transfers of the Exchanger from a
+        checkpoint file.
+
+        :Parameters:
+
+            checkpoint_file: `str`
+                A string providing the path to the netCDF checkpoint
+                file containing values to be used as initial conditions
+                for the Components and the Exchanger.
+
+        :Returns:
+
+            datetime object
+                The snapshot in time that was used for the initial
+                conditions.
+
+        """
+        contents, at = load_checkpoint(checkpoint_file)
+
+        for component in [self.surfacelayer, self.subsurface, self.openwater]:
+            # skip DataComponent and NullComponent
+            if isinstance(component, (DataComponent, NullComponent)):
+                continue
+            component.set_checkpoint_contents(contents[component.category])
+
+        self._instantiate_exchanger()
+        self.exchanger.set_checkpoint_contents(contents['exchanger'])
 
         return at
 
+    def snapshot(self):
+        """Take a snapshot in memory of the states and the record
+        streams of the Components, and of the transfers of the
+        Exchanger at the end of the latest run of the Model, to branch
+        independent continuations of the simulation off it (see
+        `branch`).
+
+        :Returns:
+
+            `dict`
+                The snapshot, holding copies of the arrays (so that it
+                is not affected by any further run of the Model), with
+                its datetime for the key 'at'.
+
+        """
+        if self.exchanger is None:
+            raise RuntimeError("no run of the model to take a snapshot of")
+
+        contents = {}
+        for component in [self.surfacelayer, self.subsurface, self.openwater]:
+            # skip DataComponent and NullComponent
+            if isinstance(component, (DataComponent, NullComponent)):
+                continue
+            contents[component.category] = component.get_checkpoint_contents()
+        contents['exchanger'] = self.exchanger.get_checkpoint_contents()
+
+        snapshot = unpack_checkpoint_contents(contents)
+        snapshot['at'] = (
+            self.exchanger.clock.timedomain.bounds_datetime_array[-1, -1]
+        )
+
+        return snapshot
+
+    def branch(self, snapshot, identifier, saving_directory=None, end=None):
+        """Branch a new Model off a snapshot of this Model, so that the
+        simulation can be continued independently from the snapshot
+        (e.g. to compare alternative parameter values or forcing data
+        for the continuation).
+
+        The Components of the new Model are copies of the Components
+        of this Model sharing their space, data, and time configuration
+        (their *parameters*, *constants*, *dataset*, and *timedomain*
+        can be changed without affecting this Model), with their states
+        (and their record streams if they start at the snapshot) and
+        the transfers of the Exchanger initialised from the snapshot.
+        The new Model can then be run with its `simulate` method.
+
+        :Parameters:
+
+            snapshot: `dict`
+                The snapshot taken with the `snapshot` method of this
+                Model. It can be used for any number of branches.
+
+            identifier: `str`
+                A name to identify the files of the new Model. Must be
+                different from the identifier of this Model, unless a
+                different *saving_directory* is provided.
+
+            saving_directory: `str`, optional
+                The path to the directory where to save the files of
+                the new Model and of its Components. If not provided,
+                the saving directories of this Model and of its
+                Components are used.
+
+            end: datetime object, optional
+                The end of the simulation period of the new Model. If
+                provided, the Components of the new Model are set to
+                run from the snapshot until *end* (with their timestep
+                unchanged). If not provided, their time configuration
+                is the one of the Components of this Model.
+
+        :Returns:
+
+            `Model`
+                The new Model.
+
+        """
+        if (identifier == self.identifier
+                and saving_directory in [None, self.saving_directory]):
+            raise ValueError("branch identifier must differ from model "
+                             "identifier in the same saving directory")
+
+        # copy the components (their states and streams not initialised)
+        components = {}
+        for component in [self.surfacelayer, self.subsurface, self.openwater]:
+            timedomain = None
+            if end is not None:
+                timedomain = TimeDomain.from_start_end_step(
+                    start=snapshot['at'],
+                    end=end,
+                    step=component.timedomain.timedelta,
+                    units=component.timedomain.units,
+                    calendar=component.timedomain.calendar
+                )
+            components[component.category] = component._branch(
+                saving_directory, timedomain
+            )
+
+        model = Model(
+            identifier=identifier,
+            config_directory=self.config_directory,
+            saving_directory=(self.saving_directory if saving_directory is None
+                              else saving_directory),
+            surfacelayer=components['surfacelayer'],
+            subsurface=components['subsurface'],
+            openwater=components['openwater']
+        )
+
+        # initialise the copies from their own copy of the snapshot
+        # (leaving the snapshot untouched for any other branch)
+        contents = deepcopy(snapshot)
+        for component in components.values():
+            # skip DataComponent and NullComponent
+            if isinstance(component, (DataComponent, NullComponent)):
+                continue
+            if (component.timedomain.bounds_datetime_array[0, 0]
+                    == contents['at']):
+                # same run continued, record streams are revived too
+                component.set_checkpoint_contents(
+                    contents[component.category]
+                )
+            else:
+                # new run (e.g. main run after spin up), only states
+                component._set_states(
+                    contents[component.category]['states'], 'snapshot'
+                )
+
+        model._instantiate_exchanger()
+        model.exchanger.set_checkpoint_contents(contents['exchanger'])
+
+        return model
+
+    def _checkpoint_file(self, tag, at):
+        # get path to checkpoint file for the given snapshot in time
+        # (named after it, so that names sort chronologically)
+        stamp = '{:04d}{:02d}{:02d}{:02d}{:02d}{:02d}'.format(
+            at.year, at.month, at.day, at.hour, at.minute, at.second)
+        return sep.join([self.saving_directory,
+                         '_'.join([self.identifier, tag, 'checkpoint',
+                                   stamp]) + '.nc'])
+
+    def _checkpoint_files(self, tag):
+        # get paths to all existing checkpoint files for the given tag
+        # (in chronological order)
+        return sorted(glob(sep.join([
+            self.saving_directory,
+            '_'.join([self.identifier, tag, 'checkpoint',
+                      '[0-9]' * 14]) + '.nc'
+        ])))
+
+    def _find_checkpoint_file(self, tag, at=None):
+        # get path to checkpoint file for the given snapshot in time,
+        # or for the latest one if not given
+        if at is None:
+            files = self._checkpoint_files(tag)
+            if not files:
+                raise FileNotFoundError("no checkpoint file found for "
+                                        "tag '{}'".format(tag))
+            return files[-1]
+
+        file_ = self._checkpoint_file(tag, at)
+        if not path.exists(file_):
+            raise ValueError('{} not available in checkpoints'.format(at))
+        return file_
+
+    def _dump_checkpoint(self, tag, at):
+        # gather the states and record streams of the components and
+        # the transfers of the exchanger (as snapshots in case the
+        # write is deferred) to write them in one checkpoint file
+        contents = {}
+        for component in [self.surfacelayer, self.subsurface, self.openwater]:
+            # skip DataComponent and NullComponent
+            if isinstance(component, (DataComponent, NullComponent)):
+                continue
+            contents[component.category] = (
+                component.get_checkpoint_contents(self._writer)
+            )
+        contents['exchanger'] = (
+            self.exchanger.get_checkpoint_contents(self._writer)
+        )
+
+        file_ = self._checkpoint_file(tag, at)
+        chain = self._chain
+        if file_ in chain['files']:
+            # checkpoint of an earlier run written again (e.g. when
+            # resuming), so the ones after this checkpoint are
+            # superseded by the ones of this run
+            position = chain['files'].index(file_)
+            for superseded in chain['files'][position + 1:]:
+                if superseded not in chain['removed']:
+                    remove_checkpoint(superseded, self._writer)
+            del chain['files'][position:]
+            chain['next'] = chain['indices'][file_]
+        index = chain['next']
+        chain['next'] += 1
+
+        if chain['count'] % chain['full_every'] == 0:
+            # full checkpoint, keeping digests of its contents to
+            # determine the changes in the next checkpoints
+            base = None
+            if chain['full_every'] > 1:
+                chain['base'] = file_
+                chain['reference'] = get_checkpoint_digests(contents)
+        else:
+            # only changes since latest full checkpoint
+            base = chain['base']
+            contents = get_checkpoint_changes(contents, chain['reference'])
+        chain['count'] += 1
+
+        timedomain = self.exchanger.clock.timedomain
+        create_checkpoint(file_, contents, at, timedomain.units,
+                          timedomain.calendar, self._writer, base, index)
+
+        chain['files'].append(file_)
+        chain['bases'][file_] = base
+        chain['indices'][file_] = index
+        chain['removed'].discard(file_)
+        if chain['keep_last'] is not None:
+            self._apply_retention()
+
+    def _seed_chain(self, tag):
+        chain = self._chain
+        for file_ in self._checkpoint_files(tag):
+            index, base = read_checkpoint_chain(file_)
+            chain['files'].append(file_)
+            chain['bases'][file_] = (
+                None if base is None
+                else sep.join([self.saving_directory, base])
+            )
+            # (position in the chain if not stored in the file)
+            chain['indices'][file_] = (len(chain['files']) - 1
+                                       if index is None else index)
+            chain['next'] = chain['indices'][file_] + 1
+
+    def _apply_retention(self):
+        # delete the checkpoint files of the chain (i.e. of the current
+        # run and of the earlier runs it carries on) which are neither
+        # amongst the latest ones nor amongst every nth ones, nor the
+        # full checkpoints the files to keep are based on
+        chain = self._chain
+        files = chain['files']
+        keep = set(files[-chain['keep_last']:])
+        if chain['keep_every'] is not None:
+            keep.update(f for f in files
+                        if chain['indices'][f] % chain['keep_every'] == 0)
+        keep.update([chain['bases'][f] for f in keep
+                     if chain['bases'][f] is not None])
+
+        for file_ in files:
+            if file_ not in keep and file_ not in chain['removed']:
+                remove_checkpoint(file_, self._writer)
+                chain['removed'].add(file_)
+
     def spin_up(self, start, end, cycles=1, dumping_frequency=None,
-                overwrite=True, _cycle_origin_no=0):
+                overwrite=True, dumping_format='separate',
+                dumping_full_every=1, dumping_keep_last=None,
+                dumping_keep_every=None, _cycle_origin_no=0):
         """Run model spin-up simulation to initialise states of each
         `Component` of the Model.
 
@@ -347,7 +664,44 @@ class Model(object):
                 feature the same name as files about to be written by
                 the model. If not provided, set to default True.
 
+            dumping_format: `str`, optional
+                How the snapshots of the Components' states, record
+                streams, and of the Exchanger's transfers must be
+                stored. It can either be ``'separate'`` (appended to
+                dump files kept for each Component and for the
+                Exchanger) or ``'consolidated'`` (each snapshot written
+                at once to its own checkpoint file, named after its
+                datetime). If not provided, set to default
+                ``'separate'``.
+
+            dumping_full_every: `int`, optional
+                The number of checkpoints between two full checkpoints
+                (only if *dumping_format* is ``'consolidated'``). The
+                checkpoints in between only contain the blocks of
+                the arrays that changed since the latest full
+                checkpoint, and resuming from one of them replays its
+                changes on this full checkpoint. If not provided, set
+                to default 1 (i.e. all checkpoints are full).
+
+            dumping_keep_last: `int`, optional
+                The number of latest checkpoints to keep (only if
+                *dumping_format* is ``'consolidated'``), older
+                checkpoints being deleted as new ones are written
+                (except the ones to keep as per *dumping_keep_every*,
+                and the full checkpoints kept checkpoints are based
+                on). If not provided, all checkpoints are kept.
+
+            dumping_keep_every: `int`, optional
+                The interval (in number of checkpoints) at which to
+                keep checkpoints in addition to the latest ones (only
+                if *dumping_keep_last* is provided), e.g. 10 to keep
+                the 1st, the 11th, the 21st, etc. checkpoints. If not
+                provided, only the latest checkpoints are kept.
+
         """
+        self._check_dumping_format(dumping_format, dumping_full_every,
+                                   dumping_keep_last, dumping_keep_every)
+
         # generate spin-up timedomains for each model component
         surfacelayer_timedomain = (
             self.surfacelayer.get_spin_up_timedomain(start, end)
@@ -365,7 +719,11 @@ class Model(object):
             'end': end.strftime('%Y-%m-%d %H:%M:%S'),
             'cycles': cycles,
             'dumping_frequency': dumping_frequency
-            if dumping_frequency is not None else None
+            if dumping_frequency is not None else None,
+            'dumping_format': dumping_format,
+            'dumping_full_every': dumping_full_every,
+            'dumping_keep_last': dumping_keep_last,
+            'dumping_keep_every': dumping_keep_every
         }
         self._set_up_yaml_dumper()
         with open(sep.join([self.config_directory,
@@ -386,16 +744,21 @@ class Model(object):
         # start the spin up run(s)
         for cycle in range(cycles):
             tag = 'spinup{}'.format(_cycle_origin_no + cycle + 1)
-            self._initialise(tag, overwrite)
-            self._run(tag, dumping_frequency, overwrite)
-            self._finalise()
+            self._initialise(tag, overwrite, dumping_format=dumping_format)
+            self._run(tag, dumping_frequency, overwrite, dumping_format,
+                      dumping_full_every, dumping_keep_last,
+                      dumping_keep_every)
+            self._finalise(tag, dumping_format)
 
         # restore main run attributes
         self.surfacelayer.timedomain = main_sl_td
         self.subsurface.timedomain = main_ss_td
         self.openwater.timedomain = main_ow_td
 
-    def simulate(self, dumping_frequency=None, overwrite=True):
+    def simulate(self, dumping_frequency=None, overwrite=True,
+                 records_sink='file', dumping_format='separate',
+                 dumping_full_every=1, dumping_keep_last=None,
+                 dumping_keep_every=None):
         """Run model simulation over period defined in its components'
         timedomains.
 
@@ -418,11 +781,84 @@ class Model(object):
                 feature the same name as files about to be written by
                 the model. If not provided, set to default True.
 
+            records_sink: `str`, optional
+                Where the Components' records must be stored. It can
+                either be ``'file'`` (records are written to netCDF
+                files in the Components' saving directories) or
+                ``'memory'`` (records are held in memory and returned
+                once the simulation is complete, no record file nor
+                dump file nor checkpoint file is written, which means
+                that the simulation cannot be resumed, and that
+                *dumping_frequency* cannot be provided). If not
+                provided, set to default ``'file'``.
+
+            dumping_format: `str`, optional
+                How the snapshots of the Components' states, record
+                streams, and of the Exchanger's transfers must be
+                stored. It can either be ``'separate'`` (appended to
+                dump files kept for each Component and for the
+                Exchanger) or ``'consolidated'`` (each snapshot written
+                at once to its own checkpoint file, named after its
+                datetime). If not provided, set to default
+                ``'separate'``.
+
+            dumping_full_every: `int`, optional
+                The number of checkpoints between two full checkpoints
+                (only if *dumping_format* is ``'consolidated'``). The
+                checkpoints in between only contain the blocks of
+                the arrays that changed since the latest full
+                checkpoint, and resuming from one of them replays its
+                changes on this full checkpoint. If not provided, set
+                to default 1 (i.e. all checkpoints are full).
+
+            dumping_keep_last: `int`, optional
+                The number of latest checkpoints to keep (only if
+                *dumping_format* is ``'consolidated'``), older
+                checkpoints being deleted as new ones are written
+                (except the ones to keep as per *dumping_keep_every*,
+                and the full checkpoints kept checkpoints are based
+                on). If not provided, all checkpoints are kept.
+
+            dumping_keep_every: `int`, optional
+                The interval (in number of checkpoints) at which to
+                keep checkpoints in addition to the latest ones (only
+                if *dumping_keep_last* is provided), e.g. 10 to keep
+                the 1st, the 11th, the 21st, etc. checkpoints. If not
+                provided, only the latest checkpoints are kept.
+
+        :Returns:
+
+            `dict` or `None`
+                If *records_sink* is ``'memory'``, the records of each
+                Component (keys are 'surfacelayer', 'subsurface', and
+                'openwater'), given as a dictionary where the keys are
+                the record names and the values are dictionaries where
+                the keys are the record frequencies (as
+                `datetime.timedelta`, or as a `tuple` of the frequency
+                and ``'stations'`` for records at stations) and the
+                values are dictionaries containing the arrays of
+                aggregated values (keys are the aggregation methods)
+                alongside their 'time' and 'time_bounds' coordinates
+                (as arrays of datetime objects). Otherwise, `None`.
+
         """
+        if records_sink not in ['file', 'memory']:
+            raise ValueError("records sink must be 'file' or 'memory'")
+        if records_sink == 'memory' and dumping_frequency is not None:
+            raise ValueError("dumping frequency cannot be used with "
+                             "'memory' records sink")
+        self._check_dumping_format(dumping_format, dumping_full_every,
+                                   dumping_keep_last, dumping_keep_every)
+
         # store spin up configuration in a separate yaml file
         simulate_config = {
             'dumping_frequency': dumping_frequency
-            if dumping_frequency is not None else None
+            if dumping_frequency is not None else None,
+            'records_sink': records_sink,
+            'dumping_format': dumping_format,
+            'dumping_full_every': dumping_full_every,
+            'dumping_keep_last': dumping_keep_last,
+            'dumping_keep_every': dumping_keep_every
         }
         self._set_up_yaml_dumper()
         with open(sep.join([self.config_directory,
@@ -431,17 +867,69 @@ class Model(object):
             yaml.dump(simulate_config, f, yaml.Dumper, sort_keys=False)
 
         # initialise, run, finalise model
-        self._initialise('run', overwrite)
-        self._run('run', dumping_frequency, overwrite)
-        self._finalise()
+        # (without any dump if records are held in memory)
+        dumps = records_sink != 'memory'
+        self._initialise('run', overwrite, records_sink, dumping_format)
+        self._run('run', dumping_frequency, overwrite, dumping_format,
+                  dumping_full_every, dumping_keep_last, dumping_keep_every,
+                  dumps)
+        self._finalise('run', dumping_format, dumps)
+
+        if records_sink == 'memory':
+            return {
+                'surfacelayer': self.surfacelayer._get_records_from_memory(),
+                'subsurface': self.subsurface._get_records_from_memory(),
+                'openwater': self.openwater._get_records_from_memory()
+            }
 
-    def _initialise(self, tag, overwrite):
-        # initialise components' states
-        self.surfacelayer.initialise_(tag, overwrite)
-        self.subsurface.initialise_(tag, overwrite)
-        self.openwater.initialise_(tag, overwrite)
+    @staticmethod
+    def _check_dumping_format(dumping_format, dumping_full_every=1,
+                              dumping_keep_last=None,
+                              dumping_keep_every=None):
+        if dumping_format not in ['separate', 'consolidated']:
+            raise ValueError("dumping format must be 'separate' or "
+                             "'consolidated'")
+        for name, value in [('full every', dumping_full_every),
+                            ('keep last', dumping_keep_last),
+                            ('keep every', dumping_keep_every)]:
+            # (only the numbers of checkpoints to keep are optional)
+            if value is None and name != 'full every':
+                continue
+            if not isinstance(value, int) or value < 1:
+                raise ValueError("dumping {} must be a strictly positive "
+                                 "integer".format(name))
+        if dumping_full_every != 1 and dumping_format == 'separate':
+            raise ValueError("dumping full every requires 'consolidated' "
+                             "dumping format")
+        if dumping_keep_last is not None and dumping_format == 'separate':
+            raise ValueError("dumping keep last requires 'consolidated' "
+                             "dumping format")
+
+    def _initialise(self, tag, overwrite, records_sink='file',
+                    dumping_format='separate'):
+        # keep the files of the model, of its components, and of its
+        # exchanger open for the whole simulation with a single writer
+        # (i.e. with a single background thread if writes are deferred)
+        if self._writer is not None:
+            self._writer.close()
+        self._writer = Writer()
 
-    def _run(self, tag, dumping_frequency=None, overwrite=True):
+        # initialise components' states
+        try:
+            self.surfacelayer.initialise_(tag, overwrite, records_sink,
+                                          dumping_format, self._writer)
+            self.subsurface.initialise_(tag, overwrite, records_sink,
+                                        dumping_format, self._writer)
+            self.openwater.initialise_(tag, overwrite, records_sink,
+                                       dumping_format, self._writer)
+        except BaseException:
+            # close files left open so that they remain valid
+            self._close_files()
+            raise
+
+    def _run(self, tag, dumping_frequency=None, overwrite=True,
+             dumping_format='separate', dumping_full_every=1,
+             dumping_keep_last=None, dumping_keep_every=None, dumps=True):
         # set up compass responsible for mapping across components
         compass = Compass({'surfacelayer': self.surfacelayer.spacedomain,
                            'subsurface': self.subsurface.spacedomain,
@@ -467,65 +955,176 @@ class Model(object):
             # of the existing instance because time or space information
             # may have been changed for one or more components
             self.exchanger.set_up(clock, compass)
-        self.exchanger.initialise_(tag, overwrite)
+        self.exchanger.initialise_(tag, overwrite, dumping_format, dumps,
+                                   self._writer)
+
+        # start new chain of checkpoints (the first one being full)
+        self._chain = {'full_every': dumping_full_every, 'count': 0,
+                       'base': None, 'reference': None,
+                       'keep_last': dumping_keep_last,
+                       'keep_every': dumping_keep_every,
+                       'files': [], 'bases': {}, 'indices': {},
+                       'next': 0, 'removed': set()}
+        if dumps and dumping_format == 'consolidated' and overwrite:
+            # remove the checkpoint files of an earlier run with the
+            # same tag, so that they cannot be mistaken for the ones
+            # of this run when resuming
+            for file_ in self._checkpoint_files(tag):
+                remove_checkpoint(file_)
+        elif dumps and dumping_format == 'consolidated':
+            # carry on the chain of the checkpoint files of an earlier
+            # run with the same tag (e.g. when resuming), so that the
+            # retention policy also applies to them
+            self._seed_chain(tag)
 
         # run components
-        for (run_surfacelayer, run_subsurface, run_openwater,
-             dumping) in clock:
-
-            to_exchanger = {}
-
-            if dumping:
-                ti = clock.get_current_timeindex('surfacelayer')
-                self.surfacelayer.dump_states(ti)
-                self.surfacelayer.dump_record_streams(ti)
-                ti = clock.get_current_timeindex('subsurface')
-                self.subsurface.dump_states(ti)
-                self.subsurface.dump_record_streams(ti)
-                ti = clock.get_current_timeindex('openwater')
-                self.openwater.dump_states(ti)
-                self.openwater.dump_record_streams(ti)
-                self.exchanger.dump_transfers(
-                    clock.get_current_timestamp()
-                )
+        try:
+            for (run_surfacelayer, run_subsurface, run_openwater,
+                 dumping) in clock:
+
+                to_exchanger = {}
+
+                if dumping and dumping_format == 'consolidated':
+                    self._dump_checkpoint(tag,
+                                          clock.get_current_datetime())
+                elif dumping:
+                    ti = clock.get_current_timeindex('surfacelayer')
+                    self.surfacelayer.dump_states(ti)
+                    self.surfacelayer.dump_record_streams(ti)
+                    ti = clock.get_current_timeindex('subsurface')
+                    self.subsurface.dump_states(ti)
+                    self.subsurface.dump_record_streams(ti)
+                    ti = clock.get_current_timeindex('openwater')
+                    self.openwater.dump_states(ti)
+                    self.openwater.dump_record_streams(ti)
+                    self.exchanger.dump_transfers(
+                        clock.get_current_timestamp()
+                    )
 
-            if run_surfacelayer:
-                to_exchanger.update(
-                    self.surfacelayer.run_(
-                        clock.get_current_timeindex('surfacelayer'),
-                        self.exchanger
+                if run_surfacelayer:
+                    to_exchanger.update(
+                        self.surfacelayer.run_(
+                            clock.get_current_timeindex('surfacelayer'),
+                            self.exchanger
+                        )
                     )
-                )
 
-            if run_subsurface:
-                to_exchanger.update(
-                    self.subsurface.run_(
-                        clock.get_current_timeindex('subsurface'),
-                        self.exchanger
+                if run_subsurface:
+                    to_exchanger.update(
+                        self.subsurface.run_(
+                            clock.get_current_timeindex('subsurface'),
+                            self.exchanger
+                        )
                     )
-                )
 
-            if run_openwater:
-                to_exchanger.update(
-                    self.openwater.run_(
-                        clock.get_current_timeindex('openwater'),
-                        self.exchanger
+                if run_openwater:
+                    to_exchanger.update(
+                        self.openwater.run_(
+                            clock.get_current_timeindex('openwater'),
+                            self.exchanger
+                        )
                     )
+
+                self.exchanger.update_transfers(to_exchanger)
+        except BaseException:
+            # close files left open so that they remain valid
+            self._close_files()
+            raise
+
+    def _finalise(self, tag='run', dumping_format='separate', dumps=True):
+        # take final snapshot in a checkpoint if not dumped separately
+        try:
+            if dumps and dumping_format == 'consolidated':
+                timedomain = self.exchanger.clock.timedomain
+                self._dump_checkpoint(
+                    tag, timedomain.bounds_datetime_array[-1, -1]
                 )
 
-            self.exchanger.update_transfers(to_exchanger)
+            # finalise components
+            self.surfacelayer.finalise_()
+            self.subsurface.finalise_()
+            self.openwater.finalise_()
+            # finalise model
+            self.exchanger.finalise_()
+        except BaseException:
+            # close files left open so that they remain valid
+            self._close_files()
+            raise
+
+        # drain the pending writes (if any) and close all files
+        self._writer.close()
+        self._writer = None
+
+    def _close_files(self):
+        # only called when an error occurred, which takes precedence
+        # over any error occurring when closing the files
+        for obj in [self.surfacelayer, self.subsurface, self.openwater,
+                    self.exchanger]:
+            if obj is not None:
+                try:
+                    obj.close_files()
+                except Exception:
+                    pass
+        if self._writer is not None:
+            try:
+                self._writer.close()
+            except Exception:
+                pass
+            self._writer = None
+        # flush the files component states are memory-mapped to (if any)
+        for component in [self.surfacelayer, self.subsurface, self.openwater]:
+            # skip DataComponent and NullComponent
+            if isinstance(component, (DataComponent, NullComponent)):
+                continue
+            try:
+                component._release_states_memory()
+            except Exception:
+                pass
+
+    def _initialise_from_dumps(self, tag, at=None):
+        # initialise list to hold snapshot retrieved from each dump file
+        ats = []
+
+        # initialise component states and record streams from dump files
+        for component in [self.surfacelayer, self.subsurface, self.openwater]:
+            # skip DataComponent and NullComponent
+            if isinstance(component, (DataComponent, NullComponent)):
+                continue
+
+            # initialise component states from dump file
+            dump_file = sep.join([self.saving_directory,
+                                  '_'.join([component.identifier,
+                                            component.category,
+                                            tag, 'dump_states.nc'])])
+
+            ats.append(component.initialise_states_from_dump(dump_file, at))
 
-    def _finalise(self):
-        # finalise components
-        self.surfacelayer.finalise_()
-        self.subsurface.finalise_()
-        self.openwater.finalise_()
-        # finalise model
-        self.exchanger.finalise_()
+            # revive component record streams from dump file
+            dump_file = sep.join([self.saving_directory,
+                                  '_'.join([component.identifier,
+                                            component.category,
+                                            tag, 'dump_record_stream_{}.nc'])])
+
+            ats.extend(component.revive_record_streams_from_dump(dump_file,
+                                                                 at))
+
+        # initialise model exchanger transfers from dump file
+        dump_file = sep.join([self.saving_directory,
+                              '_'.join([self.identifier, 'exchanger',
+                                        tag, 'dump_transfers.nc'])])
+
+        ats.append(self.initialise_transfers_from_dump(dump_file, at))
+
+        # check whether snapshots in dumps are for same datetime
+        if not len(set(ats)) == 1:
+            raise RuntimeError("dump files feature different last "
+                               "snapshots in time, cannot resume")
+        return list(set(ats))[0]
 
     def resume(self, tag, at=None):
         """Resume model spin up or main simulation run on latest
-        snapshot in dump files or at the given snapshot.
+        snapshot in dump files (or checkpoint files) or at the given
+        snapshot.
 
         :Parameters:
 
@@ -562,51 +1161,26 @@ class Model(object):
                 cfg = yaml.load(f, yaml.FullLoader)
         except FileNotFoundError:
             raise FileNotFoundError("no configuration file found")
-
-        # initialise list to hold snapshot retrieved from each dump file
-        ats = []
-
-        # initialise component states and record streams from dump files
-        data_or_null = 0
-        for component in [self.surfacelayer, self.subsurface, self.openwater]:
-            # skip DataComponent and NullComponent
-            if isinstance(component, (DataComponent, NullComponent)):
-                data_or_null += 1
-                continue
-
-            # initialise component states from dump file
-            dump_file = sep.join([self.saving_directory,
-                                  '_'.join([component.identifier,
-                                            component.category,
-                                            tag, 'dump_states.nc'])])
-
-            ats.append(component.initialise_states_from_dump(dump_file, at))
-
-            # revive component record streams from dump file
-            dump_file = sep.join([self.saving_directory,
-                                  '_'.join([component.identifier,
-                                            component.category,
-                                            tag, 'dump_record_stream_{}.nc'])])
-
-            ats.extend(component.revive_record_streams_from_dump(dump_file,
-                                                                 at))
+        if cfg.get('records_sink', 'file') == 'memory':
+            raise RuntimeError("run with 'memory' records sink did not "
+                               "write any dump, cannot resume")
 
         # if all components are Data or Null, exit resume
-        if data_or_null == 3:
+        if all(isinstance(component, (DataComponent, NullComponent))
+               for component in [self.surfacelayer, self.subsurface,
+                                 self.openwater]):
             return
 
-        # initialise model exchanger transfers from dump file
-        dump_file = sep.join([self.saving_directory,
-                              '_'.join([self.identifier, 'exchanger',
-                                        tag, 'dump_transfers.nc'])])
-
-        ats.append(self.initialise_transfers_from_dump(dump_file, at))
-
-        # check whether snapshots in dumps are for same datetime
-        if not len(set(ats)) == 1:
-            raise RuntimeError("dump files feature different last "
-                               "snapshots in time, cannot resume")
-        at = list(set(ats))[0]
+        if cfg.get('dumping_format', 'separate') == 'consolidated':
+            # initialise component states and record streams, and model
+            # exchanger transfers from one checkpoint file
+            at = self.initialise_from_checkpoint(
+                self._find_checkpoint_file(tag, at)
+            )
+        else:
+            # initialise component states and record streams, and model
+            # exchanger transfers from separate dump files
+            at = self._initialise_from_dumps(tag, at)
 
         # proceed with call to spin_up or simulate method of self
         if method == 'spin_up':
@@ -616,6 +1190,10 @@ class Model(object):
             start = datetime.strptime(str(cfg['start']), '%Y-%m-%d %H:%M:%S')
             end = datetime.strptime(str(cfg['end']), '%Y-%m-%d %H:%M:%S')
             dumping_frequency = cfg['dumping_frequency']
+            dumping_format = cfg.get('dumping_format', 'separate')
+            dumping_full_every = cfg.get('dumping_full_every', 1)
+            dumping_keep_last = cfg.get('dumping_keep_last')
+            dumping_keep_every = cfg.get('dumping_keep_every')
 
             # resume spin up cycle according to the latest dump found
             if at == end:
@@ -630,6 +1208,10 @@ class Model(object):
                     cycles=1,
                     dumping_frequency=dumping_frequency,
                     overwrite=False,
+                    dumping_format=dumping_format,
+                    dumping_full_every=dumping_full_every,
+                    dumping_keep_last=dumping_keep_last,
+                    dumping_keep_every=dumping_keep_every,
                     _cycle_origin_no=cycle_no - 1
                 )
             # start any potential additional spin up cycle
@@ -640,13 +1222,17 @@ class Model(object):
                     cycles=cfg['cycles'] - cycle_no,
                     dumping_frequency=dumping_frequency,
                     overwrite=False,
+                    dumping_format=dumping_format,
+                    dumping_full_every=dumping_full_every,
+                    dumping_keep_last=dumping_keep_last,
+                    dumping_keep_every=dumping_keep_every,
                     _cycle_origin_no=cycle_no
                 )
         else:  # method == 'simulate'
             # adjust the component timedomain to reflect remaining period
             for component in [self.surfacelayer, self.subsurface,
                               self.openwater]:
-                if at == component.timedomain.bounds.datetime_array[-1, -1]:
+                if at == component.timedomain.bounds_datetime_array[-1, -1]:
                     raise RuntimeError(
                         "{} component run already completed successfully, "
                         "cannot resume".format(component.category)
@@ -654,7 +1240,7 @@ class Model(object):
 
                 remaining_td = TimeDomain.from_start_end_step(
                     start=at,
-                    end=component.timedomain.bounds.datetime_array[-1, -1],
+                    end=component.timedomain.bounds_datetime_array[-1, -1],
                     step=component.timedomain.timedelta,
                     units=component.timedomain.units,
                     calendar=component.timedomain.calendar
@@ -664,5 +1250,9 @@ class Model(object):
             # resume simulation run
             self.simulate(
                 dumping_frequency=cfg['dumping_frequency'],
-                overwrite=False
+                overwrite=False,
+                dumping_format=cfg.get('dumping_format', 'separate'),
+                dumping_full_every=cfg.get('dumping_full_every', 1),
+                dumping_keep_last=cfg.get('dumping_keep_last'),
+                dumping_keep_every=cfg.get('dumping_keep_every')
             )
@@ -46,9 +46,84 @@ def array_order(value=None):
     return settings_['ORDER']
 
 
+def sync_every(value=None):
+    """TODO: DOCSTRING REQUIRED"""
+    # number of writes to a dump/record file between two synchronisations
+    # of its content to disk (files remain open for the whole simulation)
+    if value is not None:
+        value = int(value)
+        if value < 1:
+            raise ValueError("number of writes between two synchronisations "
+                             "must be a strictly positive integer")
+        settings_['SYNC_EVERY'] = value
+    return settings_['SYNC_EVERY']
+
+
+def write_queue_size(value=None):
+    """TODO: DOCSTRING REQUIRED"""
+    # number of writes to dump/record files that can be pending at any
+    # one time (if zero, writes are synchronous, otherwise they are
+    # performed by a background thread, one for each model running)
+    if value is not None:
+        settings_['WRITE_QUEUE_SIZE'] = int(value)
+    return settings_['WRITE_QUEUE_SIZE']
+
+
+def load_workers(value=None):
+    """TODO: DOCSTRING REQUIRED"""
+    # number of threads loading and checking the datasets of the
+    # components concurrently when instantiating a model from its
+    # configuration (if one, components are instantiated one after the
+    # other, which is the only safe choice if the netCDF library in use
+    # is not thread-safe)
+    if value is not None:
+        settings_['LOAD_WORKERS'] = int(value)
+    return settings_['LOAD_WORKERS']
+
+
+def file_layout(value=None):
+    """TODO: DOCSTRING REQUIRED"""
+    # layout of the data variables in the netCDF files created for each
+    # kind of file (i.e. 'records' for record files, 'dumps' for state,
+    # transfer, and record stream dump files), given as a dictionary of
+    # options for each kind of file (items in *value* only update the
+    # given options, the other options remain unchanged):
+    # - 'zlib': whether to compress the variables with zlib
+    # - 'complevel': the level of zlib compression (from 1 to 9)
+    # - 'shuffle': whether to apply the HDF5 shuffle filter (only if
+    #   zlib compression is used)
+    # - 'least_significant_digit': the power of ten of the smallest
+    #   decimal place to retain in the values (None to retain all)
+    # - 'time_chunk': the number of time steps in one chunk
+    # - 'chunk_bytes': the target size of one chunk (in bytes), the
+    #   space dimensions being split if required (None to never split)
+    if value is not None:
+        layout = {kind: dict(options) for kind, options
+                  in settings_.get('FILE_LAYOUT', {}).items()}
+        for kind, options in value.items():
+            if kind not in ('records', 'dumps'):
+                raise ValueError("file kind '{}' unknown".format(kind))
+            layout.setdefault(kind, {}).update(options)
+        settings_['FILE_LAYOUT'] = layout
+    return settings_['FILE_LAYOUT']
+
+
 # configuring default values
 atol(1e-8)
 rtol(1e-5)
 decr(12)
 dtype_float(np.float64)
 array_order('C')
+sync_every(1)
+write_queue_size(0)
+load_workers(1)
+file_layout({
+    # records: time-series-friendly chunks
+    'records': {'zlib': False, 'complevel': 4, 'shuffle': True,
+                'least_significant_digit': None,
+                'time_chunk': 16, 'chunk_bytes': 2 ** 20},
+    # dumps: whole-snapshot chunks
+    'dumps': {'zlib': False, 'complevel': 4, 'shuffle': True,
+              'least_significant_digit': None,
+              'time_chunk': 1, 'chunk_bytes': None}
+})
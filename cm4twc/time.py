@@ -114,6 +114,10 @@ class TimeDomain(object):
         """
         self._f = cf.Field()
 
+        # caches for time and bounds as datetime objects
+        self._datetime_array = None
+        self._bounds_datetime_array = None
+
         # get a cf.Units instance from units and calendar
         units = self._get_cf_units(units, calendar)
 
@@ -145,6 +149,32 @@ class TimeDomain(object):
         """
         return self._f.construct('time').bounds.data
 
+    @property
+    def datetime_array(self):
+        """Return the time series of the TimeDomain instance as a
+        `numpy.ndarray` of datetime objects.
+
+        The datetime objects are only generated the first time this
+        attribute is accessed, and they are then cached for subsequent
+        uses.
+        """
+        if self._datetime_array is None:
+            self._datetime_array = self.time.datetime_array
+        return self._datetime_array
+
+    @property
+    def bounds_datetime_array(self):
+        """Return the bounds of the time series of the TimeDomain
+        instance as a `numpy.ndarray` of datetime objects.
+
+        The datetime objects are only generated the first time this
+        attribute is accessed, and they are then cached for subsequent
+        uses.
+        """
+        if self._bounds_datetime_array is None:
+            self._bounds_datetime_array = self.bounds.datetime_array
+        return self._bounds_datetime_array
+
     @property
     def units(self):
         """Return the units of the time series of the TimeDomain
@@ -164,8 +194,8 @@ class TimeDomain(object):
         """Return the period that the TimeDomain is covering as a
         `datetime.timedelta`.
         """
-        return (self._f.construct('time').bounds.datetime_array[-1, -1]
-                - self._f.construct('time').bounds.datetime_array[0, 0])
+        return (self.bounds_datetime_array[-1, -1]
+                - self.bounds_datetime_array[0, 0])
 
     @property
     def timedelta(self):
@@ -174,8 +204,8 @@ class TimeDomain(object):
         instance.
         """
         return (
-                self._f.construct('time').bounds.datetime_array[0, 1]
-                - self._f.construct('time').bounds.datetime_array[0, 0]
+                self.bounds_datetime_array[0, 1]
+                - self.bounds_datetime_array[0, 0]
         )
 
     def _get_cf_units(self, units, calendar):
@@ -237,6 +267,10 @@ class TimeDomain(object):
         self._f.construct('time').set_data(cf.Data(timestamps))
         self._f.construct('time').set_bounds(cf.Bounds(data=cf.Data(bounds)))
 
+        # reset datetime arrays (generated when first required)
+        self._datetime_array = None
+        self._bounds_datetime_array = None
+
     @classmethod
     def _extract_time_from_field(cls, field):
         # check construct
@@ -657,16 +691,29 @@ class TimeDomain(object):
                 end.year, end.month, end.day,
                 end.hour, end.minute, end.second, end.microsecond)
 
-        # determine whole number of timesteps to loop over
+        # set units to default if not given
+        if units is None:
+            units = cls._units
+        # determine calendar if not given
+        if calendar is None:
+            try:
+                # try to infer calendar from datetime (i.e. if cftime.datetime)
+                calendar = start.calendar
+            except AttributeError:
+                # set calendar to default if not given or inferred
+                calendar = cls._calendar
+
+        # determine whole number of timesteps in sequence
         (divisor, remainder) = divmod(int((end - start).total_seconds()),
                                       int(step.total_seconds()))
 
-        # generate sequence of datetimes
-        datetimes = [start + timedelta(seconds=td * step.total_seconds())
-                     for td in range(divisor + 1)]
+        # generate sequence of timestamps numerically (only the start
+        # and the step need to be converted from datetime objects)
+        first, second = cftime.date2num([start, start + step],
+                                        units, calendar)
+        timestamps = first + (second - first) * np.arange(divisor + 1)
 
-        return cls.from_datetime_sequence(np.asarray(datetimes),
-                                          units, calendar)
+        return cls(timestamps, units, calendar)
 
     @classmethod
     def from_field(cls, field):
@@ -745,7 +792,7 @@ class TimeDomain(object):
         )
 
     def to_config(self):
-        t_bnds = self.bounds.datetime_array
+        t_bnds = self.bounds_datetime_array
         return {
             'start': t_bnds[0, 0].strftime('%Y-%m-%d %H:%M:%S'),
             'end': t_bnds[-1, -1].strftime('%Y-%m-%d %H:%M:%S'),
@@ -107,14 +107,14 @@ class Dummy(OpenWaterComponent):
         return (
             # to exchanger
             {
-                'transfer_l': ancillary_b[11] * transfer_m + state_a[0],
+                'transfer_l': ancillary_b * transfer_m + state_a[0],
                 'transfer_n': parameter_c * transfer_j,
                 'transfer_o': constant_c + transfer_j
             },
             # component outputs
             {
                 'output_x': parameter_c * transfer_j + constant_c,
-                'output_y': ancillary_b[11] * transfer_m - state_a[0],
+                'output_y': ancillary_b * transfer_m - state_a[0],
             }
         )
 
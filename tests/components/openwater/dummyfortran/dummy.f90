@@ -26,7 +26,7 @@ subroutine run(z, y, x, &
     ! from exchanger
     real(kind=8), intent(in), dimension(z, y, x) :: transfer_j, transfer_m
     ! component ancillary data
-    real(kind=8), intent(in), dimension(12, z, y, x) :: ancillary_b
+    real(kind=8), intent(in), dimension(z, y, x) :: ancillary_b
     ! component parameters
     real(kind=8), intent(in) :: parameter_c
     ! component states
@@ -43,12 +43,12 @@ subroutine run(z, y, x, &
 
     state_a_0 = state_a_m1 + 1
 
-    transfer_l = (ancillary_b(12,:,:,:) * transfer_m) + state_a_0
+    transfer_l = (ancillary_b * transfer_m) + state_a_0
     transfer_n = parameter_c * transfer_j
     transfer_o = parameter_c + transfer_j
 
     output_x = (parameter_c * transfer_j) + constant_c
-    output_y = (ancillary_b(12,:,:,:) * transfer_m) - state_a_0
+    output_y = (ancillary_b * transfer_m) - state_a_0
 
 end subroutine run
 
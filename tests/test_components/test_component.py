@@ -1,5 +1,8 @@
+import unittest
 from importlib import import_module
 from datetime import timedelta
+import numpy as np
+import cftime
 
 import cm4twc
 
@@ -166,3 +169,265 @@ def get_dummy_component(category, kind, time_, space_, source):
             spacedomain=spacedomain,
             substituting_class=component_class
         )
+
+
+class TestComponentDynamicResampling(unittest.TestCase):
+
+    def get_component(self, time_resolution, dataset):
+        return import_module('tests.components.subsurface').Dummy(
+            saving_directory='outputs',
+            timedomain=get_dummy_timedomain(time_resolution),
+            spacedomain=get_dummy_spacedomain('1deg'),
+            dataset=dataset,
+            parameters=parameters['subsurface'],
+            constants=constants['subsurface']
+        )
+
+    def check_resampling(self, component, exp_indices, exp_weights):
+        resampling = component._dynamic_resampling['driving_a']
+        np.testing.assert_array_equal(resampling['indices'], exp_indices)
+        np.testing.assert_array_equal(resampling['weights'], exp_weights)
+
+    def test_coarser_data(self):
+        # 3-daily data for a daily component (one data step per step)
+        component = self.get_component(
+            'daily', get_dummy_dataset('subsurface', '3daily', '1deg')
+        )
+        self.check_resampling(
+            component,
+            [[0], [0], [0], [1], [1], [1], [2], [2], [2], [3], [3], [3]],
+            [[1]] * 12
+        )
+
+    def test_finer_data(self):
+        # daily data for a 3-daily component (three data steps per step)
+        component = self.get_component(
+            '3daily', get_dummy_dataset('subsurface', 'daily', '1deg')
+        )
+        self.check_resampling(
+            component,
+            [[0, 1, 2], [3, 4, 5], [6, 7, 8], [9, 10, 11]],
+            [[1, 1, 1]] * 4
+        )
+
+    def test_non_integer_multiple_data(self):
+        # 3-daily data for a 2-daily component (data steps straddling
+        # component steps every other time)
+        component = self.get_component(
+            '2daily', get_dummy_dataset('subsurface', '3daily', '1deg')
+        )
+        self.check_resampling(
+            component,
+            [[0, 0], [0, 1], [0, 1], [1, 2], [2, 3], [2, 3]],
+            [[0, 2], [1, 1], [0, 2], [0, 2], [1, 1], [0, 2]]
+        )
+
+    def test_irregular_data(self):
+        # daily data with one missing day for a 3-daily component
+        dataset = get_dummy_dataset('subsurface', 'daily', '1deg')
+        dataset['driving_a'] = dataset['driving_a'][
+            [0, 1, 2, 4, 5, 6, 7, 8, 9, 10, 11], ...
+        ]
+        with self.assertRaises(ValueError):
+            self.get_component('3daily', dataset)
+
+
+class TestComponentClimatologicSlots(unittest.TestCase):
+
+    # number of days in each month of a non-leap year
+    month_lengths = [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+
+    def setUp(self):
+        self.component = get_dummy_component('openwater', 'c', 'sync',
+                                             'match', 'Python')
+
+    def get_slots(self, frequency, start, end, step,
+                  calendar='gregorian'):
+        # resolve the slots of a climatologic input of the given
+        # frequency over the period from start to end
+        self.component._inputs_info = {
+            'ancillary_b': {'units': '1', 'kind': 'climatologic',
+                            'frequency': frequency}
+        }
+        timedomain = cm4twc.TimeDomain.from_start_end_step(
+            start, end, step, 'days since 2019-01-01 00:00:00Z', calendar
+        )
+        return self.component._resolve_climatologic_slots(
+            timedomain)['ancillary_b']
+
+    def test_seasonal(self):
+        # DJF-MAM-JJA-SON (with December of the year back in winter)
+        slots = self.get_slots('seasonal',
+                               cftime.DatetimeGregorian(2019, 1, 1),
+                               cftime.DatetimeGregorian(2020, 1, 1),
+                               timedelta(days=1))
+        np.testing.assert_array_equal(
+            slots, np.repeat([0, 1, 2, 3, 0], [59, 92, 92, 91, 31])
+        )
+
+    def test_monthly(self):
+        slots = self.get_slots('monthly',
+                               cftime.DatetimeGregorian(2019, 1, 1),
+                               cftime.DatetimeGregorian(2020, 1, 1),
+                               timedelta(days=1))
+        np.testing.assert_array_equal(
+            slots, np.repeat(np.arange(12), self.month_lengths)
+        )
+
+    def test_day_of_year_leap_year(self):
+        # every day of the 366-day climatologic year is used
+        slots = self.get_slots('day_of_year',
+                               cftime.DatetimeGregorian(2020, 1, 1),
+                               cftime.DatetimeGregorian(2021, 1, 1),
+                               timedelta(days=1))
+        np.testing.assert_array_equal(slots, np.arange(366))
+
+    def test_day_of_year_non_leap_year(self):
+        # February 29th of the climatologic year is skipped (in a
+        # non-leap year, or in a calendar without leap years)
+        expected = np.concatenate([np.arange(59), np.arange(60, 366)])
+        for calendar, datetime_, year in [
+                ('gregorian', cftime.DatetimeGregorian, 2019),
+                ('noleap', cftime.DatetimeNoLeap, 2020)]:
+            with self.subTest(calendar=calendar):
+                slots = self.get_slots('day_of_year',
+                                       datetime_(year, 1, 1),
+                                       datetime_(year + 1, 1, 1),
+                                       timedelta(days=1), calendar)
+                np.testing.assert_array_equal(slots, expected)
+
+    def test_integer_frequency(self):
+        # climatologic year split in 6 parts of 61 days each
+        slots = self.get_slots(6,
+                               cftime.DatetimeGregorian(2020, 1, 1),
+                               cftime.DatetimeGregorian(2021, 1, 1),
+                               timedelta(days=1))
+        np.testing.assert_array_equal(slots, np.repeat(np.arange(6), 61))
+
+        # (the part including February 29th is one day short in a
+        # non-leap year)
+        slots = self.get_slots(6,
+                               cftime.DatetimeGregorian(2019, 1, 1),
+                               cftime.DatetimeGregorian(2020, 1, 1),
+                               timedelta(days=1))
+        np.testing.assert_array_equal(
+            slots, np.repeat(np.arange(6), [60, 61, 61, 61, 61, 61])
+        )
+
+    def test_step_crossing_slot_boundary(self):
+        # the slot of a step is the one its start falls in
+        slots = self.get_slots('monthly',
+                               cftime.DatetimeGregorian(2019, 1, 27),
+                               cftime.DatetimeGregorian(2019, 2, 5),
+                               timedelta(days=3))
+        np.testing.assert_array_equal(slots, [0, 0, 1])
+
+        slots = self.get_slots('seasonal',
+                               cftime.DatetimeGregorian(2019, 11, 30, 18),
+                               cftime.DatetimeGregorian(2019, 12, 2, 18),
+                               timedelta(days=1))
+        np.testing.assert_array_equal(slots, [3, 0])
+
+
+class TestComponentRecordOptions(unittest.TestCase):
+
+    def get_component(self, records, land_sea_mask=True):
+        spacedomain = get_dummy_spacedomain('1deg')
+        if land_sea_mask:
+            spacedomain.land_sea_mask = get_dummy_land_sea_mask_field(
+                '1deg'
+            )
+        return import_module('tests.components.subsurface').Dummy(
+            saving_directory='outputs',
+            timedomain=get_dummy_timedomain('daily'),
+            spacedomain=spacedomain,
+            dataset=get_dummy_dataset('subsurface', 'daily', '1deg'),
+            parameters=parameters['subsurface'],
+            constants=constants['subsurface'],
+            records=records
+        )
+
+    def test_gather_land(self):
+        component = self.get_component({
+            'output_x': {
+                timedelta(days=1): {'methods': ['mean'],
+                                    'gather_land': True},
+                timedelta(days=6): ['mean']
+            }
+        })
+        # only the stream requesting it gathers land points
+        self.assertTrue(
+            component._record_streams[timedelta(days=1)].gather_land
+        )
+        self.assertFalse(
+            component._record_streams[timedelta(days=6)].gather_land
+        )
+
+    def test_gather_land_without_mask(self):
+        with self.assertRaises(ValueError):
+            self.get_component(
+                {'output_x': {timedelta(days=1): {'methods': ['mean'],
+                                                  'gather_land': True}}},
+                land_sea_mask=False
+            )
+
+    def test_gather_land_at_stations(self):
+        with self.assertRaises(ValueError):
+            self.get_component(
+                {'output_x': {timedelta(days=1): {'methods': ['mean'],
+                                                  'stations': {'a': [0, 0, 0]},
+                                                  'gather_land': True}}}
+            )
+
+    def test_different_options_same_delta(self):
+        with self.assertRaises(ValueError):
+            self.get_component({
+                'output_x': {timedelta(days=1): {'methods': ['mean'],
+                                                 'gather_land': True}},
+                'state_a': {timedelta(days=1): ['mean']}
+            })
+
+    def test_rotation_months(self):
+        component = self.get_component({
+            'output_x': {
+                timedelta(days=1): {'methods': ['mean'],
+                                    'rotation_months': 12}
+            }
+        })
+        self.assertEqual(
+            component._record_streams[timedelta(days=1)].rotation, 12
+        )
+
+        for rotation in [0, 1.5]:
+            with self.assertRaises(ValueError):
+                self.get_component({
+                    'output_x': {
+                        timedelta(days=1): {'methods': ['mean'],
+                                            'rotation_months': rotation}
+                    }
+                })
+
+    def test_unknown_option(self):
+        with self.assertRaises(ValueError):
+            self.get_component(
+                {'output_x': {timedelta(days=1): {'methods': ['mean'],
+                                                  'compress': True}}}
+            )
+
+
+if __name__ == '__main__':
+    test_loader = unittest.TestLoader()
+    test_suite = unittest.TestSuite()
+
+    test_suite.addTests(
+        test_loader.loadTestsFromTestCase(TestComponentDynamicResampling)
+    )
+    test_suite.addTests(
+        test_loader.loadTestsFromTestCase(TestComponentClimatologicSlots)
+    )
+    test_suite.addTests(
+        test_loader.loadTestsFromTestCase(TestComponentRecordOptions)
+    )
+
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(test_suite)
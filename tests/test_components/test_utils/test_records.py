@@ -1,8 +1,17 @@
+import unittest
+import os
+from datetime import datetime, timedelta
 import numpy as np
 from netCDF4 import Dataset
 
 import cm4twc
-from tests.test_time import get_dummy_output_time_and_bounds
+from cm4twc.components._utils.records import (RecordStream, OutputRecord,
+                                              nest_record_streams)
+from cm4twc._utils.writer import Writer
+from tests.test_time import (get_dummy_timedomain,
+                             get_dummy_output_time_and_bounds)
+from tests.test_space import (get_dummy_spacedomain,
+                              get_dummy_land_sea_mask_field)
 from tests.test_components.test_component import time_resolutions
 
 # expected raw values for states/transfers/outputs after main run
@@ -121,3 +130,362 @@ def get_produced_record(component, name, delta, method):
     np.testing.assert_allclose(min_, max_, atol, rtol)
 
     return time, bounds, min_
+
+
+def run_record_stream(values, methods, delta, stations=None):
+    # feed a stream held in memory with homogeneous values (one per
+    # daily timestep) and return the records it produced
+    timedomain = get_dummy_timedomain('daily')
+    spacedomain = get_dummy_spacedomain('1deg')
+
+    stream = RecordStream(delta, stations)
+    stream.add_record(OutputRecord('output_x', units='1'), methods)
+    stream.initialise(timedomain, spacedomain)
+    stream.create_record_stream_memory()
+
+    for value in values:
+        stream.update_record('output_x', np.full(spacedomain.shape, value,
+                                                 cm4twc.dtype_float()))
+
+    return stream.get_records_from_memory()['output_x']
+
+
+class TestRecordStreamParameterisedMethods(unittest.TestCase):
+    # one value per day for the 12-day period, aggregated over three
+    # 4-day periods (i.e. [0, 1, 2, 3], [4, 5, 6, 7], [8, 9, 10, 11])
+    values = list(range(12))
+    delta = timedelta(days=4)
+
+    def check_records(self, records, method, expected):
+        self.assertEqual(len(records['time']), len(expected))
+        for i, expected_ in enumerate(expected):
+            # records are homogeneous in space, check every location
+            values = np.reshape(records[method][i],
+                                (-1, *np.shape(expected_)))
+            for value in values:
+                np.testing.assert_allclose(value, expected_)
+
+    def test_exceedance(self):
+        records = run_record_stream(self.values, ['exceedance_5'],
+                                    self.delta)
+        self.check_records(records, 'exceedance_5', [0, 2, 4])
+
+    def test_histogram(self):
+        # (values outside of the range are counted in the edge bins)
+        records = run_record_stream(self.values, ['histogram_2_10_4'],
+                                    self.delta)
+        self.check_records(records, 'histogram_2_10_4', [[4, 0, 0, 0],
+                                                         [0, 2, 2, 0],
+                                                         [0, 0, 0, 4]])
+
+    def test_quantile(self):
+        records = run_record_stream(
+            self.values, ['quantile_0.5_0_12_6', 'quantile_0.25_0_12_6'],
+            self.delta
+        )
+        self.check_records(records, 'quantile_0.5_0_12_6', [2, 6, 10])
+        self.check_records(records, 'quantile_0.25_0_12_6', [1, 5, 9])
+
+    def test_methods_sharing_accumulator(self):
+        records = run_record_stream(
+            self.values, ['histogram_0_12_6', 'quantile_0.5_0_12_6'],
+            self.delta
+        )
+        self.check_records(records, 'histogram_0_12_6',
+                           [[2, 2, 0, 0, 0, 0],
+                            [0, 0, 2, 2, 0, 0],
+                            [0, 0, 0, 0, 2, 2]])
+        self.check_records(records, 'quantile_0.5_0_12_6', [2, 6, 10])
+
+
+class TestRecordStreamRunningAccumulators(unittest.TestCase):
+    # one value per day for the 12-day period, aggregated over three
+    # 4-day periods (i.e. [3, 1, 4, 1], [5, 9, 2, 6], [5, 3, 5, 8])
+    values = [3, 1, 4, 1, 5, 9, 2, 6, 5, 3, 5, 8]
+    delta = timedelta(days=4)
+
+    check_records = TestRecordStreamParameterisedMethods.check_records
+
+    def test_methods(self):
+        records = run_record_stream(
+            self.values, ['sum', 'mean', 'minimum', 'maximum', 'point'],
+            self.delta
+        )
+        self.check_records(records, 'sum', [9, 22, 21])
+        self.check_records(records, 'mean', [2.25, 5.5, 5.25])
+        self.check_records(records, 'minimum', [1, 2, 3])
+        self.check_records(records, 'maximum', [4, 9, 8])
+        self.check_records(records, 'point', [1, 6, 8])
+
+    def test_accumulators(self):
+        timedomain = get_dummy_timedomain('daily')
+        spacedomain = get_dummy_spacedomain('1deg')
+
+        stream = RecordStream(self.delta)
+        stream.add_record(OutputRecord('output_x', units='1'),
+                          ['sum', 'mean', 'point'])
+        stream.initialise(timedomain, spacedomain)
+        stream.create_record_stream_memory()
+
+        # one running accumulator per quantity needed (shared between
+        # methods), of the shape of one timestep only
+        accumulators = stream.accumulators['output_x']
+        self.assertEqual(set(accumulators), {'sum', 'count', 'last'})
+        for array in accumulators.values():
+            self.assertEqual(array.shape, spacedomain.shape)
+
+        # accumulated in place over a period, and reset for the next
+        arrays = dict(accumulators)
+        for value in self.values[:5]:
+            stream.update_record('output_x',
+                                 np.full(spacedomain.shape, value,
+                                         cm4twc.dtype_float()))
+        for name, array in arrays.items():
+            self.assertIs(stream.accumulators['output_x'][name], array)
+        np.testing.assert_array_equal(accumulators['sum'], 5)
+        np.testing.assert_array_equal(accumulators['count'], 1)
+        np.testing.assert_array_equal(accumulators['last'], 5)
+
+
+class TestNestedRecordStreams(unittest.TestCase):
+    # one value per day for the 12-day period
+    values = [3, 1, 4, 1, 5, 9, 2, 6, 5, 3, 5, 8]
+
+    check_records = TestRecordStreamParameterisedMethods.check_records
+
+    def test_streams_fed_with_aggregates(self):
+        timedomain = get_dummy_timedomain('daily')
+        spacedomain = get_dummy_spacedomain('1deg')
+
+        record = OutputRecord('output_x', units='1')
+        streams = {}
+        for days, methods in [(1, ['point']),
+                              (2, ['sum', 'minimum']),
+                              (3, ['sum']),
+                              (4, ['mean', 'maximum', 'point'])]:
+            streams[days] = RecordStream(timedelta(days=days))
+            streams[days].add_record(record, methods)
+        nest_record_streams(
+            {stream.delta: stream for stream in streams.values()}
+        )
+
+        # only the shortest stream is fed with raw values, the others
+        # are fed by the longest stream whose delta divides theirs
+        self.assertEqual(record.streams, [streams[1]])
+        self.assertIsNone(streams[1].sources['output_x'])
+        for days, source in [(2, 1), (3, 1), (4, 2)]:
+            self.assertEqual(streams[days].sources['output_x'],
+                             timedelta(days=source))
+            self.assertIn(streams[days],
+                          streams[source].children['output_x'])
+        # (feeding streams accumulating what the streams they feed need)
+        self.assertEqual(streams[1].accumulated['output_x'],
+                         {'sum', 'count', 'minimum', 'maximum', 'last'})
+        self.assertEqual(streams[2].accumulated['output_x'],
+                         {'sum', 'count', 'minimum', 'maximum', 'last'})
+
+        for stream in streams.values():
+            stream.initialise(timedomain, spacedomain)
+            stream.create_record_stream_memory()
+        for value in self.values:
+            record({}, {}, {'output_x': np.full(spacedomain.shape, value,
+                                                cm4twc.dtype_float())})
+
+        # check that records are the same as if fed with raw values
+        records = {days: stream.get_records_from_memory()['output_x']
+                   for days, stream in streams.items()}
+        self.check_records(records[1], 'point', self.values)
+        self.check_records(records[2], 'sum', [4, 5, 14, 8, 8, 13])
+        self.check_records(records[2], 'minimum', [1, 1, 5, 2, 3, 5])
+        self.check_records(records[3], 'sum', [8, 15, 13, 16])
+        self.check_records(records[4], 'mean', [2.25, 5.5, 5.25])
+        self.check_records(records[4], 'maximum', [4, 9, 8])
+        self.check_records(records[4], 'point', [1, 6, 8])
+
+
+class TestRecordStreamFileRotation(unittest.TestCase):
+
+    def setUp(self):
+        # keep settings to restore them after the test
+        self.write_queue_size = cm4twc.write_queue_size()
+        # record files written from a background thread (with a short
+        # queue so that buffers are recycled quickly)
+        cm4twc.write_queue_size(2)
+
+        self.files = []
+
+    def tearDown(self):
+        cm4twc.write_queue_size(self.write_queue_size)
+
+        for file_ in self.files:
+            if os.path.exists(file_):
+                os.remove(file_)
+
+    def test_rotation_with_background_writer(self):
+        timedomain = cm4twc.TimeDomain.from_start_end_step(
+            start=datetime(2019, 1, 1),
+            end=datetime(2019, 4, 1),
+            step=timedelta(days=1),
+            units='days since 2019-01-01 00:00:00Z',
+            calendar='gregorian'
+        )
+        spacedomain = get_dummy_spacedomain('1deg')
+
+        # monthly record files
+        stream = RecordStream(timedelta(days=1), rotation_months=1)
+        stream.add_record(OutputRecord('output_x', units='1'), ['point'])
+        stream.initialise(timedomain, spacedomain)
+        stream.set_record_stream_files(
+            'outputs/test-rotation_records_daily.nc', overwrite=True
+        )
+        stream.writer = Writer()
+
+        # record the day index of each day of the period
+        for day in range(timedomain.time.size):
+            stream.update_record('output_x',
+                                 np.full(spacedomain.shape, day,
+                                         cm4twc.dtype_float()))
+        stream.writer.close()
+
+        # check that each monthly file features the days of its month
+        for period, days in [('201901-201901', range(0, 31)),
+                             ('201902-201902', range(31, 59)),
+                             ('201903-201903', range(59, 90))]:
+            file_ = 'outputs/test-rotation_records_daily_{}.nc'.format(
+                period)
+            self.files.append(file_)
+
+            with Dataset(file_, 'r') as f:
+                values = f.variables['output_x_point'][:]
+
+            values = np.reshape(values, (values.shape[0], -1))
+            np.testing.assert_array_equal(np.amin(values, axis=1), days)
+            np.testing.assert_array_equal(np.amax(values, axis=1), days)
+
+    def test_stale_period_files(self):
+        # file of a period beyond the end of this simulation, as left
+        # by a previous longer simulation
+        stale = 'outputs/test-rotation_records_daily_201904-201904.nc'
+        self.files.append(stale)
+        open(stale, 'w').close()
+
+        stream = RecordStream(timedelta(days=1), rotation_months=1)
+
+        # period files kept if not overwriting (e.g. when resuming)
+        stream.set_record_stream_files(
+            'outputs/test-rotation_records_daily.nc', overwrite=False
+        )
+        self.assertTrue(os.path.exists(stale))
+
+        # period files all removed if overwriting
+        stream.set_record_stream_files(
+            'outputs/test-rotation_records_daily.nc', overwrite=True
+        )
+        self.assertFalse(os.path.exists(stale))
+
+
+class TestRecordStreamGatherLand(unittest.TestCase):
+
+    def setUp(self):
+        self.file = 'outputs/test-gather_records_daily.nc'
+
+    def tearDown(self):
+        if os.path.exists(self.file):
+            os.remove(self.file)
+
+    def test_gather_land_points(self):
+        timedomain = get_dummy_timedomain('daily')
+        spacedomain = get_dummy_spacedomain('1deg')
+        spacedomain.land_sea_mask = get_dummy_land_sea_mask_field('1deg')
+        land = np.flatnonzero(spacedomain.land_sea_mask)
+
+        # only store land points in record file
+        stream = RecordStream(timedelta(days=1), gather_land=True)
+        stream.add_record(OutputRecord('output_x', units='1'), ['point'])
+        stream.initialise(timedomain, spacedomain)
+        stream.create_record_stream_file(self.file)
+
+        # record distinct values for each space element and each day
+        values = np.arange(np.prod(spacedomain.shape),
+                           dtype=cm4twc.dtype_float())
+        values = np.reshape(values, spacedomain.shape)
+        for day in range(timedomain.time.size):
+            stream.update_record('output_x', values + 100 * day)
+
+        with Dataset(self.file, 'r') as f:
+            # check that the list variable features the land points
+            np.testing.assert_array_equal(f.variables['land'][:], land)
+            self.assertEqual(f.variables['land'].compress,
+                             ' '.join(spacedomain.axes))
+
+            # check that only the values at the land points are stored
+            v = f.variables['output_x_point']
+            self.assertEqual(v.dimensions, ('time', 'land'))
+            self.assertGreater(v.shape[0], 0)
+            for t in range(v.shape[0]):
+                np.testing.assert_array_equal(
+                    v[t], np.ravel(values + 100 * t)[land]
+                )
+
+    def test_gather_land_without_mask(self):
+        timedomain = get_dummy_timedomain('daily')
+        spacedomain = get_dummy_spacedomain('1deg')
+
+        # land points cannot be determined without a land sea mask
+        stream = RecordStream(timedelta(days=1), gather_land=True)
+        stream.add_record(OutputRecord('output_x', units='1'), ['point'])
+        with self.assertRaises(ValueError):
+            stream.initialise(timedomain, spacedomain)
+
+
+class TestRecordStreamStations(unittest.TestCase):
+
+    def setUp(self):
+        self.file = 'outputs/test-stations_records_daily_stations.nc'
+
+    def tearDown(self):
+        if os.path.exists(self.file):
+            os.remove(self.file)
+
+    def test_stations_time_series(self):
+        timedomain = get_dummy_timedomain('daily')
+        spacedomain = get_dummy_spacedomain('1deg')
+        stations = {'gauge_a': [0, 1, 2], 'gauge_b': [0, 3, 0]}
+
+        stream = RecordStream(timedelta(days=1), stations)
+        stream.add_record(OutputRecord('output_x', units='1'), ['point'])
+        stream.initialise(timedomain, spacedomain)
+        stream.create_record_stream_file(self.file)
+
+        # record distinct values for each space element and each day
+        values = np.arange(np.prod(spacedomain.shape),
+                           dtype=cm4twc.dtype_float())
+        values = np.reshape(values, spacedomain.shape)
+        for day in range(timedomain.time.size):
+            stream.update_record('output_x', values + 100 * day)
+
+        with Dataset(self.file, 'r') as f:
+            self.assertEqual(f.featureType, 'timeSeries')
+
+            # check that the stations are identified by their names
+            st = f.variables['station_name']
+            self.assertEqual(st.dimensions, ('station',))
+            self.assertEqual(st.cf_role, 'timeseries_id')
+            self.assertEqual(list(st[:]), list(stations))
+
+            # check that the time series are those at the stations
+            v = f.variables['output_x_point']
+            self.assertEqual(v.dimensions, ('time', 'station'))
+            self.assertEqual(
+                v.coordinates, ' '.join([*spacedomain.axes, 'station_name'])
+            )
+            self.assertGreater(v.shape[0], 0)
+            for t in range(v.shape[0]):
+                np.testing.assert_array_equal(
+                    v[t], [(values + 100 * t)[tuple(index)]
+                           for index in stations.values()]
+                )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,9 @@
+import unittest
+import os
 import numpy as np
 
 import cm4twc
+from cm4twc.components._utils.states import State, create_states_arena
 
 
 def compare_states(some_states, some_other_states):
@@ -26,3 +29,209 @@ def compare_states(some_states, some_other_states):
         return False
     else:
         return True
+
+
+class TestState(unittest.TestCase):
+
+    def setUp(self):
+        # state with a history of three timesteps (i.e. -2, -1, 0),
+        # the value of each timestep being its position in the array
+        self.array = np.stack([np.full((2, 3), i, dtype=float)
+                               for i in range(3)])
+
+    def test_indexing(self):
+        state = State(self.array)
+
+        self.assertEqual(len(state), 3)
+        # most recent timestep at index 0, oldest at index -2
+        for index in [-2, -1, 0]:
+            np.testing.assert_array_equal(state[index], index + 2)
+        with self.assertRaises(IndexError):
+            state[1]
+        with self.assertRaises(IndexError):
+            state[-3]
+        # slices remain in chronological order
+        self.assertEqual([s[0, 0] for s in state[-2:0]], [0, 1])
+        self.assertEqual([s[0, 0] for s in state[-1:]], [1, 2])
+        self.assertEqual([s[0, 0] for s in state], [0, 1, 2])
+
+    def test_increment(self):
+        state = State(self.array)
+        views = [state[index] for index in [-2, -1, 0]]
+
+        state.increment()
+        # oldest timestep re-used for current timestep, no data moved
+        self.assertIs(state[0], views[0])
+        self.assertIs(state[-1], views[2])
+        self.assertIs(state[-2], views[1])
+        np.testing.assert_array_equal(state[-1], 2)
+        np.testing.assert_array_equal(state[-2], 1)
+
+        # current timestep assigned in place is seen in the array
+        state[0][:] = 3
+        np.testing.assert_array_equal(self.array[0], 3)
+
+        # after as many increments as timesteps, back to the start
+        state.increment()
+        state.increment()
+        for index, view in zip([-2, -1, 0], views):
+            self.assertIs(state[index], view)
+
+    def test_increment_zero_init(self):
+        state = State(self.array, zero_init=True)
+
+        state.increment()
+        np.testing.assert_array_equal(state[0], 0)
+        np.testing.assert_array_equal(state[-1], 2)
+
+        state[0][:] = 5
+        state.increment()
+        np.testing.assert_array_equal(state[0], 0)
+        np.testing.assert_array_equal(state[-1], 5)
+        np.testing.assert_array_equal(state[-2], 2)
+
+    def test_assignment(self):
+        state = State(self.array)
+        state.increment()
+
+        # assigning a timestep replaces it at its shifted index
+        state[-1] = np.full((2, 3), 7.)
+        self.assertEqual([s[0, 0] for s in state], [1, 7, 0])
+        state[-2:0] = [np.full((2, 3), 8.), np.full((2, 3), 9.)]
+        self.assertEqual([s[0, 0] for s in state], [8, 9, 0])
+
+    def test_fortran_order(self):
+        state = State(self.array, order='F')
+
+        for index in [-2, -1, 0]:
+            self.assertTrue(state[index].flags['F_CONTIGUOUS'])
+        state.increment()
+        self.assertTrue(state[0].flags['F_CONTIGUOUS'])
+
+
+class TestStatesArena(unittest.TestCase):
+
+    states_info = {
+        'state_a': {'units': '1'},
+        'state_b': {'units': '1', 'divisions': 4},
+        'state_c': {'units': '1', 'order': 'F'}
+    }
+
+    def test_views_packed_in_arena(self):
+        arena, views = create_states_arena(
+            self.states_info, 1, (2, 3), np.float64, 'C'
+        )
+
+        # one block for all timesteps of all states, zero-initialised
+        self.assertEqual(arena.shape, (2 * (6 + 24 + 6),))
+        self.assertEqual(arena.dtype, np.float64)
+        np.testing.assert_array_equal(arena, 0)
+
+        # views with the shape they would have if allocated on their own
+        self.assertEqual(views['state_a'].shape, (2, 2, 3))
+        self.assertEqual(views['state_b'].shape, (2, 2, 3, 4))
+        self.assertEqual(views['state_c'].shape, (2, 2, 3))
+        for name, view in views.items():
+            self.assertTrue(np.shares_memory(view, arena))
+
+        # packed in order, without overlapping one another
+        views['state_a'][...] = 1
+        views['state_b'][...] = 2
+        views['state_c'][...] = 3
+        np.testing.assert_array_equal(
+            arena, np.repeat([1, 2, 3], [2 * 6, 2 * 24, 2 * 6])
+        )
+
+    def test_views_memory_layout(self):
+        arena, views = create_states_arena(
+            self.states_info, 2, (2, 3), np.float64, 'C'
+        )
+
+        # each timestep is contiguous in the order of its state
+        for step in range(3):
+            self.assertTrue(views['state_a'][step].flags['C_CONTIGUOUS'])
+            self.assertTrue(views['state_b'][step].flags['C_CONTIGUOUS'])
+            self.assertTrue(views['state_c'][step].flags['F_CONTIGUOUS'])
+
+        # timesteps of a state follow one another in the arena
+        views['state_c'][1] = np.arange(6).reshape((2, 3))
+        np.testing.assert_array_equal(
+            arena[3 * (6 + 24) + 6:3 * (6 + 24) + 12],
+            np.arange(6).reshape((2, 3)).ravel(order='F')
+        )
+
+    def test_arena_memory_mapped(self):
+        filepath = os.sep.join(['outputs', 'test-arena_states.dat'])
+        arena, views = create_states_arena(
+            self.states_info, 1, (2, 3), np.float64, 'C', filepath
+        )
+
+        # arena mapped to a zero-filled file of the size of all states
+        self.assertIsInstance(arena, np.memmap)
+        np.testing.assert_array_equal(arena, 0)
+        self.assertEqual(os.path.getsize(filepath),
+                         2 * (6 + 24 + 6) * np.dtype(np.float64).itemsize)
+
+        # values assigned to the views are written through to the file
+        views['state_b'][...] = 2
+        arena.flush()
+        np.testing.assert_array_equal(
+            np.fromfile(filepath, np.float64),
+            np.repeat([0, 2, 0], [2 * 6, 2 * 24, 2 * 6])
+        )
+
+        del arena, views
+        os.remove(filepath)
+
+    def test_arena_mapped_again(self):
+        filepath = os.sep.join(['outputs', 'test-arena_states.dat'])
+        arena, views = create_states_arena(
+            self.states_info, 1, (2, 3), np.float64, 'C', filepath
+        )
+        state = State(views['state_c'], order='F')
+        state[0][:] = 5
+        state.increment()
+        state[0][:] = 6
+        arena.flush()
+        del arena, views
+
+        # existing file mapped again with the values it holds
+        arena, views = create_states_arena(
+            self.states_info, 1, (2, 3), np.float64, 'C', filepath, 'r+'
+        )
+        self.assertIsInstance(arena, np.memmap)
+        np.testing.assert_array_equal(views['state_c'][1], 5)
+        np.testing.assert_array_equal(views['state_c'][0], 6)
+
+        # state moved onto the new map, keeping its current timestep
+        state.rebind(views['state_c'])
+        np.testing.assert_array_equal(state[0], 6)
+        np.testing.assert_array_equal(state[-1], 5)
+        state.increment()
+        state[0][:] = 7
+        arena.flush()
+        np.testing.assert_array_equal(
+            np.fromfile(filepath, np.float64)[-12:],
+            np.repeat([6, 7], 6)
+        )
+
+        del arena, views, state
+        os.remove(filepath)
+
+    def test_states_on_views(self):
+        arena, views = create_states_arena(
+            self.states_info, 1, (2, 3), np.float64, 'C'
+        )
+        state = State(views['state_c'], order='F')
+
+        # state timesteps remain views on the arena (no copy)
+        state[0][:] = 5
+        state.increment()
+        state[0][:] = 6
+        np.testing.assert_array_equal(views['state_c'][1], 5)
+        np.testing.assert_array_equal(views['state_c'][0], 6)
+        self.assertEqual(np.count_nonzero(arena), 12)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,13 +3,18 @@ import doctest
 import os
 import numpy as np
 from copy import deepcopy
+from datetime import datetime, timedelta
 from glob import glob
 
 import cm4twc
 from tests.test_time import (get_dummy_timedomain,
                              get_dummy_spin_up_start_end,
                              get_dummy_dumping_frequency)
-from tests.test_components.test_component import get_dummy_component
+from cm4twc._utils.checkpoint import load_checkpoint
+from tests.test_data import get_dummy_dataset
+from tests.test_components.test_component import (get_dummy_component,
+                                                  time_resolutions,
+                                                  space_resolutions)
 from tests.test_components.test_utils.test_states import compare_states
 from tests.test_components.test_utils.test_records import (get_expected_record,
                                                            get_produced_record,
@@ -87,9 +92,10 @@ class Simulator(object):
             dumping_frequency=get_dummy_dumping_frequency(self.time_)
         )
 
-    def run_model(self):
+    def run_model(self, **kwargs):
         self.model.simulate(
-            dumping_frequency=get_dummy_dumping_frequency(self.time_)
+            dumping_frequency=get_dummy_dumping_frequency(self.time_),
+            **kwargs
         )
 
     def resume_model(self, tag='run'):
@@ -121,22 +127,26 @@ class Simulator(object):
         files = []
         files.extend(
             glob(os.sep.join([self.model.exchanger.saving_directory,
-                              self.model.identifier + '*_dump*.nc']))
+                              self.model.identifier + '*_dump*']))
+        )
+        files.extend(
+            glob(os.sep.join([self.model.saving_directory,
+                              self.model.identifier + '*_checkpoint_*.nc']))
         )
         if self.model.surfacelayer.saving_directory is not None:
             files.extend(
                 glob(os.sep.join([self.model.surfacelayer.saving_directory,
-                                  self.model.identifier + '*_dump*.nc']))
+                                  self.model.identifier + '*_dump*']))
             )
         if self.model.subsurface.saving_directory is not None:
             files.extend(
                 glob(os.sep.join([self.model.subsurface.saving_directory,
-                                  self.model.identifier + '*_dump*.nc']))
+                                  self.model.identifier + '*_dump*']))
             )
         if self.model.openwater.saving_directory is not None:
             files.extend(
                 glob(os.sep.join([self.model.openwater.saving_directory,
-                                  self.model.identifier + '*_dump*.nc']))
+                                  self.model.identifier + '*_dump*']))
             )
         # convert dumps list to set to avoid potential duplicates
         for f in set(files):
@@ -267,6 +277,48 @@ class BasicTestModel(object):
         # clean up
         simulator.clean_up_files()
 
+    def test_yaml_concurrent_setup_simulate(self):
+        """
+        The purpose of this test is to check that the following workflow
+        is functional:
+        - configure model using a YAML model configuration file, with
+          its components loaded concurrently;
+        - simulate model main run.
+
+        The functional character of the workflow is tested through:
+        - completing with no error;
+        - checking that the configuration of the model is the same as
+          when its components are loaded one after the other;
+        - checking the correctness of the final component state values;
+        - checking the correctness of the final exchanger transfer values;
+        - checking the values in the record files.
+        """
+        # set up a model from yaml configuration file, one component
+        # after the other, and then concurrently
+        load_workers = cm4twc.load_workers()
+        try:
+            cm4twc.load_workers(1)
+            simulator_1 = Simulator.from_yaml(self.t, self.s)
+            cm4twc.load_workers(3)
+            simulator_2 = Simulator.from_yaml(self.t, self.s)
+        finally:
+            cm4twc.load_workers(load_workers)
+
+        # check that components are loaded the same way
+        self.assertEqual(simulator_2.model.to_config(),
+                         simulator_1.model.to_config())
+
+        # start main run
+        simulator_2.run_model()
+
+        # check final state and transfer values
+        self.check_final_conditions(simulator_2.model)
+        # check records
+        self.check_records(simulator_2.model)
+
+        # clean up
+        simulator_2.clean_up_files()
+
     def test_setup_simulate_resume_run(self):
         """
         The purpose of this test is to check that the following workflow
@@ -298,6 +350,265 @@ class BasicTestModel(object):
         # clean up
         simulator.clean_up_files()
 
+    def test_setup_simulate_resume_run_consolidated(self):
+        """
+        The purpose of this test is to check that the following workflow
+        is functional:
+        - configure model;
+        - simulate model main run with consolidated dumps (while a
+          checkpoint file of an earlier run with the same tag exists);
+        - resume model main run at second-to-last snapshot.
+
+        The functional character of the workflow is tested through:
+        - completing with no error;
+        - checking that the checkpoint file of the earlier run is removed;
+        - checking the correctness of the final component state values;
+        - checking the correctness of the final exchanger transfer values;
+        - checking the values in the record files.
+        """
+        # set up a model
+        simulator = Simulator.from_scratch(self.t, self.s, 'c', 'c', 'c')
+
+        # leave a checkpoint file as if from an earlier (longer) run
+        stale = simulator.model._checkpoint_file('run', datetime(2100, 1, 1))
+        open(stale, 'w').close()
+
+        # start main run
+        simulator.run_model(dumping_format='consolidated')
+
+        # check that only checkpoints of this run can be resumed from
+        self.assertFalse(os.path.exists(stale))
+        self.assertEqual(
+            simulator.model._find_checkpoint_file('run'),
+            simulator.model._checkpoint_file(
+                'run',
+                get_dummy_timedomain('daily').bounds.datetime_array[-1, -1]
+            )
+        )
+
+        # resume main run
+        simulator.resume_model()
+
+        # check final state and transfer values
+        self.check_final_conditions(simulator.model)
+        # check records
+        self.check_records(simulator.model)
+
+        # clean up
+        simulator.clean_up_files()
+
+    def test_setup_simulate_resume_run_incremental(self):
+        """
+        The purpose of this test is to check that the following workflow
+        is functional:
+        - configure first model;
+        - simulate first model main run with full checkpoints;
+        - configure second model;
+        - simulate second model main run with a full checkpoint every
+          third checkpoint only, the others being incremental;
+        - resume second model main run at second-to-last snapshot.
+
+        The functional character of the workflow is tested through:
+        - completing with no error;
+        - checking that incremental checkpoints are only allowed with
+          consolidated dumps;
+        - checking that each checkpoint of the second model replays to
+          the same contents as the full checkpoint of the first model;
+        - checking the correctness of the final component state values;
+        - checking the correctness of the final exchanger transfer values;
+        - checking the values in the record files.
+        """
+        # set up two models
+        simulator_1 = Simulator.from_scratch(self.t, self.s, 'c', 'c', 'c')
+        simulator_2 = Simulator.from_scratch(self.t, self.s, 'c', 'c', 'c',
+                                             id_trail='bis')
+
+        # check that incremental checkpoints require consolidated dumps
+        with self.assertRaises(ValueError):
+            simulator_2.run_model(dumping_format='separate',
+                                  dumping_full_every=3)
+
+        # start main runs
+        simulator_1.run_model(dumping_format='consolidated')
+        simulator_2.run_model(dumping_format='consolidated',
+                              dumping_full_every=3)
+
+        # check that the chain of checkpoints replays to the same states
+        files_1 = simulator_1.model._checkpoint_files('run')
+        files_2 = simulator_2.model._checkpoint_files('run')
+        self.assertEqual(len(files_1), len(files_2))
+        for file_1, file_2 in zip(files_1, files_2):
+            contents_1, at_1 = load_checkpoint(file_1)
+            contents_2, at_2 = load_checkpoint(file_2)
+            self.assertEqual(at_1, at_2)
+            self.check_checkpoint_contents(contents_2, contents_1)
+
+        # resume main run of second model (on an incremental checkpoint)
+        simulator_2.resume_model()
+
+        # check final state and transfer values
+        self.check_final_conditions(simulator_2.model)
+        # check records
+        self.check_records(simulator_2.model)
+
+        # clean up
+        simulator_1.clean_up_files()
+        simulator_2.clean_up_files()
+
+    def test_setup_simulate_resume_run_retention(self):
+        """
+        The purpose of this test is to check that the following workflow
+        is functional:
+        - configure model;
+        - simulate model main run with a full checkpoint every third
+          checkpoint, only keeping the two latest checkpoints;
+        - resume model main run at second-to-last snapshot.
+
+        The functional character of the workflow is tested through:
+        - completing with no error;
+        - checking that exactly the two latest checkpoints are kept,
+          alongside the full checkpoints they are based on;
+        - checking the correctness of the final component state values;
+        - checking the correctness of the final exchanger transfer values;
+        - checking the values in the record files.
+        """
+        full_every, keep_last = 3, 2
+
+        # set up a model
+        simulator = Simulator.from_scratch(self.t, self.s, 'c', 'c', 'c')
+
+        # start main run
+        simulator.run_model(dumping_format='consolidated',
+                            dumping_full_every=full_every,
+                            dumping_keep_last=keep_last)
+
+        # check that only the latest checkpoints and their bases remain
+        written = simulator.model._chain['files']
+        expected = set(written[-keep_last:])
+        expected.update(
+            written[(i // full_every) * full_every]
+            for i in range(len(written) - keep_last, len(written))
+        )
+        self.assertEqual(set(simulator.model._checkpoint_files('run')),
+                         expected)
+        self.assertLessEqual(len(expected), keep_last + 1)
+
+        # resume main run (on an incremental checkpoint kept)
+        simulator.resume_model()
+
+        # check final state and transfer values
+        self.check_final_conditions(simulator.model)
+        # check records
+        self.check_records(simulator.model)
+
+        # clean up
+        simulator.clean_up_files()
+
+    def test_setup_simulate_resume_run_retention_across_runs(self):
+        """
+        The purpose of this test is to check that the following workflow
+        is functional:
+        - configure model;
+        - simulate model main run with a full checkpoint every third
+          checkpoint, only keeping the two latest checkpoints;
+        - resume model main run at second-to-last snapshot with the
+          same retention policy.
+
+        The functional character of the workflow is tested through:
+        - completing with no error;
+        - checking that the checkpoints of the first run are subject to
+          the retention policy of the resumed run, so that exactly the
+          two latest checkpoints remain;
+        - checking the correctness of the final component state values;
+        - checking the correctness of the final exchanger transfer values;
+        - checking the values in the record files.
+        """
+        full_every, keep_last = 3, 2
+
+        # set up a model
+        simulator = Simulator.from_scratch(self.t, self.s, 'c', 'c', 'c')
+
+        # start main run
+        simulator.run_model(dumping_format='consolidated',
+                            dumping_full_every=full_every,
+                            dumping_keep_last=keep_last)
+        first_run = simulator.model._checkpoint_files('run')
+        self.assertGreater(len(first_run), keep_last)
+
+        # resume main run (on the second-to-last checkpoint, whose
+        # full checkpoint is the earliest one kept by the first run)
+        simulator.resume_model()
+
+        # check that the resumed run starts with a full checkpoint, so
+        # that only the two latest checkpoints remain, the full one the
+        # first run kept for them being removed
+        remaining = simulator.model._checkpoint_files('run')
+        self.assertEqual(len(remaining), keep_last)
+        self.assertEqual(remaining, first_run[-keep_last:])
+        self.assertNotIn(first_run[0], remaining)
+
+        # check final state and transfer values
+        self.check_final_conditions(simulator.model)
+        # check records
+        self.check_records(simulator.model)
+
+        # clean up
+        simulator.clean_up_files()
+
+    def test_setup_simulate_resume_run_memmap_states(self):
+        """
+        The purpose of this test is to check that the following workflow
+        is functional:
+        - configure model (with component states memory-mapped to files);
+        - simulate model main run;
+        - resume model main run at second-to-last snapshot.
+
+        The functional character of the workflow is tested through:
+        - completing with no error;
+        - checking the correctness of the final component state values;
+        - checking the correctness of the final exchanger transfer values;
+        - checking the values in the record files;
+        - checking that the files states are mapped to hold their values.
+        """
+        # set up a model with memory-mapped states
+        simulator = Simulator.from_scratch(self.t, self.s, 'c', 'c', 'c')
+        components = [simulator.model.surfacelayer,
+                      simulator.model.subsurface,
+                      simulator.model.openwater]
+        for component in components:
+            component._states_memmap = True
+
+        # start main run
+        simulator.run_model()
+
+        # check that states were flushed to the files they are mapped to
+        # and that these files are kept
+        self.check_states_memmap_files(components)
+
+        # resume main run
+        simulator.resume_model()
+
+        # check final state and transfer values
+        self.check_final_conditions(simulator.model)
+        # check records
+        self.check_records(simulator.model)
+        # check that states were flushed to the files they are mapped to
+        self.check_states_memmap_files(components)
+
+        # clean up
+        simulator.clean_up_files()
+        for component in components:
+            os.remove(component._states_memmap_file())
+
+    def check_states_memmap_files(self, components):
+        for component in components:
+            self.assertIsNone(component._states_memory)
+            arrays = [component.states[s].array for s in component.states]
+            np.testing.assert_array_equal(
+                np.fromfile(component._states_memmap_file(), arrays[0].dtype),
+                np.concatenate([a.ravel(order='K') for a in arrays])
+            )
+
     def test_setup_spinup_yaml_resume_spinup(self):
         """
         The purpose of this test is to check that the following workflow
@@ -401,6 +712,187 @@ class BasicTestModel(object):
         # clean up
         simulator_2.clean_up_files()
 
+    def test_setup_simulate_records_in_memory(self):
+        """
+        The purpose of this test is to check that the following workflow
+        is functional:
+        - configure model (with records at a station for one state);
+        - simulate model main run holding records in memory.
+
+        The functional character of the workflow is tested through:
+        - completing with no error;
+        - checking the correctness of the final component state values;
+        - checking the values of the records returned, records at
+          stations being returned separately from records over the
+          whole spacedomain;
+        - checking that no dump file is written, and that the run
+          cannot be resumed.
+        """
+        # set up a model
+        simulator = Simulator.from_scratch(self.t, self.s, 'c', 'c', 'c')
+
+        # also record a surfacelayer state at one station
+        component = simulator.model.surfacelayer
+        records = dict(component.records)
+        records['state_b'] = {
+            timedelta(days=1): {
+                'methods': ['point'],
+                'stations': {
+                    'station_1': [0] * len(component.spacedomain.shape)
+                }
+            }
+        }
+        component.records = records
+
+        # check that dumps cannot be requested with records in memory
+        with self.assertRaises(ValueError):
+            simulator.model.simulate(dumping_frequency=timedelta(days=4),
+                                     records_sink='memory')
+
+        # start main run holding records in memory
+        records = simulator.model.simulate(records_sink='memory')
+
+        # check that no dump file (not even the final one) is written
+        self.assertEqual(
+            glob(os.sep.join([simulator.model.saving_directory,
+                              simulator.model.identifier + '*_dump*'])),
+            []
+        )
+        # check that resuming the run is not possible
+        with self.assertRaises(RuntimeError):
+            simulator.model.resume('run')
+
+        # check final state and transfer values
+        self.check_final_conditions(simulator.model)
+        # check records
+        rtol, atol = cm4twc.rtol(), cm4twc.atol()
+        for component in [simulator.model.surfacelayer,
+                          simulator.model.subsurface,
+                          simulator.model.openwater]:
+            cat = component.category
+            for name, frequencies in component.records.items():
+                for delta, methods in frequencies.items():
+                    if isinstance(methods, dict):
+                        key = (delta, 'stations')
+                        methods = methods['methods']
+                        self.assertEqual(records[cat][name][key]['stations'],
+                                         ['station_1'])
+                    else:
+                        key = delta
+                    for method in methods:
+                        exp_t, exp_b, exp_o = get_expected_record(
+                            self.t, component, name, delta, method
+                        )
+                        method = (
+                            cm4twc.components._utils.records._methods_map[
+                                method]
+                        )
+                        prd = records[cat][name][key]
+                        self.assertEqual(len(prd['time']), len(exp_t))
+                        # (values are homogeneous, except outside land)
+                        prd_o = np.reshape(prd[method], (len(exp_t), -1))
+                        try:
+                            np.testing.assert_allclose(
+                                np.ma.amin(prd_o, axis=1), exp_o, rtol, atol
+                            )
+                            np.testing.assert_allclose(
+                                np.ma.amax(prd_o, axis=1), exp_o, rtol, atol
+                            )
+                        except AssertionError as e:
+                            raise AssertionError(
+                                "error for {} component output {} values:"
+                                " {}, {}".format(cat, name, key, method)
+                            ) from e
+
+        # clean up
+        simulator.clean_up_files()
+
+    def test_snapshot_branch_simulate(self):
+        """
+        The purpose of this test is to check that the following workflow
+        is functional:
+        - simulate model main run;
+        - take a snapshot of model at the end of its main run;
+        - branch three models off the snapshot, the first one unchanged,
+          the second one with a different parameter value, and the
+          third one with different driving data;
+        - simulate the main run of each branch holding records in memory.
+
+        The functional character of the workflow is tested through:
+        - completing with no error;
+        - checking that the records of the branches with a different
+          parameter value or different driving data diverge from the
+          records of the unchanged branch;
+        - checking that the model branched off is left untouched.
+        """
+        # set up a model, run it, and take a snapshot of it
+        simulator = Simulator.from_scratch(self.t, self.s, 'c', 'c', 'c')
+        simulator.model.simulate()
+        snapshot = simulator.model.snapshot()
+        dataset = simulator.model.subsurface.dataset
+
+        # branch models off the snapshot and run them
+        records = {}
+        for change in ['none', 'parameter', 'driving']:
+            branch = simulator.model.branch(
+                snapshot,
+                '{}-branch-{}'.format(simulator.model.identifier, change)
+            )
+            if change == 'parameter':
+                branch.subsurface.parameters = {'parameter_a': 2}
+            elif change == 'driving':
+                driving = get_dummy_dataset(
+                    'subsurface',
+                    time_resolutions['subsurface'][self.t],
+                    space_resolutions['subsurface'][self.s]
+                )
+                driving['driving_a'] = driving['driving_a'] * 2
+                branch.subsurface.dataset = driving
+
+            records[change] = (
+                branch.simulate(records_sink='memory')['subsurface']
+            )
+            Simulator(self.t, self.s, branch).clean_up_files()
+
+        # check that the changed branches diverge from the unchanged one
+        delta = min(records['none']['output_x'])
+        for change in ['parameter', 'driving']:
+            self.assertFalse(
+                np.ma.allclose(records[change]['output_x'][delta]['point'],
+                               records['none']['output_x'][delta]['point'])
+            )
+            # (states are not affected by parameters nor driving data)
+            np.testing.assert_allclose(
+                records[change]['state_a'][delta]['point'],
+                records['none']['state_a'][delta]['point']
+            )
+
+        # check that the model branched off is untouched
+        self.assertEqual(simulator.model.subsurface.parameters,
+                         {'parameter_a': 1})
+        self.assertIs(simulator.model.subsurface.dataset, dataset)
+        self.check_final_conditions(simulator.model)
+
+        # clean up
+        simulator.clean_up_files()
+
+    def check_checkpoint_contents(self, contents, expected):
+        """
+        This method checks that the contents read back from a checkpoint
+        file are the same as the expected ones.
+        """
+        self.assertEqual(set(contents), set(expected))
+        for name, item in contents.items():
+            if isinstance(item, dict):
+                self.check_checkpoint_contents(item, expected[name])
+            else:
+                try:
+                    np.testing.assert_array_equal(item, expected[name])
+                except AssertionError as e:
+                    raise AssertionError(
+                        "error for checkpoint variable {}".format(name)
+                    ) from e
+
     def check_final_conditions(self, model):
         """
         This method checks that the final values of all component states
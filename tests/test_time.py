@@ -315,6 +315,23 @@ class TestTimeDomainAPI(unittest.TestCase):
                        datetime(2020, 1, 5, 9, 0, 0))
         )
 
+    def test_timedomain_cached_datetime_arrays(self):
+        td = cm4twc.TimeDomain(
+            timestamps=np.array([0, 1, 2, 3]),
+            units='days since 2020-02-28 09:00:00Z',
+            calendar='standard'
+        )
+
+        # check that cached arrays are equal to the ones from cf-python
+        self.assertEqual(td.datetime_array.tolist(),
+                         td.time.datetime_array.tolist())
+        self.assertEqual(td.bounds_datetime_array.tolist(),
+                         td.bounds.datetime_array.tolist())
+
+        # check that datetime objects are only generated once
+        self.assertIs(td.datetime_array, td.datetime_array)
+        self.assertIs(td.bounds_datetime_array, td.bounds_datetime_array)
+
 
 class TestTimeDomainComparison(unittest.TestCase):
 
@@ -474,12 +491,60 @@ class TestTimeDomainComparison(unittest.TestCase):
         self.assertFalse(td1.spans_same_period_as(td4))
 
 
+class TestTimeDomainFromStartEndStep(unittest.TestCase):
+    # timestamps generated numerically must be the same as the ones
+    # obtained by converting the sequence of datetimes they stand for
+    calendars = {'gregorian': cftime.DatetimeGregorian,
+                 'noleap': cftime.DatetimeNoLeap,
+                 '360_day': cftime.Datetime360Day}
+    units = ['seconds since 1970-01-01 00:00:00Z',
+             'days since 2019-01-01 09:00:00Z']
+    steps = [timedelta(days=1), timedelta(hours=3)]
+
+    @staticmethod
+    def get_reference_timedomain(start, end, step, units, calendar):
+        # build timedomain from the sequence of datetimes
+        (divisor, remainder) = divmod(int((end - start).total_seconds()),
+                                      int(step.total_seconds()))
+        datetimes = [start + timedelta(seconds=td * step.total_seconds())
+                     for td in range(divisor + 1)]
+        return cm4twc.TimeDomain.from_datetime_sequence(
+            np.asarray(datetimes), units, calendar
+        )
+
+    def test_timedomain_same_as_from_datetime_sequence(self):
+        for calendar, datetime_ in self.calendars.items():
+            # (period spanning the end of February of a leap year)
+            start = datetime_(2020, 1, 1, 9)
+            end = datetime_(2020, 4, 1, 9)
+            for units in self.units:
+                for step in self.steps:
+                    with self.subTest(calendar=calendar, units=units,
+                                      step=step):
+                        td = cm4twc.TimeDomain.from_start_end_step(
+                            start, end, step, units, calendar
+                        )
+                        ref = self.get_reference_timedomain(
+                            start, end, step, units, calendar
+                        )
+
+                        np.testing.assert_array_equal(td.time.array,
+                                                      ref.time.array)
+                        np.testing.assert_array_equal(td.bounds.array,
+                                                      ref.bounds.array)
+                        self.assertEqual(td.calendar, ref.calendar)
+                        self.assertEqual(td.units, ref.units)
+                        self.assertEqual(td.bounds_datetime_array[-1, -1],
+                                         end)
+
+
 if __name__ == '__main__':
     test_loader = unittest.TestLoader()
     test_suite = unittest.TestSuite()
 
     test_suite.addTests(test_loader.loadTestsFromTestCase(TestTimeDomainAPI))
     test_suite.addTests(test_loader.loadTestsFromTestCase(TestTimeDomainComparison))
+    test_suite.addTests(test_loader.loadTestsFromTestCase(TestTimeDomainFromStartEndStep))
 
     test_suite.addTests(doctest.DocTestSuite(cm4twc.time))
 
@@ -0,0 +1,104 @@
+import unittest
+import os
+from datetime import datetime
+import numpy as np
+
+from cm4twc._utils.checkpoint import (create_checkpoint, load_checkpoint,
+                                      get_checkpoint_changes,
+                                      get_checkpoint_digests)
+
+
+def get_dummy_contents(state_a, state_b):
+    # contents shaped as the ones of a model (i.e. nested dictionaries
+    # of dimensions and arrays, and of attributes)
+    return {
+        'surfacelayer': {
+            'states': {
+                'state_a': (('history', 'Y', 'X'), state_a),
+                'state_b': (('history', 'Y', 'X'), state_b),
+                'solver_history': 1
+            }
+        },
+        'exchanger': {
+            'transfer_i': (('Y', 'X'), np.ones(state_a.shape[1:]))
+        }
+    }
+
+
+class TestIncrementalCheckpoint(unittest.TestCase):
+    units = 'days since 2019-01-01 09:00:00Z'
+    calendar = 'gregorian'
+
+    def setUp(self):
+        self.full = os.sep.join(['outputs', 'test-checkpoint_full.nc'])
+        self.incremental = os.sep.join(['outputs',
+                                        'test-checkpoint_incremental.nc'])
+
+        # states large enough to span many blocks
+        shape = (2, 256, 256)
+        self.state_a = np.arange(np.prod(shape),
+                                 dtype=np.float64).reshape(shape)
+        self.state_b = np.zeros(shape)
+
+        contents = get_dummy_contents(self.state_a, self.state_b)
+        create_checkpoint(self.full, contents, datetime(2019, 1, 1, 9),
+                          self.units, self.calendar)
+        self.reference = get_checkpoint_digests(contents)
+
+    def tearDown(self):
+        for file_ in [self.full, self.incremental]:
+            if os.path.exists(file_):
+                os.remove(file_)
+
+    def write_incremental(self, state_a, state_b):
+        changes = get_checkpoint_changes(
+            get_dummy_contents(state_a, state_b), self.reference
+        )
+        create_checkpoint(self.incremental, changes,
+                          datetime(2019, 1, 2, 9), self.units,
+                          self.calendar, base=self.full)
+        return changes
+
+    def check_replayed(self, state_a, state_b):
+        contents, at = load_checkpoint(self.incremental)
+        self.assertEqual(at, datetime(2019, 1, 2, 9))
+        states = contents['surfacelayer']['states']
+        np.testing.assert_array_equal(states['state_a'], state_a)
+        np.testing.assert_array_equal(states['state_b'], state_b)
+        self.assertEqual(states['solver_history'], 1)
+        np.testing.assert_array_equal(
+            contents['exchanger']['transfer_i'], np.ones((256, 256))
+        )
+
+    def test_partially_changed_state(self):
+        # only one value of one state changed
+        state_a = self.state_a.copy()
+        state_a[1, 100, 100] = -1
+        changes = self.write_incremental(state_a, self.state_b)
+
+        # only the changed block of the changed state is stored
+        states = changes['surfacelayer']['states']
+        self.assertNotIn('state_b', states)
+        self.assertEqual(len(states['state_a']['blocks'][1]), 1)
+        self.assertEqual(changes['exchanger'], {})
+
+        # incremental file much smaller than full one
+        self.assertLess(os.path.getsize(self.incremental),
+                        os.path.getsize(self.full) / 10)
+
+        self.check_replayed(state_a, self.state_b)
+
+    def test_wholly_changed_state(self):
+        # all the values of one state changed, stored whole
+        state_b = self.state_b + 1
+        changes = self.write_incremental(self.state_a, state_b)
+
+        states = changes['surfacelayer']['states']
+        self.assertIsInstance(states['state_b'], tuple)
+        self.assertNotIn('state_a', states)
+
+        self.check_replayed(self.state_a, state_b)
+
+
+if __name__ == '__main__':
+    unittest.main()
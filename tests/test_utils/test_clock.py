@@ -1,5 +1,6 @@
 import unittest
 import numpy as np
+import cftime
 from datetime import timedelta
 
 import cm4twc._utils
@@ -80,6 +81,43 @@ class TestClock(unittest.TestCase):
         self.assertEqual(out_idx_b, self.exp_idx_b)
         self.assertEqual(out_idx_c, self.exp_idx_c)
 
+    def test_clock_current_datetime_and_timestamp(self):
+        clock = cm4twc._utils.Clock(
+            {'surfacelayer': self.td_a,
+             'subsurface': self.td_b,
+             'openwater': self.td_c}
+        )
+
+        out_datetimes, out_timestamps = list(), list()
+
+        for a, b, c, d in clock:
+            out_datetimes.append(clock.get_current_datetime())
+            out_timestamps.append(clock.get_current_timestamp())
+
+        # supermesh is the daily timedomain
+        self.assertEqual(out_datetimes,
+                         self.td_a.bounds_datetime_array[:, 0].tolist())
+        np.testing.assert_array_equal(
+            out_timestamps,
+            cftime.date2num(out_datetimes, clock.timedomain.units,
+                            clock.timedomain.calendar)
+        )
+
+    def test_clock_current_timestamp_before_start(self):
+        clock = cm4twc._utils.Clock(
+            {'surfacelayer': self.td_a,
+             'subsurface': self.td_b,
+             'openwater': self.td_c}
+        )
+
+        # no current timestamp until the clock has started iterating
+        with self.assertRaises(RuntimeError):
+            clock.get_current_timestamp()
+
+        next(clock)
+        self.assertEqual(clock.get_current_timestamp(),
+                         clock.timedomain.bounds.array[0, 0])
+
     @unittest.expectedFailure
     def test_clock_incompatible_timedomains(self):
         clock = cm4twc._utils.Clock(
@@ -0,0 +1,399 @@
+import unittest
+import os
+from threading import Event
+from netCDF4 import Dataset
+import json
+import numpy as np
+import cftime
+
+import cm4twc
+from cm4twc._utils.writer import (Writer, write_to, snapshot, index_time,
+                                  locate_time, variable_layout,
+                                  manifest_file, update_manifest,
+                                  locate_snapshot, netcdf_lock)
+
+
+def create_dummy_file(filepath, shape=(2, 3)):
+    # create a file with an unlimited time dimension and one variable
+    with Dataset(filepath, 'w') as f:
+        f.createDimension('time', None)
+        for i, n in enumerate(shape):
+            f.createDimension('axis_{}'.format(i), n)
+        t = f.createVariable('time', np.float64, ('time',))
+        t.units = 'days since 2019-01-01 09:00:00Z'
+        t.calendar = 'gregorian'
+        f.createVariable('values', np.float64,
+                         ('time', *['axis_{}'.format(i)
+                                    for i in range(len(shape))]))
+
+
+def write_dummy_values(f, times, values, timestamp):
+    t = locate_time(f, times, timestamp)
+    f.variables['values'][t, ...] = values
+
+
+def read_dummy_file(filepath):
+    with Dataset(filepath, 'r') as f:
+        return f.variables['time'][:], f.variables['values'][:]
+
+
+class TestWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.filepath = os.sep.join(['outputs', 'test-writer_dump.nc'])
+        create_dummy_file(self.filepath)
+        self.sync_every = cm4twc.sync_every()
+
+    def tearDown(self):
+        cm4twc.sync_every(self.sync_every)
+        if os.path.exists(self.filepath):
+            os.remove(self.filepath)
+
+    def test_sync_every_setting(self):
+        cm4twc.sync_every(3)
+        self.assertEqual(cm4twc.sync_every(), 3)
+        for value in [0, -1]:
+            with self.assertRaises(ValueError):
+                cm4twc.sync_every(value)
+        self.assertEqual(cm4twc.sync_every(), 3)
+
+    def test_file_kept_open(self):
+        cm4twc.sync_every(2)
+        writer = Writer()
+
+        # file opened on first write and kept open for the next ones
+        write_to(self.filepath, writer, write_dummy_values,
+                 np.full((2, 3), 1.), 0.)
+        dataset = writer.datasets[self.filepath]
+        self.assertTrue(dataset.isopen())
+        for timestamp in [1., 2.]:
+            write_to(self.filepath, writer, write_dummy_values,
+                     np.full((2, 3), timestamp + 1), timestamp)
+            self.assertIs(writer.datasets[self.filepath], dataset)
+        self.assertEqual(writer.writes[self.filepath], 3)
+
+        # files closed with the writer, all values written
+        writer.close()
+        self.assertFalse(dataset.isopen())
+        self.assertEqual(writer.datasets, {})
+        time, values = read_dummy_file(self.filepath)
+        np.testing.assert_array_equal(time, [0, 1, 2])
+        np.testing.assert_array_equal(
+            values, np.repeat([1., 2., 3.], 6).reshape((3, 2, 3))
+        )
+
+    def test_file_released(self):
+        writer = Writer()
+
+        write_to(self.filepath, writer, write_dummy_values,
+                 np.full((2, 3), 1.), 0.)
+        # file closed once released, and opened again if written to
+        writer.release(self.filepath)
+        self.assertNotIn(self.filepath, writer.datasets)
+        time, values = read_dummy_file(self.filepath)
+        np.testing.assert_array_equal(time, [0])
+
+        write_to(self.filepath, writer, write_dummy_values,
+                 np.full((2, 3), 2.), 1.)
+        self.assertIn(self.filepath, writer.datasets)
+        writer.close()
+        time, values = read_dummy_file(self.filepath)
+        np.testing.assert_array_equal(time, [0, 1])
+        np.testing.assert_array_equal(values[-1], 2.)
+
+    def test_without_writer(self):
+        # file opened and closed for each write
+        write_to(self.filepath, None, write_dummy_values,
+                 np.full((2, 3), 1.), 0.)
+        write_to(self.filepath, None, write_dummy_values,
+                 np.full((2, 3), 2.), 1.)
+        time, values = read_dummy_file(self.filepath)
+        np.testing.assert_array_equal(time, [0, 1])
+        np.testing.assert_array_equal(values[:, 0, 0], [1., 2.])
+
+
+class TestTimeIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.filepath = os.sep.join(['outputs', 'test-time-index_dump.nc'])
+        create_dummy_file(self.filepath)
+
+    def tearDown(self):
+        if os.path.exists(self.filepath):
+            os.remove(self.filepath)
+
+    def test_index_built_from_file(self):
+        for timestamp in [0., 2., 1.]:
+            write_to(self.filepath, None, write_dummy_values,
+                     np.full((2, 3), timestamp), timestamp)
+
+        # timestamps mapped to their position in the file
+        with Dataset(self.filepath, 'r') as f:
+            self.assertEqual(index_time(f), {0.: 0, 2.: 1, 1.: 2})
+
+    def test_snapshots_located(self):
+        writer = Writer()
+        for timestamp in [0., 1.]:
+            write_to(self.filepath, writer, write_dummy_values,
+                     np.full((2, 3), timestamp), timestamp)
+        writer.close()
+
+        # index of file opened again built from its existing timestamps
+        writer = Writer()
+        write_to(self.filepath, writer, write_dummy_values,
+                 np.full((2, 3), 2.), 2.)
+        self.assertEqual(writer.times[self.filepath], {0.: 0, 1.: 1, 2.: 2})
+        # existing snapshot overwritten in place, time not extended
+        write_to(self.filepath, writer, write_dummy_values,
+                 np.full((2, 3), 5.), 1.)
+        self.assertEqual(len(writer.times[self.filepath]), 3)
+        writer.close()
+
+        time, values = read_dummy_file(self.filepath)
+        np.testing.assert_array_equal(time, [0., 1., 2.])
+        np.testing.assert_array_equal(values[:, 0, 0], [0., 5., 2.])
+
+    def test_time_extended(self):
+        with Dataset(self.filepath, 'a') as f:
+            times = index_time(f)
+            self.assertEqual(locate_time(f, times, 3.), 0)
+            self.assertEqual(locate_time(f, times, 4.), 1)
+            self.assertEqual(locate_time(f, times, 3.), 0)
+            np.testing.assert_array_equal(f.variables['time'][:], [3., 4.])
+
+
+class TestManifest(unittest.TestCase):
+
+    def setUp(self):
+        self.filepath = os.sep.join(['outputs', 'test-manifest_dump.nc'])
+        create_dummy_file(self.filepath)
+        self.units = 'days since 2019-01-01 09:00:00Z'
+        self.calendar = 'gregorian'
+        # list the (yet to be written) snapshots in a manifest
+        update_manifest(self.filepath, {}, self.units, self.calendar)
+        self.sync_every = cm4twc.sync_every()
+
+    def tearDown(self):
+        cm4twc.sync_every(self.sync_every)
+        for file_ in [self.filepath, manifest_file(self.filepath)]:
+            if os.path.exists(file_):
+                os.remove(file_)
+
+    def check_manifest(self):
+        # check that the manifest lists the snapshots in the file in
+        # the order of the file, and that it locates each of them
+        time, _ = read_dummy_file(self.filepath)
+        with open(manifest_file(self.filepath), 'r') as f:
+            manifest = json.load(f)
+        self.assertEqual(manifest['snapshots'], time.tolist())
+        self.assertEqual(manifest['units'], self.units)
+        self.assertEqual(manifest['calendar'], self.calendar)
+
+        with Dataset(self.filepath, 'r') as f:
+            for t, timestamp in enumerate(time.tolist()):
+                datetime_ = cftime.num2date(timestamp, self.units,
+                                            self.calendar)
+                self.assertEqual(locate_snapshot(self.filepath, f,
+                                                 datetime_),
+                                 (t, datetime_))
+            self.assertEqual(locate_snapshot(self.filepath, f)[0],
+                             len(time) - 1)
+
+    def test_manifest_with_writer(self):
+        cm4twc.sync_every(1)
+        writer = Writer()
+        for timestamp in [0., 2., 1.]:
+            write_to(self.filepath, writer, write_dummy_values,
+                     np.full((2, 3), timestamp), timestamp)
+        # manifest not rewritten on sync, hence ignored until closing
+        self.assertIsNone(
+            locate_snapshot(self.filepath, writer.datasets[self.filepath])
+        )
+        writer.close()
+        self.check_manifest()
+
+    def test_manifest_with_file_released(self):
+        writer = Writer()
+        for timestamp in [0., 1.]:
+            write_to(self.filepath, writer, write_dummy_values,
+                     np.full((2, 3), timestamp), timestamp)
+        writer.release(self.filepath)
+        self.check_manifest()
+
+        # manifest extended with the snapshots written after resuming
+        write_to(self.filepath, writer, write_dummy_values,
+                 np.full((2, 3), 2.), 2.)
+        writer.close()
+        self.check_manifest()
+
+    def test_manifest_without_writer(self):
+        for timestamp in [0., 2., 1.]:
+            write_to(self.filepath, None, write_dummy_values,
+                     np.full((2, 3), timestamp), timestamp)
+            self.check_manifest()
+
+
+class TestFileLayout(unittest.TestCase):
+
+    def setUp(self):
+        self.file_layout = cm4twc.file_layout()
+        self.filepath = os.sep.join(['outputs', 'test-layout_records.nc'])
+
+    def tearDown(self):
+        cm4twc.file_layout(self.file_layout)
+        if os.path.exists(self.filepath):
+            os.remove(self.filepath)
+
+    def test_setting_updated(self):
+        cm4twc.file_layout({'records': {'zlib': True, 'complevel': 2}})
+
+        # only options given are updated
+        layout = cm4twc.file_layout()
+        self.assertTrue(layout['records']['zlib'])
+        self.assertEqual(layout['records']['complevel'], 2)
+        self.assertEqual(layout['records']['time_chunk'],
+                         self.file_layout['records']['time_chunk'])
+        self.assertEqual(layout['dumps'], self.file_layout['dumps'])
+
+        with self.assertRaises(ValueError):
+            cm4twc.file_layout({'outputs': {'zlib': True}})
+
+    def test_chunks(self):
+        cm4twc.file_layout({
+            'records': {'time_chunk': 4, 'chunk_bytes': 4 * 8 * 10 * 6},
+            'dumps': {'time_chunk': 1, 'chunk_bytes': None}
+        })
+
+        # space dimensions halved (largest first) until chunk fits
+        self.assertEqual(
+            variable_layout('records', (1, 40, 12), np.float64)['chunksizes'],
+            (4, 1, 10, 6)
+        )
+        self.assertEqual(
+            variable_layout('records', (1, 4, 3), np.float64)['chunksizes'],
+            (4, 1, 4, 3)
+        )
+        # whole snapshot if no target size
+        self.assertEqual(
+            variable_layout('dumps', (1, 40, 12), np.float64)['chunksizes'],
+            (1, 1, 40, 12)
+        )
+
+    def test_compression(self):
+        cm4twc.file_layout({
+            'records': {'zlib': True, 'complevel': 6, 'shuffle': False,
+                        'least_significant_digit': 3}
+        })
+        options = variable_layout('records', (4, 3), np.float64)
+
+        # options applied to the variable created with them
+        with Dataset(self.filepath, 'w') as f:
+            f.createDimension('time', None)
+            f.createDimension('Y', 4)
+            f.createDimension('X', 3)
+            v = f.createVariable('values', np.float64, ('time', 'Y', 'X'),
+                                 **options)
+            self.assertEqual(v.filters()['zlib'], True)
+            self.assertEqual(v.filters()['complevel'], 6)
+            self.assertEqual(v.filters()['shuffle'], False)
+            self.assertEqual(v.chunking(), [16, 4, 3])
+            v[0, ...] = np.full((4, 3), 1.23456)
+            np.testing.assert_allclose(v[0, ...], 1.23456, atol=1e-3)
+
+        # no compression options at all if compression is off
+        cm4twc.file_layout({'records': {'zlib': False,
+                                        'least_significant_digit': None}})
+        options = variable_layout('records', (4, 3), np.float64)
+        self.assertEqual(set(options), {'zlib', 'chunksizes'})
+
+
+class TestBackgroundWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.filepath = os.sep.join(['outputs', 'test-writer-bg_dump.nc'])
+        create_dummy_file(self.filepath)
+        self.write_queue_size = cm4twc.write_queue_size()
+        cm4twc.write_queue_size(2)
+
+    def tearDown(self):
+        cm4twc.write_queue_size(self.write_queue_size)
+        if os.path.exists(self.filepath):
+            os.remove(self.filepath)
+
+    def test_snapshots_written(self):
+        writer = Writer()
+        self.assertIsNotNone(writer._thread)
+
+        # values changed after hand over (e.g. state updated in place)
+        # do not affect the values written
+        array = np.zeros((2, 3))
+        for timestamp in range(6):
+            array[...] = timestamp
+            write_to(self.filepath, writer, write_dummy_values,
+                     snapshot(array, writer), float(timestamp))
+        array[...] = -1
+        writer.close()
+
+        time, values = read_dummy_file(self.filepath)
+        np.testing.assert_array_equal(time, range(6))
+        np.testing.assert_array_equal(
+            values, np.repeat(np.arange(6.), 6).reshape((6, 2, 3))
+        )
+
+    def test_buffers_recycled(self):
+        writer = Writer()
+
+        array = np.ones((2, 3))
+        buffer = snapshot(array, writer)
+        self.assertIsNot(buffer, array)
+        write_to(self.filepath, writer, write_dummy_values, buffer, 0.)
+
+        # wait for the write to be done
+        done = Event()
+        writer.call(done.set)
+        done.wait()
+
+        # once written, the buffer is re-used for the next snapshot of
+        # the same shape and dtype (and only for these)
+        self.assertIsNot(snapshot(np.ones((3, 2)), writer), buffer)
+        self.assertIs(snapshot(array * 2, writer), buffer)
+        np.testing.assert_array_equal(buffer, 2.)
+        write_to(self.filepath, writer, write_dummy_values, buffer, 1.)
+        writer.close()
+
+        time, values = read_dummy_file(self.filepath)
+        np.testing.assert_array_equal(values[:, 0, 0], [1., 2.])
+
+    def test_netcdf_lock_held(self):
+        writer = Writer()
+
+        # writes wait while the main thread calls the netCDF library
+        done = Event()
+        with netcdf_lock:
+            write_to(self.filepath, writer, write_dummy_values,
+                     snapshot(np.ones((2, 3)), writer), 0.)
+            writer.call(done.set)
+            self.assertFalse(done.wait(0.2))
+        self.assertTrue(done.wait(5))
+        writer.close()
+
+        time, values = read_dummy_file(self.filepath)
+        np.testing.assert_array_equal(time, [0.])
+
+    def test_error_raised(self):
+        writer = Writer()
+
+        def fail(f, times):
+            raise KeyError('dummy')
+
+        write_to(self.filepath, writer, fail)
+        # error in background raised in main thread (at the latest
+        # when closing the writer), and later writes skipped
+        with self.assertRaises(RuntimeError):
+            write_to(self.filepath, writer, write_dummy_values,
+                     snapshot(np.ones((2, 3)), writer), 0.)
+            writer.close()
+
+
+if __name__ == '__main__':
+    unittest.main()